@@ -55,6 +55,7 @@ INSTALLED_APPS = [
     'widget_tweaks',
     'django_celery_beat',
     'django.contrib.sitemaps',
+    'django.contrib.postgres',
 
     'users',
     'main',
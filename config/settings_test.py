@@ -0,0 +1,21 @@
+"""
+Настройки для тестов: python manage.py test --settings=config.settings_test
+SQLite вместо PostgreSQL и кэш в памяти вместо файлового. Тесты, которым нужен PostgreSQL (COPY, полнотекстовый
+и нечёткий поиск), на SQLite пропускаются — для них: python manage.py test с обычными настройками.
+"""
+from config.settings import *
+
+
+SECRET_KEY = SECRET_KEY or 'test-secret-key'
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'test.sqlite3',
+    }
+}
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+CATALOG_LOCK_URL = 'cache'
@@ -0,0 +1,62 @@
+document.addEventListener('DOMContentLoaded', function() {
+
+    // --- Прогресс фонового обновления каталога (опрос JSON-статуса задачи Celery) ---
+    const container = document.getElementById('catalog-progress');
+    if (!container) {
+        return;
+    }
+
+    const statusUrl = container.dataset.statusUrl;
+    const bar = container.querySelector('.progress-bar');
+    const text = container.querySelector('.catalog-progress-text');
+    const POLL_INTERVAL_MS = 2000;
+
+    function formatProgress(progress) {
+        const total = progress.total !== null ? ` из ${progress.total}` : '';
+        const eta = progress.eta_seconds !== null ? `, осталось ~${Math.round(progress.eta_seconds)} с` : '';
+        return `${progress.stage} Обработано строк: ${progress.processed}${total}, ` +
+            `${progress.rows_per_sec} строк/с, ошибок: ${progress.errors}${eta}`;
+    }
+
+    function render(data) {
+        if (data.state === 'PROGRESS' && data.progress) {
+            const progress = data.progress;
+            const percent = progress.total ? Math.min(100, Math.round(progress.processed * 100 / progress.total)) : 100;
+            bar.style.width = `${percent}%`;
+            text.textContent = formatProgress(progress);
+        } else if (data.state === 'SUCCESS') {
+            bar.style.width = '100%';
+            bar.classList.remove('progress-bar-animated');
+            bar.classList.add('bg-success');
+            text.textContent = '✅ Обновление каталога завершено.';
+        } else if (data.state === 'FAILURE') {
+            bar.classList.remove('progress-bar-animated');
+            bar.classList.add('bg-danger');
+            text.textContent = `❌ Обновление завершилось ошибкой: ${data.error}`;
+        } else {
+            text.textContent = `Статус задачи: ${data.state}`;
+        }
+    }
+
+    function poll() {
+        fetch(statusUrl, {headers: {'Accept': 'application/json'}})
+        .then(response => {
+            if (!response.ok) {
+                throw new Error(`Сервер ответил с ошибкой: ${response.status}`);
+            }
+            return response.json();
+        })
+        .then(data => {
+            render(data);
+            if (!data.ready) {
+                setTimeout(poll, POLL_INTERVAL_MS);
+            }
+        })
+        .catch(error => {
+            console.error('Ошибка при получении статуса обновления каталога:', error.message);
+            text.textContent = `⚠️ Не удалось получить статус: ${error.message}`;
+        });
+    }
+
+    poll();
+});
@@ -9,8 +9,9 @@ document.addEventListener('DOMContentLoaded', function() {
     // 1. Получаем все текущие параметры URL (кроме 'page')
     const currentParams = new URLSearchParams(window.location.search);
 
-    // Удаляем параметр 'page', чтобы он не дублировался
+    // Удаляем параметры 'page' и 'cursor', чтобы они не дублировались
     currentParams.delete('page');
+    currentParams.delete('cursor');
 
     // Преобразуем оставшиеся параметры в строку
     let preservedQueryString = currentParams.toString();
@@ -34,4 +35,12 @@ document.addEventListener('DOMContentLoaded', function() {
             link.href = `?page=${pageNumber}${preservedQueryString}`;
         }
     });
+
+    // 4. Кнопки "Предыдущая"/"Следующая" ведут по курсору: data-query уже содержит 'cursor=...' (или 'page=1')
+    paginationContainer.querySelectorAll('a[data-query]').forEach(link => {
+        const query = link.getAttribute('data-query');
+        if (link.getAttribute('href') !== '#' && query) {
+            link.href = `?${query}${preservedQueryString}`;
+        }
+    });
 });
\ No newline at end of file
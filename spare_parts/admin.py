@@ -4,7 +4,7 @@ from django.utils.safestring import mark_safe
 from django.contrib import admin
 from spare_parts.forms import DonorVehicleAdminForm, PartAdminForm
 from spare_parts.models import Part, CarGeneration, CarMake, CarModel, PartImage, DonorVehicle, \
-    DonorVehicleImage, Category, PartSubCategory
+    DonorVehicleImage, Category, PartSubCategory, FeedState, ImportCheckpoint, ImportQuarantine
 
 
 class PartImageInline(admin.TabularInline):
@@ -199,4 +199,21 @@ class PartSubCategoryAdmin(admin.ModelAdmin):
     list_display = ('title', 'category', 'slug')
     list_filter = ('category',)    #Отличный фильтр по главной категории
     search_fields = ('title',)
-    prepopulated_fields = {'slug': ('title',)}    #Автозаполнение ЧПУ из названия
\ No newline at end of file
+    prepopulated_fields = {'slug': ('title',)}    #Автозаполнение ЧПУ из названия
+
+@admin.register(FeedState)
+class FeedStateAdmin(admin.ModelAdmin):
+    list_display = ('feed', 'url', 'etag', 'last_modified', 'imported_at')
+    readonly_fields = ('imported_at',)    #Удаление записи заставит следующий запуск скачать фид целиком
+
+@admin.register(ImportCheckpoint)
+class ImportCheckpointAdmin(admin.ModelAdmin):
+    list_display = ('feed', 'rows_committed', 'prepared_rows', 'body_sha256', 'updated_at')
+    readonly_fields = ('updated_at',)    #Удаление записи заставит следующий запуск импортировать фид с начала
+
+@admin.register(ImportQuarantine)
+class ImportQuarantineAdmin(admin.ModelAdmin):
+    list_display = ('run_id', 'feed', 'row_num', 'record_key', 'error_class', 'created_at')
+    list_filter = ('feed', 'error_class')
+    search_fields = ('run_id', 'record_key', 'error')
+    readonly_fields = ('created_at',)
@@ -0,0 +1,155 @@
+from django.db import connection, transaction
+
+
+SNAPSHOT_SUFFIX = '_prev'    #Теневая копия таблицы каталога до последней атомарной публикации
+PENDING_SNAPSHOT_SUFFIX = '_prev_pending'    #Копия текущей публикации, пока её импорт не принят целиком
+PUBLISHED_SUFFIX = '_published'    #Состояние фидов, с которым опубликован каталог: снимок ещё годен для отката
+
+
+def _snapshot_tables(Part, PartImage, DonorVehicle, DonorVehicleImage, FeedState):
+    """
+    Таблицы снимка и способ их восстановления (таблица, режим, поле-родитель):
+    'merge' — строки снимка возвращаются по id, лишние остаются (на них могут ссылаться заказы);
+    'children' — фото и связи восстанавливаются по id так же, а удаляются только лишние строки запчастей
+    и доноров из снимка (кроме загруженных вручную файлов): фото и связи запчастей, появившихся после снимка,
+    остаются при них; 'replace' — таблица целиком заменяется снимком.
+    Порядок важен: сначала таблицы, на которые ссылаются остальные.
+    """
+    return [(DonorVehicle, 'merge', None), (Part, 'merge', None),
+            (Part.car_generations.through, 'children', 'part'), (PartImage, 'children', 'part'),
+            (DonorVehicleImage, 'children', 'donor_vehicle'), (FeedState, 'replace', None)]
+
+
+def _names(model, suffix=SNAPSHOT_SUFFIX):
+    quote = connection.ops.quote_name
+    table = model._meta.db_table
+    columns = [field.column for field in model._meta.concrete_fields]
+    return quote(table), quote(table + suffix), [quote(column) for column in columns]
+
+
+def snapshot_catalog(Part, PartImage, DonorVehicle, DonorVehicleImage, FeedState):
+    """
+    Сохраняет текущий каталог в таблицы *_prev_pending. Вызывается в начале транзакции публикации, до импорта;
+    снимок *_prev прошлой публикации остаётся на месте, пока publish_catalog_snapshot не заменит его этой копией.
+    Копируются целиком запчасти, доноры, их фото и связи с поколениями (CREATE TABLE AS): время и место на диске
+    растут с каталогом, и всё это время транзакция публикации открыта — цена возможности отката.
+    """
+    with connection.cursor() as cursor:
+        for model, _, _ in _snapshot_tables(Part, PartImage, DonorVehicle, DonorVehicleImage, FeedState):
+            table, pending, _ = _names(model, PENDING_SNAPSHOT_SUFFIX)
+            cursor.execute(f"DROP TABLE IF EXISTS {pending}")
+            cursor.execute(f"CREATE TABLE {pending} AS SELECT * FROM {table}")
+
+
+def publish_catalog_snapshot(Part, PartImage, DonorVehicle, DonorVehicleImage, FeedState):
+    """
+    Импорт публикации принят целиком: копия каталога до неё (*_prev_pending) становится снимком *_prev
+    для rollback_catalog, а состояние фидов после неё запоминается (*_published) — по нему откат проверяет,
+    что каталог с тех пор не менялся. Вызывается в той же транзакции, что и импорт.
+    """
+    with connection.cursor() as cursor:
+        for model, _, _ in _snapshot_tables(Part, PartImage, DonorVehicle, DonorVehicleImage, FeedState):
+            _, snapshot, _ = _names(model)
+            _, pending, _ = _names(model, PENDING_SNAPSHOT_SUFFIX)
+            cursor.execute(f"DROP TABLE IF EXISTS {snapshot}")
+            cursor.execute(f"ALTER TABLE {pending} RENAME TO {snapshot}")
+        table, published, _ = _names(FeedState, PUBLISHED_SUFFIX)
+        cursor.execute(f"DROP TABLE IF EXISTS {published}")
+        cursor.execute(f"CREATE TABLE {published} AS SELECT * FROM {table}")
+
+
+def expire_catalog_snapshot(FeedState):
+    """
+    Каталог меняет обычный (не атомарный) импорт: снимок последней публикации больше не отражает каталог
+    до неё, и rollback_catalog от него откажется. Вызывается до записи.
+    """
+    _, published, _ = _names(FeedState, PUBLISHED_SUFFIX)
+    with connection.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {published}")
+
+
+def has_catalog_snapshot(Part):
+    return Part._meta.db_table + SNAPSHOT_SUFFIX in connection.introspection.table_names()
+
+
+def _snapshot_is_current(cursor, FeedState):
+    """
+    Каталог не менялся после публикации: отметка публикации на месте и состояние фидов совпадает с ней.
+    """
+    if FeedState._meta.db_table + PUBLISHED_SUFFIX not in connection.introspection.table_names(cursor):
+        return False
+    table, published, _ = _names(FeedState, PUBLISHED_SUFFIX)
+    columns = ', '.join(connection.ops.quote_name(column) for column in ('feed', 'body_sha256', 'imported_at'))
+    cursor.execute(f"SELECT count(*) FROM (SELECT {columns} FROM {table} EXCEPT SELECT {columns} FROM {published}) a")
+    changed = cursor.fetchone()[0]
+    cursor.execute(f"SELECT count(*) FROM (SELECT {columns} FROM {published} EXCEPT SELECT {columns} FROM {table}) a")
+    return not changed and not cursor.fetchone()[0]
+
+
+def _merge_rows(cursor, table, snapshot, columns, pk):
+    """
+    Строки снимка возвращаются по id: существующие перезаписываются, удалённые вставляются заново.
+    """
+    column_list = ', '.join(columns)
+    values = [column for column in columns if column != pk]
+    cursor.execute(
+        f"UPDATE {table} SET ({', '.join(values)}) = "
+        f"(SELECT {', '.join(values)} FROM {snapshot} s WHERE s.{pk} = {table}.{pk}) "
+        f"WHERE {pk} IN (SELECT {pk} FROM {snapshot})")
+    cursor.execute(f"INSERT INTO {table} ({column_list}) SELECT {column_list} FROM {snapshot} "
+                   f"WHERE {pk} NOT IN (SELECT {pk} FROM {table})")
+
+
+def rollback_catalog(stdout, Part, PartImage, DonorVehicle, DonorVehicleImage, FeedState):
+    """
+    Возвращает каталог к снимку, сохранённому перед последней атомарной публикацией, одной транзакцией.
+    Запчасти и доноры из снимка восстанавливаются по id; запчасти, появившиеся после снимка, снимаются
+    с продажи (удалять их нельзя — на них могут ссылаться заказы). Фото и связи с поколениями запчастей
+    и доноров из снимка восстанавливаются по id, их более поздние строки удаляются (кроме загруженных вручную
+    файлов); фото и связи остальных запчастей не трогаются. Состояние фидов заменяется снимком, поэтому
+    следующий запуск снова сравнит фиды с восстановленным каталогом.
+    Если после публикации каталог менял обычный импорт, снимок устарел — откат отменяется.
+    После отката снимок удаляется: повторный откат вернул бы тот же, уже устаревший каталог.
+    Возвращает {таблица: строк в снимке} или None, если откат не выполнен.
+    """
+    if not has_catalog_snapshot(Part):
+        stdout.write("❌ Снимок каталога не найден: атомарной публикации ещё не было или откат к ней уже выполнен.")
+        return None
+    restored = {}
+    tables = _snapshot_tables(Part, PartImage, DonorVehicle, DonorVehicleImage, FeedState)
+    with transaction.atomic(), connection.cursor() as cursor:
+        if not _snapshot_is_current(cursor, FeedState):
+            stdout.write("❌ После атомарной публикации каталог обновлялся обычным импортом: снимок устарел, "
+                         "откат отменён.")
+            return None
+        for model, mode, parent in tables:
+            table, snapshot, columns = _names(model)
+            pk = connection.ops.quote_name(model._meta.pk.column)
+            if mode == 'replace':
+                column_list = ', '.join(columns)
+                cursor.execute(f"DELETE FROM {table}")
+                cursor.execute(f"INSERT INTO {table} ({column_list}) SELECT {column_list} FROM {snapshot}")
+            elif mode == 'children':
+                field = model._meta.get_field(parent)
+                _, parent_snapshot, _ = _names(field.related_model)
+                parent_pk = connection.ops.quote_name(field.related_model._meta.pk.column)
+                uploaded = "AND (image IS NULL OR image = '')" if model in (PartImage, DonorVehicleImage) else ''
+                cursor.execute(f"DELETE FROM {table} "
+                               f"WHERE {connection.ops.quote_name(field.column)} IN "
+                               f"(SELECT {parent_pk} FROM {parent_snapshot}) "
+                               f"AND {pk} NOT IN (SELECT {pk} FROM {snapshot}) {uploaded}")
+                _merge_rows(cursor, table, snapshot, columns, pk)
+            else:
+                _merge_rows(cursor, table, snapshot, columns, pk)
+                if model is Part:
+                    cursor.execute(f"UPDATE {table} SET is_active = FALSE, feed_hash = NULL, "
+                                   f"deactivated_by_sweep = deactivated_by_sweep OR is_active "
+                                   f"WHERE {pk} NOT IN (SELECT {pk} FROM {snapshot})")
+            cursor.execute(f"SELECT count(*) FROM {snapshot}")
+            restored[model._meta.db_table] = cursor.fetchone()[0]
+        for model, _, _ in tables:
+            cursor.execute(f"DROP TABLE {_names(model)[1]}")
+        cursor.execute(f"DROP TABLE {_names(FeedState, PUBLISHED_SUFFIX)[1]}")
+    for table, count in restored.items():
+        stdout.write(f"✅ {table}: восстановлено из снимка строк — {count}")
+    return restored
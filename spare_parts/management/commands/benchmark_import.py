@@ -0,0 +1,135 @@
+import io
+import json
+import os
+import resource
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+import pandas as pd
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from spare_parts.management.feed_io import download_feed, FEED_SEPARATOR
+from spare_parts.management.synthetic_feeds import write_synthetic_donors, write_synthetic_parts
+
+
+BENCHMARK_RESULTS_FILE = settings.BASE_DIR / "benchmark_results.jsonl"    #Результаты копятся построчно между релизами
+BENCHMARK_SIZES = '1000,10000,100000'
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+@contextmanager
+def _feed_server(directory):
+    """
+    Локальный HTTP-сервер вместо сервера поставщика. Отдаёт URL каталога.
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', 0), partial(_QuietHandler, directory=directory))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        yield f"http://127.0.0.1:{server.server_port}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def _peak_rss_mb():
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)    #ru_maxrss в Linux — в КБ
+
+
+class Command(BaseCommand):
+    help = ('Бенчмарк конвейера импорта на синтетических фидах: время, строки/с, число запросов '
+            'и пиковая память по этапам (скачивание, декодирование, преобразование, импорт).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default=BENCHMARK_SIZES,
+                            help='Размеры фида запчастей через запятую (например, 1000,10000,100000,1000000).')
+        parser.add_argument('--results', default=str(BENCHMARK_RESULTS_FILE),
+                            help='JSONL-файл, в который дописываются результаты.')
+        parser.add_argument('--label', default='', help='Метка прогона (например, версия релиза).')
+        parser.add_argument('--seed', type=int, default=42, help='Зерно генератора синтетических фидов.')
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',') if size.strip()]
+        for rows in sizes:
+            result = self._run(rows, options['seed'])
+            result['label'] = options['label']
+            with open(options['results'], 'a', encoding='utf-8') as f:
+                f.write(json.dumps(result, ensure_ascii=False) + '\n')
+            self._print(result)
+        self.stdout.write(self.style.SUCCESS(f"✅ Результаты дописаны в {options['results']}"))
+
+    def _run(self, rows, seed):
+        """
+        Один прогон: фиды генерируются во временный каталог и раздаются локальным сервером.
+        Импорт выполняется в транзакции, которая откатывается: каталог после бенчмарка не меняется.
+        Пиковая память — максимум RSS процесса к концу этапа (нарастающий итог).
+        """
+        from spare_parts.category_mapping import CATEGORY_MAPPING, GENERATION_MODELS, TRANSMISSION_MAP, \
+            CATEGORY_SLUG_MAP
+        from spare_parts.management.fetch_prepare_parts import _prepare_parts_frame, _get_generation_mapping, \
+            _get_flat_category_mapping
+        from spare_parts.management.fetch_prepare_donors import _prepare_donors_frame
+        from spare_parts.management.import_to_db import import_donors_to_db, import_parts_to_db
+        from spare_parts.models import CarMake, CarModel, CarGeneration, PartSubCategory, Part, DonorVehicle, \
+            Category, PartImage, DonorVehicleImage
+
+        donors = max(rows // 100, 1)
+        stages = {}
+        quiet = io.StringIO()    #Сообщения импорта в бенчмарке не нужны
+
+        @contextmanager
+        def stage(name, stage_rows):
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                yield
+                seconds = time.perf_counter() - start
+            stages[name] = {'seconds': round(seconds, 3), 'rows': stage_rows,
+                            'rows_per_sec': round(stage_rows / seconds, 1) if seconds > 0 else None,
+                            'queries': len(queries), 'peak_rss_mb': _peak_rss_mb()}
+
+        with tempfile.TemporaryDirectory() as directory:
+            donor_refs = write_synthetic_donors(os.path.join(directory, 'donors.csv'), donors, seed)
+            write_synthetic_parts(os.path.join(directory, 'parts.csv'), rows, donor_refs, seed)
+            with _feed_server(directory) as base_url:
+                with stage('download', rows + donors):
+                    feeds = {key: download_feed(f"{base_url}/{key}.csv") for key in ('donors', 'parts')}
+            try:
+                with stage('decode', rows + donors):
+                    frames = {key: pd.read_csv(feed['path'], delimiter=FEED_SEPARATOR, encoding=feed['encoding'])
+                              for key, feed in feeds.items()}
+            finally:
+                for feed in feeds.values():
+                    os.remove(feed['path'])
+
+        with stage('transform', rows + donors):
+            GENERATION_MODELS_SET = _get_generation_mapping(GENERATION_MODELS)
+            FLAT_MAPPING = _get_flat_category_mapping(CATEGORY_MAPPING)
+            donors_df = _prepare_donors_frame(frames['donors'], GENERATION_MODELS_SET, FLAT_MAPPING)
+            parts_df = _prepare_parts_frame(frames['parts'], GENERATION_MODELS_SET, FLAT_MAPPING)
+
+        with transaction.atomic():
+            with stage('import_donors', donors):
+                import_donors_to_db(quiet, CarMake, CarModel, CarGeneration, DonorVehicle, DonorVehicleImage,
+                                    TRANSMISSION_MAP, df=donors_df)
+            with stage('import_parts', rows):
+                import_parts_to_db(quiet, CarMake, CarModel, CarGeneration, DonorVehicle, Category,
+                                   PartSubCategory, Part, PartImage, CATEGORY_SLUG_MAP, df=parts_df)
+            transaction.set_rollback(True)
+
+        return {'started_at': timezone.now().isoformat(), 'rows': rows, 'donors': donors,
+                'database': connection.vendor, 'stages': stages}
+
+    def _print(self, result):
+        self.stdout.write(self.style.WARNING(f"\n Фид запчастей: {result['rows']} строк, доноров: {result['donors']}"))
+        for name, metrics in result['stages'].items():
+            self.stdout.write(f"   {name:<14} {metrics['seconds']:>9.3f} с  {metrics['rows_per_sec'] or 0:>11.1f} строк/с  "
+                              f"запросов: {metrics['queries']:<6} RSS: {metrics['peak_rss_mb']} МБ")
@@ -0,0 +1,97 @@
+import random
+import time
+import numpy as np
+import pandas as pd
+from django.core.management.base import BaseCommand
+from spare_parts.management.transforms import extract_model_generation, get_category_info, \
+    extract_model_generation_vectorized, get_category_title_vectorized
+
+
+SYNTHETIC_MODELS = ['Logan', 'Camry', 'Octavia', 'Vesta', 'Granta', 'X-Ray', 'Creta 2']    #Модели вне GENERATION_MODELS
+SYNTHETIC_NAMES = ['Фильтр салона', 'Коврик в багажник', 'Брызговик задний', 'Насос ГУР б/у']    #Наименования вне CATEGORY_MAPPING
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает построчные и векторные преобразования фида на синтетических данных (скорость и результат).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100000, help='Число строк синтетического фида.')
+        parser.add_argument('--seed', type=int, default=42, help='Зерно генератора случайных чисел.')
+
+    def handle(self, *args, **options):
+        from spare_parts.category_mapping import CATEGORY_MAPPING, GENERATION_MODELS
+        from spare_parts.management.fetch_prepare_parts import _get_generation_mapping, _get_flat_category_mapping
+
+        GENERATION_MODELS_SET = _get_generation_mapping(GENERATION_MODELS)
+        FLAT_MAPPING = _get_flat_category_mapping(CATEGORY_MAPPING)
+        df = self._synthetic_feed(options['rows'], options['seed'], GENERATION_MODELS, CATEGORY_MAPPING)
+        self.stdout.write(f"Синтетический фид: {len(df)} строк")
+
+        start = time.perf_counter()
+        legacy = pd.DataFrame(index=df.index)
+        legacy[['model', 'generation']] = df['Модель'].apply(
+            lambda x: pd.Series(extract_model_generation(x, GENERATION_MODELS_SET)))
+        legacy['category'] = df['Наименование'].apply(lambda x: get_category_info(x, FLAT_MAPPING)[1])
+        legacy_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        vectorized = pd.DataFrame(index=df.index)
+        vectorized['model'], vectorized['generation'] = extract_model_generation_vectorized(
+            df['Модель'], GENERATION_MODELS_SET)
+        vectorized['category'] = get_category_title_vectorized(df['Наименование'], FLAT_MAPPING)
+        vectorized_time = time.perf_counter() - start
+
+        self.stdout.write(f"Построчно: {legacy_time:.3f} с")
+        self.stdout.write(f"Векторно:  {vectorized_time:.3f} с")
+        self.stdout.write(f"Ускорение: x{legacy_time / max(vectorized_time, 1e-9):.1f}")
+
+        mismatches = self._mismatches(legacy, vectorized)
+        if mismatches:
+            for column, count in mismatches.items():
+                self.stdout.write(self.style.ERROR(f"❌ Колонка '{column}': расхождений {count}"))
+            return
+        self.stdout.write(self.style.SUCCESS('✅ Результаты построчной и векторной версий совпадают'))
+
+    @staticmethod
+    def _synthetic_feed(rows, seed, GENERATION_MODELS, CATEGORY_MAPPING):
+        """
+        Фид с моделями из GENERATION_MODELS и вне его, лишними пробелами, разным регистром,
+        знаками препинания в наименованиях и пустыми ячейками.
+        """
+        rng = random.Random(seed)
+        subcategories = [sub for info in CATEGORY_MAPPING.values() for sub in info['subcategories']]
+
+        def model():
+            roll = rng.random()
+            if roll < 0.05:
+                return np.nan
+            value = rng.choice(GENERATION_MODELS) if roll < 0.6 else rng.choice(SYNTHETIC_MODELS)
+            if rng.random() < 0.3:
+                value = '  ' + value.replace(' ', '   ').upper() + ' '
+            return value
+
+        def name():
+            roll = rng.random()
+            if roll < 0.05:
+                return np.nan
+            value = rng.choice(subcategories) if roll < 0.8 else rng.choice(SYNTHETIC_NAMES)
+            if rng.random() < 0.3:
+                value = f" {value.upper()}{rng.choice(['.', '!', ',', ' (б/у)'])} "
+            return value
+
+        return pd.DataFrame({'Модель': [model() for _ in range(rows)],
+                             'Наименование': [name() for _ in range(rows)]})
+
+    @staticmethod
+    def _mismatches(legacy, vectorized):
+        """
+        {колонка: число строк, где результаты различаются}. Пустые значения (None/NaN) считаются равными.
+        """
+        mismatches = {}
+        for column in legacy.columns:
+            left, right = legacy[column], vectorized[column]
+            both_empty = left.isna() & right.isna()
+            different = ~both_empty & (left.astype(str) != right.astype(str))
+            if different.any():
+                mismatches[column] = int(different.sum())
+        return mismatches
@@ -0,0 +1,24 @@
+import os
+from django.core.management.base import BaseCommand
+from spare_parts.management.synthetic_feeds import write_synthetic_donors, write_synthetic_parts
+
+
+class Command(BaseCommand):
+    help = 'Генерирует синтетические фиды поставщика (доноры и запчасти) с настоящими колонками.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000, help='Число строк фида запчастей (1k/10k/100k/1M).')
+        parser.add_argument('--donors', type=int, default=None,
+                            help='Число доноров (по умолчанию — одна сотая от числа запчастей).')
+        parser.add_argument('--out', default='.', help='Каталог для donors.csv и parts.csv.')
+        parser.add_argument('--seed', type=int, default=42, help='Зерно генератора случайных чисел.')
+
+    def handle(self, *args, **options):
+        donors = options['donors'] if options['donors'] is not None else max(options['rows'] // 100, 1)
+        os.makedirs(options['out'], exist_ok=True)
+        donors_path = os.path.join(options['out'], 'donors.csv')
+        parts_path = os.path.join(options['out'], 'parts.csv')
+        donor_refs = write_synthetic_donors(donors_path, donors, options['seed'])
+        write_synthetic_parts(parts_path, options['rows'], donor_refs, options['seed'])
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Фиды сохранены: {donors_path} ({donors} доноров), {parts_path} ({options['rows']} запчастей)"))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from spare_parts.search import fulltext_search_available, refresh_part_search_vectors
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает поисковые векторы всех запчастей (Part.search_vector) — например, после переименования '
+            'марок и моделей в админке, которое не затрагивает сами запчасти.')
+
+    def handle(self, *args, **options):
+        from spare_parts.models import Part
+
+        if not fulltext_search_available():
+            self.stdout.write(self.style.WARNING('⚠️ Полнотекстовый поиск доступен только на PostgreSQL, пересчёт не нужен.'))
+            return
+        updated = refresh_part_search_vectors(Part)
+        self.stdout.write(self.style.SUCCESS(f'✅ Поисковые векторы пересчитаны: {updated} запчастей.'))
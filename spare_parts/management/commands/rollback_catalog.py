@@ -0,0 +1,26 @@
+import os
+import socket
+from django.core.management.base import BaseCommand
+from spare_parts.management.catalog_publish import rollback_catalog
+from spare_parts.management.update_lock import CatalogUpdateLock
+
+
+class Command(BaseCommand):
+    help = ('Возвращает каталог к снимку, сохранённому перед последней атомарной публикацией (update_catalog '
+            '--atomic-publish). Отказывает, если после публикации был обычный импорт; снимок используется один раз.')
+
+    def handle(self, *args, **options):
+        from spare_parts.models import Part, PartImage, DonorVehicle, DonorVehicleImage, FeedState
+
+        lock = CatalogUpdateLock()
+        owner = f"rollback:{socket.gethostname()}:{os.getpid()}"
+        if not lock.acquire(owner):
+            self.stdout.write(self.style.ERROR(f'❌ Выполняется обновление каталога ({lock.holder()}), откат невозможен.'))
+            return
+        try:
+            restored = rollback_catalog(self.stdout, Part, PartImage, DonorVehicle, DonorVehicleImage, FeedState)
+        finally:
+            lock.release(owner)
+        if restored is None:
+            return
+        self.stdout.write(self.style.SUCCESS('Каталог возвращён к предыдущему снимку. '))
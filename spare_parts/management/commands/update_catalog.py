@@ -1,36 +1,62 @@
+import os
+import socket
+from contextlib import nullcontext
 from django.core.management.base import BaseCommand
-from spare_parts.management.fetch_prepare_donors import fetch_and_prepare_donors
-from spare_parts.management.fetch_prepare_parts import fetch_and_prepare_parts
-from spare_parts.management.import_to_db import import_donors_to_db, import_parts_to_db
+from spare_parts.management.progress import ImportCancelled
+from spare_parts.management.update_lock import CatalogUpdateLock
+from spare_parts.management.update_pipeline import run_catalog_update
 
 
 class Command(BaseCommand):
     help = 'Запускает скачивание, обработку и обновление каталога в модульной структуре.'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--export-xlsx', action='store_true',
+                            help='Дополнительно сохранить подготовленные фиды в XLSX для просмотра.')
+        parser.add_argument('--stream', action='store_true',
+                            help='Потоковый режим: скачивание во временный файл и импорт частями.')
+        parser.add_argument('--force', action='store_true',
+                            help='Обработать фиды, даже если они не изменились с последнего импорта.')
+        parser.add_argument('--allow-mass-removal', action='store_true',
+                            help='Снять с продажи пропавшие из фида запчасти, даже если их подозрительно много.')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Пробный запуск: посчитать изменения каталога и сохранить отчёт, ничего не записывая.')
+        parser.add_argument('--atomic-publish', action='store_true',
+                            help='Опубликовать новый каталог одной транзакцией, сохранив прежний для отката '
+                                 '(rollback_catalog). Прежний каталог (запчасти, доноры, фото, связи) копируется '
+                                 'целиком внутри транзакции: на большом каталоге это заметное время и место на диске.')
+        parser.add_argument('--report', default=None,
+                            help='Путь к JSON-отчёту пробного запуска (по умолчанию catalog_dry_run.json).')
+
     def handle(self, *args, **options):
-        try:    #Импорт Django-зависимостей внутри handle()
-            from spare_parts.category_mapping import TRANSMISSION_MAP, CATEGORY_SLUG_MAP, CATEGORY_MAPPING, \
-                GENERATION_MODELS
-            from spare_parts.models import (
-                CarMake, CarModel, CarGeneration, PartSubCategory, Part,
-                DonorVehicle, Category, PartImage, DonorVehicleImage
-            )
-        except ImportError as e:
-            self.stdout.write(self.style.ERROR(f"❌ Критическая ошибка импорта Django-зависимостей: {e}"))
+        lock = CatalogUpdateLock()
+        owner = f"command:{socket.gethostname()}:{os.getpid()}"
+        if not options['dry_run'] and not lock.acquire(owner):    #Пробный запуск каталог не меняет и лок не берёт
+            self.stdout.write(self.style.ERROR(f'❌ Обновление каталога уже выполняется ({lock.holder()}).'))
             return
+        self.stdout.write(self.style.WARNING('\n НАЧАЛО: Обновление каталога '))
+        try:
+            with nullcontext() if options['dry_run'] else lock.heartbeat(owner) as lock_lost:    #Пробный — без лока
+                run_catalog_update(self.stdout, streaming=options['stream'], force=options['force'],
+                                   write_xlsx=options['export_xlsx'],
+                                   on_progress=self.print_progress, allow_mass_removal=options['allow_mass_removal'],
+                                   dry_run=options['dry_run'], report_path=options['report'],
+                                   atomic_publish=options['atomic_publish'], cancel=lock_lost)
+        except ImportCancelled as e:
+            self.stdout.write(self.style.ERROR(f'❌ Лок обновления потерян, обновление остановлено: {e}'))
+            return
+        finally:
+            lock.release(owner)
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS('Пробный запуск завершён, каталог не изменён. '))
+            return
+        self.stdout.write(self.style.SUCCESS('Обновление каталога полностью завершено! '))
 
-        self.stdout.write(self.style.WARNING('\n 1/2. НАЧАЛО: Скачивание и обработка файлов Excel '))    #Скачивание и подготовка файлов
-
-        fetch_and_prepare_donors(self.stdout, self.style, CATEGORY_MAPPING, GENERATION_MODELS)    #Вызов функции для ДОНОРОВ
-        fetch_and_prepare_parts(self.stdout, self.style, CATEGORY_MAPPING, GENERATION_MODELS)    #Вызов функции для ЗАПЧАСТЕЙ
-
-        self.stdout.write(self.style.WARNING(' 1/2. ЗАВЕРШЕНО: Файлы Excel подготовлены \n'))
-        self.stdout.write(self.style.WARNING(' 2/2. НАЧАЛО: Импорт данных в базу Django'))
-
-        import_donors_to_db(self.stdout, self.style, CarMake, CarModel, CarGeneration, DonorVehicle, DonorVehicleImage,
-                            TRANSMISSION_MAP)   #Импорт доноров в БД
-        import_parts_to_db(self.stdout, self.style, CarMake, CarModel, CarGeneration, DonorVehicle, Category,
-                           PartSubCategory, Part, PartImage, CATEGORY_SLUG_MAP)    #Импорт запчастей в БД
-
-        self.stdout.write(self.style.WARNING('\n 2/2. ЗАВЕРШЕНО: Импорт данных в базу '))
-        self.stdout.write(self.style.SUCCESS('Обновление каталога полностью завершено! '))
\ No newline at end of file
+    def print_progress(self, meta):
+        if not meta['processed']:
+            self.stdout.write(self.style.WARNING(f" {meta['stage']}"))    #Начало этапа
+            return
+        total = f"/{meta['total']}" if meta['total'] is not None else ''
+        eta = f", осталось ~{meta['eta_seconds']} с" if meta['eta_seconds'] is not None else ''
+        self.stdout.write(f"   {meta['processed']}{total} строк, {meta['rows_per_sec']} строк/с, "
+                          f"ошибок: {meta['errors']}{eta}")
@@ -0,0 +1,182 @@
+import re
+from django.db import IntegrityError
+from django.utils.text import slugify
+from spare_parts.slugs import SLUG_ALLOCATION_ATTEMPTS, SlugAllocator, fallback_slug
+
+
+def normalize_name(value):
+    """
+    Ключ справочника: схлопнутые пробелы и верхний регистр ('  kia  rio ' -> 'KIA RIO').
+    """
+    return normalize_generation(value).upper()
+
+
+def normalize_generation(value):
+    """
+    Ключ поколения: только схлопнутые пробелы, регистр сохраняется ('XV70', 'Рестайлинг').
+    """
+    return re.sub(r'\s+', ' ', str(value)).strip()
+
+
+class DimensionResolver:
+    """
+    Кэш справочников каталога (марки, модели, поколения, категории, подкатегории) на время одного импорта.
+    Таблицы загружаются в словари один раз, недостающие ключи создаются пачкой,
+    после чего разрешение строки фида — это обращение к словарю без запросов к БД.
+    """
+    def __init__(self, CarMake, CarModel, CarGeneration, Category=None, PartSubCategory=None):
+        self.CarMake = CarMake
+        self.CarModel = CarModel
+        self.CarGeneration = CarGeneration
+        self.Category = Category
+        self.PartSubCategory = PartSubCategory
+        self.make_ids = {}
+        self.model_ids = {}
+        self.generation_ids = {}
+        self.category_ids = {}
+        self.subcategory_ids = {}
+        self.preload()
+
+    @staticmethod
+    def _index(rows, key_func):
+        """
+        Строит {ключ: pk}. При нескольких записях на один ключ побеждает та, чьё имя уже нормализовано,
+        затем — самая ранняя.
+        """
+        index = {}
+        exact = set()
+        for pk, name, key in sorted((pk, name, key_func(*rest, name)) for pk, name, *rest in rows):
+            is_exact = key[-1] == name
+            if key not in index or (is_exact and key not in exact):
+                index[key] = pk
+                if is_exact:
+                    exact.add(key)
+        return index
+
+    def preload(self):
+        """
+        Загружает все справочники в память (по одному запросу на таблицу).
+        """
+        self.make_ids = self._index(self.CarMake.objects.values_list('id', 'name'),
+                                    lambda name: (normalize_name(name),))
+        self.model_ids = self._index(self.CarModel.objects.values_list('id', 'name', 'make_id'),
+                                     lambda make_id, name: (make_id, normalize_name(name)))
+        self.generation_ids = self._index(self.CarGeneration.objects.values_list('id', 'name', 'model_id'),
+                                          lambda model_id, name: (model_id, normalize_generation(name)))
+        if self.Category is not None:
+            self.category_ids = self._index(self.Category.objects.values_list('id', 'name'),
+                                            lambda name: (normalize_name(name),))
+        if self.PartSubCategory is not None:
+            self.subcategory_ids = dict(self.PartSubCategory.objects.values_list('title', 'id'))
+
+    def resolve_vehicles(self, vehicles):
+        """
+        Гарантирует наличие марок, моделей и поколений для набора (марка, модель, поколение).
+        Создаёт только недостающие ключи — не более одного bulk_create на таблицу.
+        """
+        vehicles = {(normalize_name(make), normalize_name(model), normalize_generation(generation))
+                    for make, model, generation in vehicles}
+
+        missing_makes = {make for make, _, _ in vehicles if (make,) not in self.make_ids}
+        if missing_makes:
+            self.CarMake.objects.bulk_create([self.CarMake(name=name) for name in missing_makes],
+                                             ignore_conflicts=True)
+            for pk, name in self.CarMake.objects.filter(name__in=missing_makes).values_list('id', 'name'):
+                self.make_ids[(name,)] = pk
+
+        missing_models = {(self.make_ids[(make,)], model) for make, model, _ in vehicles
+                          if (self.make_ids[(make,)], model) not in self.model_ids}
+        if missing_models:
+            self.CarModel.objects.bulk_create([self.CarModel(make_id=make_id, name=name)
+                                               for make_id, name in missing_models], ignore_conflicts=True)
+            created = self.CarModel.objects.filter(make_id__in={make_id for make_id, _ in missing_models},
+                                                   name__in={name for _, name in missing_models})
+            for pk, make_id, name in created.values_list('id', 'make_id', 'name'):
+                self.model_ids.setdefault((make_id, name), pk)
+
+        missing_generations = {(self.model_id(make, model), generation) for make, model, generation in vehicles
+                               if (self.model_id(make, model), generation) not in self.generation_ids}
+        if missing_generations:
+            self.CarGeneration.objects.bulk_create([self.CarGeneration(model_id=model_id, name=name)
+                                                    for model_id, name in missing_generations])
+            created = self.CarGeneration.objects.filter(
+                model_id__in={model_id for model_id, _ in missing_generations},
+                name__in={name for _, name in missing_generations}).order_by('id')
+            for pk, model_id, name in created.values_list('id', 'model_id', 'name'):
+                self.generation_ids.setdefault((model_id, name), pk)
+
+    def resolve_categories(self, names):
+        """
+        Гарантирует наличие категорий. Категорий единицы, поэтому они создаются через save(),
+        который сам подбирает slug по CATEGORY_SLUG_MAP.
+        """
+        for name in dict.fromkeys(names):
+            key = (normalize_name(name),)
+            if key not in self.category_ids:
+                self.category_ids[key] = self.Category.objects.create(name=name.strip()).pk
+
+    def resolve_subcategories(self, category_by_title):
+        """
+        Гарантирует наличие подкатегорий {название: название категории}. Недостающие создаются одним
+        bulk_create, уникальные slug подбираются SlugAllocator в памяти (один запрос на занятые slug).
+        Строки, отброшенные из-за slug, который успел занять параллельный импорт, создаются повторно.
+        """
+        missing = [title for title in category_by_title if title not in self.subcategory_ids]
+        allocator = SlugAllocator(self.PartSubCategory)
+        for _ in range(SLUG_ALLOCATION_ATTEMPTS):
+            if not missing:
+                return
+            slugs = allocator.allocate_many(slugify(title) or fallback_slug() for title in missing)
+            self.PartSubCategory.objects.bulk_create(
+                [self.PartSubCategory(title=title, slug=slug, category_id=self.category_id(category_by_title[title]))
+                 for title, slug in zip(missing, slugs)], ignore_conflicts=True)
+            self.subcategory_ids.update(self.PartSubCategory.objects.filter(title__in=missing).values_list('title', 'id'))
+            missing = [title for title in missing if title not in self.subcategory_ids]
+            allocator.refresh()
+        if missing:
+            raise IntegrityError(f"Не удалось подобрать уникальный slug для подкатегорий: {', '.join(missing[:5])}")
+
+    def missing_vehicles(self, vehicles):
+        """
+        Что создал бы resolve_vehicles для набора (марка, модель, поколение), без записи в БД.
+        Возвращает (марки, (марка, модель), (марка, модель, поколение)) — множества нормализованных ключей.
+        """
+        makes, models, generations = set(), set(), set()
+        for make, model, generation in vehicles:
+            make, model, generation = normalize_name(make), normalize_name(model), normalize_generation(generation)
+            make_id = self.make_ids.get((make,))
+            model_id = self.model_ids.get((make_id, model)) if make_id is not None else None
+            if make_id is None:
+                makes.add(make)
+            if model_id is None:
+                models.add((make, model))
+            if model_id is None or (model_id, generation) not in self.generation_ids:
+                generations.add((make, model, generation))
+        return makes, models, generations
+
+    def missing_categories(self, names):
+        """
+        Названия категорий, которых нет в справочнике (без записи в БД).
+        """
+        return {normalize_name(name) for name in names if (normalize_name(name),) not in self.category_ids}
+
+    def missing_subcategories(self, titles):
+        """
+        Названия подкатегорий, которых нет в справочнике (без записи в БД).
+        """
+        return {title for title in titles if title not in self.subcategory_ids}
+
+    def make_id(self, make):
+        return self.make_ids[(normalize_name(make),)]
+
+    def model_id(self, make, model):
+        return self.model_ids[(self.make_id(make), normalize_name(model))]
+
+    def generation_id(self, make, model, generation):
+        return self.generation_ids[(self.model_id(make, model), normalize_generation(generation))]
+
+    def category_id(self, name):
+        return self.category_ids[(normalize_name(name),)]
+
+    def subcategory_id(self, title):
+        return self.subcategory_ids[title]
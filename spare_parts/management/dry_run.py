@@ -0,0 +1,246 @@
+import json
+from django.conf import settings
+from django.utils import timezone
+from spare_parts.management.dimension_resolver import DimensionResolver
+from spare_parts.management.import_to_db import BATCH_SIZE, _cell, _chunks, _donor_vehicle, _part_row_problem, \
+    _prepare_part_rows, _relinkable_part_ids, _removed_part_ids, _row_fingerprint, _split_photo_urls, SWEEP_ALWAYS_ALLOWED, \
+    SWEEP_MAX_REMOVED_SHARE
+from spare_parts.management.progress import ImportProgress
+from spare_parts.management.quarantine import RowQuarantine, RowRejected
+
+
+DRY_RUN_REPORT_FILE = settings.BASE_DIR / "catalog_dry_run.json"    #Отчёт пробного запуска по умолчанию
+
+
+def _new_dimensions():
+    return {'makes': set(), 'models': set(), 'generations': set(), 'categories': set(), 'subcategories': set()}
+
+
+def _collect_missing_vehicles(resolver, dimensions, vehicles):
+    makes, models, generations = resolver.missing_vehicles(vehicles)
+    dimensions['makes'] |= makes
+    dimensions['models'] |= models
+    dimensions['generations'] |= generations
+
+
+def _image_changes(ImageModel, owner_field, urls_by_owner):
+    """
+    Сколько URL-фото sync_feed_images добавил бы и удалил бы у существующих владельцев (только чтение).
+    """
+    owner_id_field = f'{owner_field}_id'
+    current = {}
+    for owner_pk, url in ImageModel.objects.filter(**{f'{owner_id_field}__in': urls_by_owner}).exclude(
+            image_url__isnull=True).exclude(image_url='').values_list(owner_id_field, 'image_url'):
+        current.setdefault(owner_pk, []).append(url)
+    added = removed = 0
+    for owner_pk, urls in urls_by_owner.items():
+        owner_urls = current.get(owner_pk, [])
+        added += len(set(urls) - set(owner_urls))
+        removed += len(owner_urls) - len(set(owner_urls) & set(urls))    #Пропавшие из фида и повторы
+    return added, removed
+
+
+def diff_donors(stdout, DonorVehicle, DonorVehicleImage, resolver, dimensions, df=None, chunks=None, progress=None):
+    """
+    Изменения, которые import_donors_to_db внёс бы по фиду доноров, без записи в БД.
+    """
+    chunks = chunks if chunks is not None else [df]
+    progress = progress or ImportProgress()
+    progress.start('Пробный запуск: доноры.', total=len(df) if df is not None else None)
+    known = {vin: (pk, feed_hash) for vin, pk, feed_hash in
+             DonorVehicle.objects.exclude(donor_vin__isnull=True).values_list('donor_vin', 'id', 'feed_hash')}
+    feed_vins = set()
+    new, changed = [], []
+    images_added = images_removed = unchanged = 0
+    feed_complete = True
+    try:
+        for chunk in chunks:
+            urls_by_donor = {}
+            vehicles = []
+            for row in chunk.to_dict('records'):
+                donor_vin = _cell(row, 'Номер').upper()
+                feed_vins.add(donor_vin)
+                pk, known_hash = known.get(donor_vin, (None, None))
+                if pk is not None and known_hash == _row_fingerprint(row):
+                    unchanged += 1
+                    continue
+                vehicle = _donor_vehicle(row)
+                if vehicle is None:
+                    continue
+                vehicles.append(vehicle)
+                if pk is None:
+                    new.append(donor_vin)
+                    images_added += len(_split_photo_urls(_cell(row, 'Фото')))
+                else:
+                    changed.append(donor_vin)
+                    urls_by_donor[pk] = _split_photo_urls(_cell(row, 'Фото'))
+            _collect_missing_vehicles(resolver, dimensions, vehicles)
+            added, removed = _image_changes(DonorVehicleImage, 'donor_vehicle', urls_by_donor)
+            images_added += added
+            images_removed += removed
+            progress.advance(len(chunk))
+    except Exception as e:
+        feed_complete = False
+        stdout.write(f"❌ Ошибка чтения фида доноров, пробный запуск прерван: {e}")
+    progress.flush()
+    removed_vins = sorted(vin for vin, (_, feed_hash) in known.items() if feed_hash and vin not in feed_vins) \
+        if feed_complete else []
+    return {'new': sorted(new), 'changed': sorted(changed), 'unchanged': unchanged, 'removed': removed_vins,
+            'images_added': images_added, 'images_removed': images_removed, 'feed_complete': feed_complete}
+
+
+def diff_parts(stdout, DonorVehicle, Part, PartImage, resolver, dimensions, feed_donor_vins=(), df=None, chunks=None,
+               progress=None):
+    """
+    Изменения, которые import_parts_to_db внёс бы по фиду запчастей, без записи в БД: новые, изменившиеся,
+    снятые с продажи и возвращённые в продажу запчасти, изменения цен и фото, неизвестные доноры.
+    Строки, которые импорт отправил бы в карантин (без артикула, не прошедшие проверку _part_row_problem),
+    отдельной категорией 'rejected': [номер строки, артикул, причина]; в новые и изменившиеся они не попадают.
+    Запчасти из прошлых фидов читаются одним запросом, фото — одним запросом на BATCH_SIZE запчастей.
+    feed_donor_vins — доноры из фида доноров того же запуска: к импорту запчастей они уже будут в БД.
+    """
+    chunks = chunks if chunks is not None else [df]
+    progress = progress or ImportProgress()
+    progress.start('Пробный запуск: запчасти.', total=len(df) if df is not None else None)
+    known = {}
+    unlinked_part_ids = set()
+    for part_id, pk, feed_hash, price, donor_vehicle_id in Part.objects.exclude(part_id__isnull=True).values_list(
+            'part_id', 'id', 'feed_hash', 'price', 'donor_vehicle_id'):
+        known[part_id] = (pk, feed_hash, price)
+        if donor_vehicle_id is None:
+            unlinked_part_ids.add(part_id)
+    swept_part_ids = set(Part.objects.filter(deactivated_by_sweep=True).values_list('part_id', flat=True))
+    known_donor_vins = set(DonorVehicle.objects.exclude(donor_vin__isnull=True).values_list('donor_vin', flat=True))
+    known_donor_vins.update(feed_donor_vins)
+    feed_part_ids = set()
+    new, changed, reactivated, price_changes = [], [], [], []
+    unknown_donors = set()
+    images_added = images_removed = unchanged = 0
+    feed_complete = True
+    quarantine = RowQuarantine('parts')    #Только сбор отклонённых строк: в БД не записывается
+    try:
+        for chunk in chunks:
+            rows = _prepare_part_rows(chunk, stdout, quarantine)
+            feed_part_ids.update(row['part_id'] for row in rows)
+            rows_to_write = []
+            relink = _relinkable_part_ids(rows, unlinked_part_ids, lambda donor_vins: donor_vins & known_donor_vins)
+            for row in rows:
+                pk, known_hash, price = known.get(row['part_id'], (None, None, None))
+                if pk is not None and known_hash == row['feed_hash'] and row['part_id'] not in relink:
+                    unchanged += 1
+                    continue
+                problem = _part_row_problem(row)
+                if problem is not None:
+                    quarantine.add(row['row_num'], row['part_id'], RowRejected(problem), row)
+                    continue
+                rows_to_write.append(row)
+                if pk is None:
+                    new.append(row['part_id'])
+                    images_added += len(row['photo_urls'])
+                    continue
+                changed.append(row['part_id'])
+                if row['part_id'] in swept_part_ids:
+                    reactivated.append(row['part_id'])
+                if price != row['price']:
+                    price_changes.append([row['part_id'], str(price), str(row['price'])])
+            for batch in _chunks(rows_to_write, BATCH_SIZE):
+                added, removed = _image_changes(PartImage, 'part', {known[row['part_id']][0]: row['photo_urls']
+                                                                    for row in batch if row['part_id'] in known})
+                images_added += added
+                images_removed += removed
+            _collect_missing_vehicles(resolver, dimensions,
+                                      ((row['make'], row['model'], row['generation']) for row in rows_to_write))
+            dimensions['categories'] |= resolver.missing_categories(row['category'] for row in rows_to_write)
+            dimensions['subcategories'] |= resolver.missing_subcategories(row['subcategory'] for row in rows_to_write)
+            unknown_donors.update(row['donor_vin'] for row in rows_to_write
+                                  if row['donor_vin'] and row['donor_vin'] not in known_donor_vins)
+            progress.advance(len(chunk))
+    except Exception as e:
+        feed_complete = False
+        stdout.write(f"❌ Ошибка чтения фида запчастей, пробный запуск прерван: {e}")
+    progress.flush()
+
+    known_hashes = {part_id: feed_hash for part_id, (_, feed_hash, _) in known.items()}
+    removed = sorted(_removed_part_ids(known_hashes, feed_part_ids)) if feed_complete else []
+    feed_sourced_count = sum(1 for feed_hash in known_hashes.values() if feed_hash)
+    rejected = [[entry['row_num'], entry['record_key'], entry['error']] for entry in quarantine.entries]
+    return {'new': new, 'changed': changed, 'unchanged': unchanged, 'rejected': rejected, 'removed': removed,
+            'reactivated': reactivated, 'price_changes': price_changes, 'images_added': images_added, 'images_removed': images_removed,
+            'unknown_donors': sorted(unknown_donors), 'feed_complete': feed_complete,
+            'sweep_blocked': len(removed) > max(SWEEP_MAX_REMOVED_SHARE * feed_sourced_count, SWEEP_ALWAYS_ALLOWED)}
+
+
+def _summary(diff):
+    """
+    Счётчики вместо списков: для вывода в консоль и результата задачи.
+    """
+    return {key: len(value) if isinstance(value, list) else value for key, value in diff.items()}
+
+
+def build_dry_run_report(feeds, diffs, dimensions):
+    """
+    Отчёт пробного запуска: {'generated_at', 'feeds': {ключ: 'unchanged' | сводка и списки изменений},
+    'new_dimensions': новые марки, модели, поколения, категории, подкатегории}.
+    """
+    report_feeds = {}
+    for key in feeds:
+        diff = diffs.get(key)
+        report_feeds[key] = diff if diff is None or diff == 'unchanged' else {'summary': _summary(diff), **diff}
+    return {
+        'generated_at': timezone.now().isoformat(),
+        'feeds': report_feeds,
+        'new_dimensions': {
+            'makes': sorted(dimensions['makes']),
+            'models': sorted(' '.join(key) for key in dimensions['models']),
+            'generations': sorted(' '.join(key) for key in dimensions['generations']),
+            'categories': sorted(dimensions['categories']),
+            'subcategories': sorted(dimensions['subcategories']),
+        },
+    }
+
+
+def write_dry_run_report(stdout, report, path=None):
+    """
+    Сохраняет отчёт в JSON и печатает сводку. Возвращает путь к файлу.
+    """
+    path = path or DRY_RUN_REPORT_FILE
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, separators=(',', ':'))
+    for key, diff in report['feeds'].items():
+        if diff is None:
+            stdout.write(f"❌ Фид '{key}': не удалось подготовить.")
+        elif diff == 'unchanged':
+            stdout.write(f"⏭️ Фид '{key}' не изменился с последнего импорта.")
+        else:
+            counts = ', '.join(f"{name}: {value}" for name, value in diff['summary'].items())
+            stdout.write(f"Фид '{key}' — {counts}")
+    dims = ', '.join(f"{name}: {len(values)}" for name, values in report['new_dimensions'].items())
+    stdout.write(f"Новые справочники — {dims}")
+    stdout.write(f"✅ Отчёт пробного запуска сохранён: {path}")
+    return str(path)
+
+
+def run_dry_run(stdout, feeds, results, sources, progress, report_path=None):
+    """
+    Пробный запуск по подготовленным источникам run_catalog_update: набор изменений по обоим фидам
+    и новые справочники без записи в БД. Отчёт сохраняется в JSON, результат — сводка без списков.
+    """
+    from spare_parts.models import CarMake, CarModel, CarGeneration, PartSubCategory, Part, DonorVehicle, \
+        Category, PartImage, DonorVehicleImage
+
+    resolver = DimensionResolver(CarMake, CarModel, CarGeneration, Category, PartSubCategory)    #Только чтение справочников
+    dimensions = _new_dimensions()
+    diffs = dict(results)
+    if 'donors' in sources:
+        diffs['donors'] = diff_donors(stdout, DonorVehicle, DonorVehicleImage, resolver, dimensions,
+                                      progress=progress, **sources['donors'])
+    if 'parts' in sources:
+        feed_donor_vins = diffs['donors']['new'] if isinstance(diffs.get('donors'), dict) else ()
+        diffs['parts'] = diff_parts(stdout, DonorVehicle, Part, PartImage, resolver, dimensions, feed_donor_vins,
+                                    progress=progress, **sources['parts'])
+    report = build_dry_run_report(feeds, diffs, dimensions)
+    path = write_dry_run_report(stdout, report, report_path)
+    summary = {key: diff if diff is None or diff == 'unchanged' else diff['summary']
+               for key, diff in report['feeds'].items()}
+    summary['new_dimensions'] = {name: len(values) for name, values in report['new_dimensions'].items()}
+    return {'dry_run': summary, 'report_path': path}
@@ -0,0 +1,137 @@
+import hashlib
+import os
+import tempfile
+import pandas as pd
+import requests
+from pandas.api.types import is_float_dtype, is_integer_dtype, is_bool_dtype
+
+
+HANDOFF_SEPARATOR = ';'
+HANDOFF_COMPRESSION = {'method': 'gzip', 'compresslevel': 1}    #Быстрое сжатие: файл передачи живёт минуты, размер вторичен
+FEED_SEPARATOR = ';'
+FEED_CHUNK_SIZE = 20000    #Строк фида в одной части при потоковой обработке
+DOWNLOAD_BLOCK_SIZE = 1024 * 1024
+DOWNLOAD_TIMEOUT = (10, 120)    #(подключение, чтение) в секундах
+
+
+def _text(value):
+    """
+    Приводит значение ячейки к строке так же, как это делает импорт (NaN -> '', 3.0 -> '3').
+    """
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def to_text_frame(df):
+    """
+    Переводит подготовленный фрейм в строковый вид. После этого фрейм из памяти и фрейм,
+    прочитанный из файла передачи, совпадают ячейка в ячейку (и дают одинаковые отпечатки строк).
+    """
+    text = {}
+    for column in df.columns:
+        series = df[column]
+        if is_integer_dtype(series) or is_bool_dtype(series):
+            text[column] = series.astype(str)
+        elif is_float_dtype(series):
+            integral = series.notna() & (series % 1 == 0)
+            converted = series.astype(str).where(series.notna(), '')
+            converted[integral] = series[integral].astype('int64').astype(str)
+            text[column] = converted
+        else:
+            text[column] = series.map(_text)
+    return pd.DataFrame(text, index=df.index, columns=df.columns)
+
+
+def write_prepared_feed(df, path, append=False):
+    """
+    Сохраняет подготовленный фид для передачи между шагами (CSV + gzip вместо XLSX).
+    append — дописать часть фида в конец файла (без заголовка, отдельным gzip-блоком).
+    """
+    to_text_frame(df).to_csv(path, sep=HANDOFF_SEPARATOR, index=False, compression=HANDOFF_COMPRESSION,
+                             mode='a' if append else 'w', header=not append)
+
+
+def read_prepared_feed(path):
+    """
+    Читает файл передачи, сохранённый write_prepared_feed. Все колонки — строки, пустые ячейки — ''.
+    """
+    return pd.read_csv(path, sep=HANDOFF_SEPARATOR, dtype=str, keep_default_na=False, compression='gzip')
+
+
+def iter_prepared_feed(path, chunksize=FEED_CHUNK_SIZE):
+    """
+    Читает файл передачи частями по chunksize строк. Индекс сквозной, как у частей iter_feed_chunks.
+    """
+    with pd.read_csv(path, sep=HANDOFF_SEPARATOR, dtype=str, keep_default_na=False, compression='gzip',
+                     chunksize=chunksize) as reader:
+        for chunk in reader:
+            yield chunk
+
+
+def export_xlsx(df, path):
+    """
+    Необязательная человекочитаемая копия подготовленного фида.
+    """
+    df.to_excel(path, index=False)
+
+
+def feed_encoding(headers):
+    """
+    Кодировка фида по заголовку Content-Type: UTF-8, если она объявлена, иначе CP1251 (как отдаёт поставщик).
+    """
+    return 'utf-8-sig' if 'utf-8' in headers.get('content-type', '').lower() else 'windows-1251'
+
+
+def download_feed(url, block_size=DOWNLOAD_BLOCK_SIZE, etag=None, last_modified=None):
+    """
+    Скачивает фид потоково во временный файл, не держа тело ответа в памяти.
+    etag / last_modified — валидаторы прошлой загрузки: они уходят в If-None-Match / If-Modified-Since.
+    Возвращает словарь {url, path, encoding, etag, last_modified, sha256}. При ответе 304 Not Modified
+    path = None и файл не создаётся; иначе файл удаляет вызывающий код.
+    Обрыв соединения или несовпадение с Content-Length — исключение, а не обрезанный фид.
+    """
+    headers = {}
+    if etag:
+        headers['If-None-Match'] = etag
+    if last_modified:
+        headers['If-Modified-Since'] = last_modified
+    fd, path = tempfile.mkstemp(prefix='feed_', suffix='.csv')
+    try:
+        with os.fdopen(fd, 'wb') as file, requests.get(url, stream=True, timeout=DOWNLOAD_TIMEOUT,
+                                                        headers=headers) as response:
+            response.raise_for_status()
+            feed = {'url': url, 'path': path, 'encoding': feed_encoding(response.headers),
+                    'etag': response.headers.get('etag', etag), 'last_modified': response.headers.get(
+                        'last-modified', last_modified), 'sha256': None}
+            if response.status_code == 304:
+                feed['path'] = None
+            else:
+                digest = hashlib.sha256()
+                received = 0
+                for block in response.iter_content(chunk_size=block_size):
+                    file.write(block)
+                    digest.update(block)
+                    received += len(block)
+                expected = response.headers.get('content-length')
+                if expected is not None and 'content-encoding' not in response.headers and int(expected) != received:
+                    raise IOError(f"Фид {url} скачан не полностью: {received} из {expected} байт")
+                feed['sha256'] = digest.hexdigest()
+    except Exception:
+        os.remove(path)
+        raise
+    if feed['path'] is None:
+        os.remove(path)
+    return feed
+
+
+def iter_feed_chunks(path, encoding, chunksize=FEED_CHUNK_SIZE):
+    """
+    Разбирает скачанный CSV-фид частями по chunksize строк. Декодирование идёт по мере чтения файла.
+    Индекс частей сквозной, поэтому номера строк в сообщениях импорта совпадают с номерами в фиде.
+    """
+    with pd.read_csv(path, delimiter=FEED_SEPARATOR, encoding=encoding, chunksize=chunksize) as reader:
+        for chunk in reader:
+            yield chunk
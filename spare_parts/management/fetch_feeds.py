@@ -0,0 +1,92 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from spare_parts.management.feed_io import download_feed
+from spare_parts.management.fetch_prepare_donors import fetch_and_prepare_donors, DONOR_URL
+from spare_parts.management.fetch_prepare_parts import fetch_and_prepare_parts, PARTS_URL
+
+
+FEED_URLS = {'donors': DONOR_URL, 'parts': PARTS_URL}
+
+
+def fetch_and_prepare_feeds(stdout, CATEGORY_MAPPING, GENERATION_MODELS, feeds=None, write_handoff=False,
+                            write_xlsx=False):
+    """
+    Подготавливает фиды доноров и запчастей одновременно (в двух потоках).
+    До импорта фиды независимы, поэтому время шага определяется более медленным фидом, а не суммой.
+    feeds — уже скачанные фиды из downloaded_feeds; неизменившиеся и отсутствующие в feeds фиды не обрабатываются.
+    Без feeds каждый фид скачивается сам. Возвращает (donors_df, parts_df); None на месте фида,
+    который не изменился или который не удалось подготовить.
+    """
+    def prepare(key, fetch_and_prepare):
+        if feeds is None:
+            return fetch_and_prepare(stdout, CATEGORY_MAPPING, GENERATION_MODELS, write_handoff=write_handoff,
+                                     write_xlsx=write_xlsx)
+        if key not in feeds or not feeds[key]['changed']:
+            return None
+        return fetch_and_prepare(stdout, CATEGORY_MAPPING, GENERATION_MODELS, write_handoff=write_handoff,
+                                 write_xlsx=write_xlsx, feed=feeds[key])
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        donors_future = executor.submit(prepare, 'donors', fetch_and_prepare_donors)
+        parts_future = executor.submit(prepare, 'parts', fetch_and_prepare_parts)
+        return donors_future.result(), parts_future.result()
+
+
+def _download(url, state, force):
+    """
+    Условная загрузка по валидаторам прошлого успешного импорта (force — безусловная).
+    """
+    if state is None or force:
+        return download_feed(url)
+    return download_feed(url, etag=state.etag, last_modified=state.last_modified)
+
+
+@contextmanager
+def downloaded_feeds(stdout, FeedState=None, force=False, urls=None):
+    """
+    Одновременно скачивает фиды во временные файлы и отдаёт {ключ: фид} (словари download_feed).
+    feed['changed'] = False, если фид не изменился с последнего успешного импорта: сервер ответил
+    304 Not Modified или тело совпало по SHA-256 с сохранённым в FeedState.
+    Если хотя бы один фид не скачался, остальные файлы удаляются и исключение пробрасывается.
+    Временные файлы удаляются при выходе из блока with.
+    """
+    urls = FEED_URLS if urls is None else urls
+    states = {} if FeedState is None else {state.feed: state for state in FeedState.objects.filter(feed__in=urls)}
+    stdout.write(f"Скачиваю фиды одновременно: {', '.join(urls)}...")
+    with ThreadPoolExecutor(max_workers=len(urls)) as executor:
+        futures = {key: executor.submit(_download, url, states.get(key), force) for key, url in urls.items()}
+    feeds = {}
+    error = None
+    for key, future in futures.items():
+        try:
+            feeds[key] = future.result()
+        except Exception as e:
+            error = error or e
+    try:
+        if error is not None:
+            raise error
+        for key, feed in feeds.items():
+            state = states.get(key)
+            if feed['path'] is None:    #304 Not Modified: тело не пришло, отпечаток прежний
+                feed['sha256'] = state.body_sha256
+                feed['changed'] = False
+            else:
+                feed['changed'] = force or state is None or state.body_sha256 != feed['sha256']
+            if not feed['changed']:
+                stdout.write(f"⏭️ Фид '{key}' не изменился с последнего импорта, обработка пропущена.")
+        yield feeds
+    finally:
+        for feed in feeds.values():
+            if feed['path'] is not None and os.path.exists(feed['path']):
+                os.remove(feed['path'])
+
+
+def save_feed_state(FeedState, key, feed):
+    """
+    Запоминает валидаторы и отпечаток фида. Вызывается только после успешного импорта,
+    иначе следующий запуск пропустил бы фид, который так и не попал в базу.
+    """
+    FeedState.objects.update_or_create(feed=key, defaults={
+        'url': feed['url'], 'etag': feed['etag'], 'last_modified': feed['last_modified'],
+        'body_sha256': feed['sha256']})
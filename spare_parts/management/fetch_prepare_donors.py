@@ -1,12 +1,15 @@
 import pandas as pd
-import requests
-import os, re, io
+import os, re
 from django.conf import settings
 from dotenv import load_dotenv
+from spare_parts.management.feed_io import write_prepared_feed, export_xlsx, download_feed, iter_feed_chunks, \
+    FEED_CHUNK_SIZE, FEED_SEPARATOR
+from spare_parts.management.transforms import extract_model_generation_vectorized, get_category_title_vectorized
 
 load_dotenv()
 DONOR_URL = os.getenv('DONOR_URL')
-DONOR_FILE = settings.BASE_DIR / "donor_cars.xlsx"
+DONOR_FILE = settings.BASE_DIR / "donor_cars.csv.gz"    #Файл передачи подготовленного фида между шагами
+DONOR_XLSX_FILE = settings.BASE_DIR / "donor_cars.xlsx"    #Необязательная копия для просмотра человеком
 
 MODEL_COLUMN_NAME = 'Модель'
 BODY_COLUMN_NAME = 'Кузов'
@@ -26,76 +29,103 @@ def _get_flat_category_mapping(CATEGORY_MAPPING):
     return FLAT_MAPPING
 
 
-def fetch_and_prepare_donors(stdout, CATEGORY_MAPPING, GENERATION_MODELS):
+def _prepare_donors_frame(df, GENERATION_MODELS_SET, FLAT_MAPPING):
     """
-    Скачивает, обрабатывает и сохраняет файл донорских автомобилей.
+    Преобразования фида доноров: кузов, базовая модель/поколение, категория.
+    Строки обрабатываются независимо, поэтому функция одинаково работает с целым фидом и с его частью.
+    Модель/поколение и категория считаются векторно по всей колонке (см. transforms.py).
+    """
+    if BODY_COLUMN_NAME in df.columns:
+        df[BODY_COLUMN_NAME] = df[BODY_COLUMN_NAME].fillna('1')
+        df[BODY_COLUMN_NAME] = df[BODY_COLUMN_NAME].astype(str).str.strip().replace(
+            {'': '1', 'none': '1', 'nan': '1'}, regex=False)
+    else:
+        df[BODY_COLUMN_NAME] = '1'
+
+    if MODEL_COLUMN_NAME in df.columns:
+        df[NEW_MODEL_COLUMN_NAME], df[NEW_GENERATION_COLUMN_NAME] = extract_model_generation_vectorized(
+            df[MODEL_COLUMN_NAME], GENERATION_MODELS_SET)
+    else:
+        df[NEW_MODEL_COLUMN_NAME] = 'N/A'
+        df[NEW_GENERATION_COLUMN_NAME] = 'N/A'
+
+    if NEW_GENERATION_COLUMN_NAME in df.columns and BODY_COLUMN_NAME in df.columns:
+        is_generation_missing = df[NEW_GENERATION_COLUMN_NAME].isna()
+        df.loc[is_generation_missing, NEW_GENERATION_COLUMN_NAME] = df.loc[is_generation_missing, BODY_COLUMN_NAME]
+
+    if NEW_GENERATION_COLUMN_NAME in df.columns:
+        numeric_series = pd.to_numeric(df[NEW_GENERATION_COLUMN_NAME], errors='coerce')
+        df[NEW_GENERATION_COLUMN_NAME] = numeric_series.apply(lambda x: str(int(x)) if pd.notna(x) else None)
+
+    if 'Наименование' in df.columns:
+        df['Категория'] = get_category_title_vectorized(df['Наименование'], FLAT_MAPPING)
+    return df
+
+
+def fetch_and_prepare_donors(stdout, CATEGORY_MAPPING, GENERATION_MODELS, write_handoff=False, write_xlsx=False,
+                             feed=None):
+    """
+    Скачивает и обрабатывает файл донорских автомобилей. Возвращает подготовленный DataFrame (None при ошибке),
+    который передаётся в импорт прямо в памяти. write_handoff — сохранить фид в DONOR_FILE
+    для импорта отдельным шагом, write_xlsx — дополнительно выгрузить копию в DONOR_XLSX_FILE.
     """
     GENERATION_MODELS_SET = _get_generation_mapping(GENERATION_MODELS)
     FLAT_MAPPING = _get_flat_category_mapping(CATEGORY_MAPPING)
 
-    def extract_model_generation(full_model_str):
-        if not isinstance(full_model_str, str): return full_model_str, None
-        normalized_model = re.sub(r'\s+', ' ', full_model_str).strip()
-        normalized_model_lower = normalized_model.lower()
-        if normalized_model_lower in GENERATION_MODELS_SET:
-            model_gen_match = re.search(r'^(.*?)\s*(\d+)$', normalized_model)
-            if model_gen_match:
-                return model_gen_match.group(1).strip(), model_gen_match.group(2)
-        return full_model_str, None
-
-    def get_category_info(product_name):
-        if not isinstance(product_name, str): return 'OTHER', 'Прочие запчасти'
-        name_clean = re.sub(r'[^\w\s]', '', product_name).strip().lower()
-        if name_clean in FLAT_MAPPING:
-            return FLAT_MAPPING[name_clean]['code'], FLAT_MAPPING[name_clean]['title']
-        return 'OTHER', 'Прочие запчасти'
-
     if os.path.exists(DONOR_FILE):
         try:
             os.remove(DONOR_FILE)
             stdout.write(f"🗑️ Старый файл '{DONOR_FILE}' удален.")
         except OSError as e:
             stdout.write(f"❌ Ошибка при удалении файла '{DONOR_FILE}': {e}")
-            return
+            return None
 
-    stdout.write(f"Скачиваю файл с донорскими автомобилями с {DONOR_URL}...")
+    feed_path = None
     try:
-        response = requests.get(DONOR_URL)
-        response.raise_for_status()
-        content = response.content.decode('utf-8') if 'utf-8' in response.headers.get('content-type',
-                                                                                      '').lower() else response.content.decode(
-            'windows-1251')
-        stdout.write("Файл скачан. Начинаю обработку...")
-        df = pd.read_csv(io.StringIO(content), delimiter=';')
-
-        if BODY_COLUMN_NAME in df.columns:
-            df[BODY_COLUMN_NAME] = df[BODY_COLUMN_NAME].fillna('1')
-            df[BODY_COLUMN_NAME] = df[BODY_COLUMN_NAME].astype(str).str.strip().replace(
-                {'': '1', 'none': '1', 'nan': '1'}, regex=False)
-            stdout.write(f"Обработка '{BODY_COLUMN_NAME}' завершена.")
-        else:
-            df[BODY_COLUMN_NAME] = '1'
-
-        if MODEL_COLUMN_NAME in df.columns:
-            df[[NEW_MODEL_COLUMN_NAME, NEW_GENERATION_COLUMN_NAME]] = df[MODEL_COLUMN_NAME].apply(
-                lambda x: pd.Series(extract_model_generation(x)))
-        else:
-            df[NEW_MODEL_COLUMN_NAME] = 'N/A'
-            df[NEW_GENERATION_COLUMN_NAME] = 'N/A'
-
-        if NEW_GENERATION_COLUMN_NAME in df.columns and BODY_COLUMN_NAME in df.columns:
-            is_generation_missing = df[NEW_GENERATION_COLUMN_NAME].isna()
-            df.loc[is_generation_missing, NEW_GENERATION_COLUMN_NAME] = df.loc[is_generation_missing, BODY_COLUMN_NAME]
-
-        if NEW_GENERATION_COLUMN_NAME in df.columns:
-            numeric_series = pd.to_numeric(df[NEW_GENERATION_COLUMN_NAME], errors='coerce')
-            df[NEW_GENERATION_COLUMN_NAME] = numeric_series.apply(lambda x: str(int(x)) if pd.notna(x) else None)
-
-        if 'Наименование' in df.columns:
-            df['Категория'] = df['Наименование'].apply(lambda x: get_category_info(x)[1])
-
-        df.to_excel(DONOR_FILE, index=False)
-        stdout.write(f"✅ Файл доноров сохранен как: {DONOR_FILE}")
+        if feed is None:
+            stdout.write(f"Скачиваю файл с донорскими автомобилями с {DONOR_URL}...")
+            feed = download_feed(DONOR_URL)
+            feed_path = feed['path']    #Скачан здесь — здесь и удаляется
+        stdout.write("Файл доноров скачан. Начинаю обработку...")
+        df = pd.read_csv(feed['path'], delimiter=FEED_SEPARATOR, encoding=feed['encoding'])
+        df = _prepare_donors_frame(df, GENERATION_MODELS_SET, FLAT_MAPPING)
+        stdout.write(f"Обработка '{BODY_COLUMN_NAME}', моделей и поколений завершена.")
+
+        if write_handoff:
+            write_prepared_feed(df, DONOR_FILE)
+            stdout.write(f"✅ Файл доноров сохранен как: {DONOR_FILE}")
+        if write_xlsx:
+            export_xlsx(df, DONOR_XLSX_FILE)
+            stdout.write(f"✅ Копия для просмотра сохранена как: {DONOR_XLSX_FILE}")
+        stdout.write(f"✅ Доноры подготовлены, строк: {len(df)}.")
+        return df
 
     except Exception as e:
-        stdout.write(f"❌ ОШИБКА при обработке доноров: {e}")
\ No newline at end of file
+        stdout.write(f"❌ ОШИБКА при обработке доноров: {e}")
+        return None
+    finally:
+        if feed_path is not None:
+            os.remove(feed_path)
+
+
+def stream_and_prepare_donors(stdout, CATEGORY_MAPPING, GENERATION_MODELS, chunksize=FEED_CHUNK_SIZE, feed=None):
+    """
+    Потоковый вариант fetch_and_prepare_donors: фид скачивается во временный файл и отдаётся
+    подготовленными частями по chunksize строк. Ошибка скачивания или разбора пробрасывается потребителю.
+    feed — уже скачанный фид (результат download_feed); в этом случае файл удаляет вызывающий код.
+    """
+    GENERATION_MODELS_SET = _get_generation_mapping(GENERATION_MODELS)
+    FLAT_MAPPING = _get_flat_category_mapping(CATEGORY_MAPPING)
+
+    downloaded_here = feed is None
+    if feed is None:
+        stdout.write(f"Скачиваю файл с донорскими автомобилями с {DONOR_URL} (потоковый режим)...")
+        feed = download_feed(DONOR_URL)
+    feed_path = feed['path']
+    try:
+        stdout.write("Файл доноров скачан. Начинаю обработку частями...")
+        for chunk in iter_feed_chunks(feed_path, feed['encoding'], chunksize):
+            yield _prepare_donors_frame(chunk, GENERATION_MODELS_SET, FLAT_MAPPING)
+    finally:
+        if downloaded_here:
+            os.remove(feed_path)
@@ -0,0 +1,48 @@
+def sync_feed_images(ImageModel, owner_field, urls_by_owner):
+    """
+    Синхронизирует URL-фотографии пачки владельцев (запчастей или доноров) с фидом.
+    urls_by_owner — {pk владельца: [url, ...]} в порядке фида. На пачку — одно чтение, одна вставка,
+    одно удаление и не более двух UPDATE для is_main, независимо от числа владельцев.
+    Главным становится первое фото из фида, если у владельца нет загруженного вручную главного фото.
+    Загруженные вручную файлы (без URL) не удаляются. Возвращает (добавлено, удалено).
+    """
+    owner_id_field = f'{owner_field}_id'
+    existing = ImageModel.objects.filter(**{f'{owner_id_field}__in': urls_by_owner}).values_list(
+        'id', owner_id_field, 'image_url', 'is_main')
+
+    manual_main = set()    #Владельцы с главным фото, выбранным вручную (файл без URL)
+    kept = {}    #{pk владельца: {url: (id фото, is_main)}}
+    ids_to_delete = []
+    for image_id, owner_pk, url, is_main in existing:
+        if not url:
+            if is_main:
+                manual_main.add(owner_pk)
+        elif url in urls_by_owner[owner_pk] and url not in kept.get(owner_pk, {}):
+            kept.setdefault(owner_pk, {})[url] = (image_id, is_main)
+        else:
+            ids_to_delete.append(image_id)    #Нет в фиде (или повтор того же URL)
+
+    new_images = []
+    ids_to_set_main = []
+    ids_to_unset_main = []
+    for owner_pk, urls in urls_by_owner.items():
+        main_url = urls[0] if urls and owner_pk not in manual_main else None
+        owner_kept = kept.get(owner_pk, {})
+        for url in urls:
+            should_be_main = url == main_url
+            if url not in owner_kept:
+                new_images.append(ImageModel(**{owner_id_field: owner_pk, 'image_url': url,
+                                                'is_main': should_be_main}))
+                continue
+            image_id, is_main = owner_kept[url]
+            if is_main != should_be_main:
+                (ids_to_set_main if should_be_main else ids_to_unset_main).append(image_id)
+
+    if ids_to_delete:
+        ImageModel.objects.filter(id__in=ids_to_delete).delete()
+    if ids_to_unset_main:
+        ImageModel.objects.filter(id__in=ids_to_unset_main).update(is_main=False)
+    if ids_to_set_main:
+        ImageModel.objects.filter(id__in=ids_to_set_main).update(is_main=True)
+    ImageModel.objects.bulk_create(new_images)
+    return len(new_images), len(ids_to_delete)
@@ -0,0 +1,81 @@
+import os
+from django.conf import settings
+from django.utils import timezone
+from spare_parts.management.feed_io import write_prepared_feed, iter_prepared_feed, FEED_CHUNK_SIZE
+
+
+CHECKPOINT_DIR = settings.BASE_DIR / "import_checkpoints"    #Подготовленные фиды незавершённых импортов
+CHECKPOINT_CHUNK_SIZE = FEED_CHUNK_SIZE    #Строк фида между контрольными точками
+
+
+def _remove_file(path):
+    if path and os.path.exists(path):
+        os.remove(path)
+
+
+def open_checkpoint(ImportCheckpoint, key, feed):
+    """
+    Контрольная точка импорта фида key. Если сохранённая точка относится к тому же содержимому фида (SHA-256)
+    и подготовленный фид записан целиком, возвращает (точка, True): импорт продолжится по сохранённому файлу
+    со строки rows_committed. Иначе файл прежней точки удаляется и возвращается (точка, False): фид готовится
+    заново. Для того же содержимого подготовка даёт те же строки, поэтому rows_committed сохраняется.
+    """
+    checkpoint = ImportCheckpoint.objects.filter(feed=key).first()
+    same_feed = checkpoint is not None and checkpoint.body_sha256 == feed['sha256']
+    if same_feed and checkpoint.prepared_rows is not None and os.path.exists(checkpoint.prepared_file):
+        return checkpoint, True
+    if checkpoint is not None:
+        _remove_file(checkpoint.prepared_file)    #Недописанный файл прошлой попытки или файл другого фида
+    os.makedirs(CHECKPOINT_DIR, exist_ok=True)
+    checkpoint, _ = ImportCheckpoint.objects.update_or_create(feed=key, defaults={
+        'body_sha256': feed['sha256'], 'prepared_file': str(CHECKPOINT_DIR / f"{key}-{feed['sha256'][:16]}.csv.gz"),
+        'prepared_rows': None, 'rows_committed': checkpoint.rows_committed if same_feed else 0})
+    return checkpoint, False
+
+
+def persist_prepared_chunks(ImportCheckpoint, checkpoint, chunks):
+    """
+    Пропускает подготовленные части фида к импорту, по пути дописывая их в файл контрольной точки.
+    Когда фид прочитан до конца, точка отмечается как пригодная для продолжения (prepared_rows).
+    """
+    rows = 0
+    for chunk in chunks:
+        write_prepared_feed(chunk, checkpoint.prepared_file, append=rows > 0)
+        rows += len(chunk)
+        yield chunk
+    ImportCheckpoint.objects.filter(pk=checkpoint.pk).update(prepared_rows=rows, updated_at=timezone.now())
+
+
+def persist_prepared_frame(ImportCheckpoint, checkpoint, df, chunksize=None):
+    """
+    Подготовленный фид целиком (не потоковый режим) отдаётся частями по chunksize строк (по умолчанию
+    CHECKPOINT_CHUNK_SIZE), как потоковый: каждая часть дописывается в файл контрольной точки, когда импорт
+    до неё дошёл, а не весь фид заранее.
+    """
+    chunksize = chunksize or CHECKPOINT_CHUNK_SIZE
+    return persist_prepared_chunks(ImportCheckpoint, checkpoint,
+                                   (df.iloc[start:start + chunksize] for start in range(0, len(df), chunksize)))
+
+
+def resumed_chunks(checkpoint):
+    """
+    Части подготовленного фида из файла контрольной точки — вместо повторной подготовки.
+    """
+    return iter_prepared_feed(checkpoint.prepared_file, CHECKPOINT_CHUNK_SIZE)
+
+
+def record_checkpoint(ImportCheckpoint, checkpoint, row_num):
+    """
+    Строки фида до row_num включительно записаны в каталог. Обычный UPDATE: при атомарной публикации
+    он откатывается вместе с импортом, и точка не уходит вперёд незаписанных строк.
+    """
+    ImportCheckpoint.objects.filter(pk=checkpoint.pk).update(rows_committed=row_num, updated_at=timezone.now())
+
+
+def clear_checkpoint(ImportCheckpoint, key):
+    """
+    Импорт фида завершён или фид совпал с уже импортированным: точка и подготовленный фид больше не нужны.
+    """
+    for checkpoint in ImportCheckpoint.objects.filter(feed=key):
+        _remove_file(checkpoint.prepared_file)
+        checkpoint.delete()
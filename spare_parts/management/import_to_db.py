@@ -1,199 +1,757 @@
+import hashlib
+import json
 import uuid
+from decimal import Decimal, InvalidOperation
 import pandas as pd
 from django.db import transaction
-from django.core.exceptions import ObjectDoesNotExist
-from django.utils.text import slugify
 from django.conf import settings
+from spare_parts.management.dimension_resolver import DimensionResolver
+from spare_parts.management.feed_io import read_prepared_feed
+from spare_parts.management.image_sync import sync_feed_images
+from spare_parts.management.pg_copy import copy_backend_available, copy_merge_parts, COPY_BATCH_SIZE
+from spare_parts.management.progress import ImportProgress
+from spare_parts.management.quarantine import RowQuarantine, RowRejected, write_bisecting
+from spare_parts.search import normalize_part_number, refresh_part_search_vectors
 
 
-DONOR_FILE = settings.BASE_DIR / "donor_cars.xlsx"
-PARTS_FILE = settings.BASE_DIR / "catalog_parts.xlsx"
+DONOR_FILE = settings.BASE_DIR / "donor_cars.csv.gz"
+PARTS_FILE = settings.BASE_DIR / "catalog_parts.csv.gz"
 NEW_MODEL_COLUMN_NAME = 'Модель_Базовая'
 NEW_GENERATION_COLUMN_NAME = 'Поколение_Число'
+BATCH_SIZE = 1000    #Количество запчастей, записываемых в БД за одну транзакцию
+PART_UPDATE_FIELDS = ['title', 'description', 'part_number', 'part_number_key', 'category', 'subcategory', 'price',
+                      'condition', 'donor_generation', 'donor_vehicle', 'feed_hash']
+SHARD_ROW_FIELDS = ['row_num', 'part_id', 'title', 'description', 'part_number', 'price', 'condition', 'photo_urls',
+                    'feed_hash', 'generation_id', 'category_id', 'subcategory_id',
+                    'donor_vehicle_id']    #Поля строки, нужные подзадаче шарда
+SWEEP_BATCH_SIZE = 5000    #Артикулов в одном UPDATE снятия с продажи
+SWEEP_MAX_REMOVED_SHARE = 0.3    #Больше этой доли каталога за один запуск не снимаем: вероятно, фид обрезан
+SWEEP_ALWAYS_ALLOWED = 100    #Столько запчастей можно снять всегда, независимо от доли (малые каталоги)
+PART_ROW_LIMITS = {'part_id': 50, 'title': 255, 'part_number': 100, 'condition': 10, 'category': 100, 'make': 100,
+                   'model': 100, 'generation': 255}    #max_length полей, в которые попадают значения строки
+PART_MAX_PRICE = Decimal('100000000')    #Part.price: max_digits=10, decimal_places=2
+PHOTO_URL_MAX_LENGTH = 500
+
+
+def _cell(row, column, default=''):
+    """
+    Возвращает значение ячейки как очищенную строку (пустые ячейки/NaN -> default).
+    """
+    value = row.get(column, default)
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return default
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)    #pandas отдает числовые артикулы/поколения с пропусками как float (3.0 -> '3')
+    return str(value).strip()
 
 
-def import_donors_to_db(stdout, CarMake, CarModel, CarGeneration, DonorVehicle, DonorVehicleImage,
-                        TRANSMISSION_MAP):
+def _price(row):
     """
-    Импорт донорских автомобилей из Excel в БД.
+    Цена из фида в виде Decimal (пустая или нечисловая цена -> 0).
     """
     try:
-        df = pd.read_excel(DONOR_FILE)    #Импорт доноров из предыдущего ответа, использующая DONOR_FILE
-    except FileNotFoundError:
-        stdout.write(f"❌ Ошибка: Файл доноров не найден по пути {DONOR_FILE}. Пропуск импорта.")
-        return
-    donors_created = 0
-    for idx, row in df.iterrows():
-        excel_row_num = idx + 2
-        donor_id_source = str(row.get('Номер', '')).upper().strip()
+        price = Decimal(_cell(row, 'Цена', '0') or '0')
+    except InvalidOperation:
+        return Decimal('0')
+    return price if price.is_finite() else Decimal('0')
 
-        try:
-            with transaction.atomic():
-                make_name = str(row.get('Марка', '')).upper().strip()
-                if not make_name: continue
-                make_obj, _ = CarMake.objects.get_or_create(name=make_name)
-
-                model_name = str(row.get(NEW_MODEL_COLUMN_NAME, '')).upper().strip()
-                if not model_name: continue
-                model_obj, _ = CarModel.objects.get_or_create(make=make_obj, name=model_name)
 
-                generation_name = str(row.get(NEW_GENERATION_COLUMN_NAME, '')).strip()
-                if not generation_name or generation_name.lower() in ['nan', 'none', 'n/a', '']: generation_name = "1"
+def _split_photo_urls(raw_value):
+    """
+    Разбирает колонку 'Фото' в список URL без дубликатов с сохранением порядка.
+    """
+    return list(dict.fromkeys(url.strip() for url in raw_value.split(',') if url.strip()))
 
-                gen_obj, _ = CarGeneration.objects.get_or_create(model=model_obj, name=generation_name)
 
-                transmission_raw = str(row.get('Тип КПП (/automatic/manual/variator)', '')).upper().strip()
-                transmission_type_key = TRANSMISSION_MAP.get(transmission_raw, None)
+def _row_fingerprint(row):
+    """
+    SHA-256 нормализованной строки фида. Не зависит от порядка колонок и от NaN/'' в пустых ячейках.
+    """
+    normalized = {str(column): _cell(row, column) for column in row}
+    payload = json.dumps(normalized, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
 
-                donor_vehicle_obj, created = DonorVehicle.objects.get_or_create(
-                    donor_vin=donor_id_source,
-                    defaults={
-                        'generation': gen_obj,
-                        'description': str(row.get('Описание', '')).strip(),
-                        'production_year': str(row.get('Год', '')).strip(),
-                        'engine_details': str(row.get('Двигатель', '')).strip(),
-                        'color': str(row.get('Цвет', '')).strip(),
-                        'transmission_type': transmission_type_key
-                    }
-                )
 
-                photo_urls = set([url.strip() for url in str(row.get('Фото', '')).split(',') if url.strip()])
+def _clear_removed_fingerprints(model, lookup_field, known_hashes, feed_keys):
+    """
+    Сбрасывает отпечаток у записей, пропавших из фида (при возвращении в фид они импортируются заново).
+    Возвращает количество пропавших записей.
+    """
+    removed = [key for key, feed_hash in known_hashes.items() if feed_hash and key not in feed_keys]
+    for chunk in _chunks(removed, BATCH_SIZE):
+        model.objects.filter(**{f'{lookup_field}__in': chunk}).update(feed_hash=None)
+    return len(removed)
 
-                current_images_queryset = DonorVehicleImage.objects.filter(donor_vehicle=donor_vehicle_obj)
-                current_image_urls = set(current_images_queryset.values_list('image_url', flat=True))
 
-                urls_to_create = photo_urls - current_image_urls    #Определяем URL для создания (в Excel, но нет в DB)
-                urls_to_delete = current_image_urls - photo_urls    #Определяем объекты для удаления (в DB, но нет в Excel)
+def _removed_part_ids(known_hashes, feed_part_ids):
+    """
+    Артикулы запчастей из фида (с отпечатком), которых нет в текущем фиде.
+    """
+    return [part_id for part_id, feed_hash in known_hashes.items() if feed_hash and part_id not in feed_part_ids]
 
-                new_images_to_create = []
-                for url in urls_to_create:
-                    new_images_to_create.append(
-                        DonorVehicleImage(donor_vehicle=donor_vehicle_obj, image_url=url, is_main=False))
-                DonorVehicleImage.objects.bulk_create(new_images_to_create)
 
-                current_images_queryset.filter(
-                    image_url__in=urls_to_delete).delete()    #Выполняем удаление лишних изображений
+def _known_parts(Part):
+    """
+    Запчасти из БД для сравнения с фидом: ({артикул: отпечаток}, артикулы запчастей без донора).
+    """
+    known_hashes = {}
+    unlinked_part_ids = set()
+    for part_id, feed_hash, donor_vehicle_id in Part.objects.exclude(part_id__isnull=True).values_list(
+            'part_id', 'feed_hash', 'donor_vehicle_id'):
+        known_hashes[part_id] = feed_hash
+        if donor_vehicle_id is None:
+            unlinked_part_ids.add(part_id)
+    return known_hashes, unlinked_part_ids
 
-                if created:
-                    donors_created += 1
 
-        except Exception as e:
-            stdout.write(
-                f"❌ Критическая ошибка при импорте Донора {donor_id_source} (строка {excel_row_num}): {e}")
-    stdout.write(f"Импорт донорских автомобилей в БД завершён! Создано новых: {donors_created}")
+def _relinkable_part_ids(rows, unlinked_part_ids, donor_exists):
+    """
+    Артикулы строк, которые надо записать заново, даже если отпечаток не изменился: запчасть сохранена
+    без донора (его ID ещё не было в БД), а теперь донор есть. donor_exists(ID доноров) — какие из них есть.
+    """
+    waiting = {row['part_id']: row['donor_vin'] for row in rows
+               if row['donor_vin'] and row['part_id'] in unlinked_part_ids}
+    if not waiting:
+        return set()
+    found = donor_exists(set(waiting.values()))
+    return {part_id for part_id, donor_vin in waiting.items() if donor_vin in found}
 
 
-def import_parts_to_db(stdout, CarMake, CarModel, CarGeneration, DonorVehicle, Category, PartSubCategory, Part,
-                       PartImage, CATEGORY_SLUG_MAP):
+def _sweep_removed_parts(stdout, Part, removed_part_ids, feed_sourced_count, allow_mass_removal=False):
     """
-    Импорт запчастей из Excel в БД.
+    Снимает с продажи запчасти, пропавшие из фида: is_active=False, отметка deactivated_by_sweep и сброс
+    отпечатка (на каждые SWEEP_BATCH_SIZE артикулов). Вернувшаяся в фид запчасть снова попадёт в импорт
+    и в продажу. Запчасти, уже снятые с продажи вручную, не отмечаются: импорт их в продажу не вернёт.
+    Защита от обрезанного фида: если пропасть должно больше SWEEP_MAX_REMOVED_SHARE запчастей из фида
+    (и больше SWEEP_ALWAYS_ALLOWED), снятие пропускается, пока его не разрешат явно (allow_mass_removal).
+    Возвращает (снято, снятие заблокировано).
     """
-    try:
-        df = pd.read_excel(PARTS_FILE)    #Импорт запчастей из предыдущего ответа, использующая PARTS_FILE
-    except FileNotFoundError:
-        stdout.write(f"❌ Ошибка: Файл запчастей не найден по пути {PARTS_FILE}. Пропуск импорта.")
-        return
-    parts_created = 0
-    parts_updated = 0
-    for idx, row in df.iterrows():
-        excel_row_num = idx + 2
-        donor_vehicle_obj = None
-        part_unique_id = str(row.get('Артикул', str(uuid.uuid4()))).strip()
+    limit = max(SWEEP_MAX_REMOVED_SHARE * feed_sourced_count, SWEEP_ALWAYS_ALLOWED)
+    if len(removed_part_ids) > limit and not allow_mass_removal:
+        stdout.write(f"⚠️ Из фида пропало {len(removed_part_ids)} из {feed_sourced_count} запчастей — похоже "
+                     f"на неполный фид. Снятие с продажи пропущено (разрешить: allow_mass_removal).")
+        return 0, True
+    for chunk in _chunks(removed_part_ids, SWEEP_BATCH_SIZE):
+        Part.objects.filter(part_id__in=chunk, is_active=True).update(is_active=False, deactivated_by_sweep=True,
+                                                                       feed_hash=None)
+        Part.objects.filter(part_id__in=chunk, is_active=False).update(feed_hash=None)
+    return len(removed_part_ids), False
 
-        try:
-            with transaction.atomic():
-                make_name = str(row.get('Марка', '')).upper().strip()
-                if not make_name: continue
-                make_obj, _ = CarMake.objects.get_or_create(name=make_name)
 
-                model_name = str(row.get(NEW_MODEL_COLUMN_NAME, '')).upper().strip()
-                if not model_name: continue
-                model_obj, _ = CarModel.objects.get_or_create(make=make_obj, name=model_name)
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
 
-                generation_name = str(row.get(NEW_GENERATION_COLUMN_NAME, '')).strip()
-                if not generation_name or generation_name.lower() == 'nan': generation_name = "1"
 
-                gen_obj, _ = CarGeneration.objects.get_or_create(model=model_obj, name=generation_name)
-                donor_generation_for_part = gen_obj
+def _prepare_part_rows(df, stdout, quarantine=None):
+    """
+    Нормализует строки фида запчастей. При повторе артикула побеждает последняя строка (как при построчном импорте).
+    Строки без артикула пропускаются: с quarantine они попадают в карантин, иначе — предупреждением в stdout.
+    """
+    rows = {}
+    for idx, row in zip(df.index, df.to_dict('records')):
+        excel_row_num = idx + 2
+        part_unique_id = _cell(row, 'Артикул')
+        if not part_unique_id:
+            if quarantine is None:
+                stdout.write(f"⚠️ Предупреждение: строка {excel_row_num} без артикула пропущена.")
+            else:
+                quarantine.add(excel_row_num, None, RowRejected('строка без артикула'), row)
+            continue
+        make_name = _cell(row, 'Марка').upper()
+        model_name = _cell(row, NEW_MODEL_COLUMN_NAME).upper()
+        if not make_name or not model_name: continue
+        generation_name = _cell(row, NEW_GENERATION_COLUMN_NAME)
+        if not generation_name or generation_name.lower() == 'nan': generation_name = "1"
+        donor_raw = _cell(row, 'Донор')
+        cat_name = _cell(row, 'Категория') or 'Прочие запчасти'
+        title = _cell(row, 'Наименование')
+        rows.pop(part_unique_id, None)    #Перемещаем повторный артикул в конец, чтобы сохранить порядок фида
+        rows[part_unique_id] = {
+            'row_num': excel_row_num,
+            'part_id': part_unique_id,
+            'make': make_name,
+            'model': model_name,
+            'generation': generation_name,
+            'donor_vin': donor_raw.upper() if donor_raw.lower() != 'nan' else '',
+            'category': cat_name,
+            'subcategory': title or f'Подкатегория_{uuid.uuid4().hex[:6]}',
+            'title': title,
+            'description': _cell(row, 'Комментарий'),
+            'part_number': _cell(row, 'Номер производителя'),
+            'price': _price(row),
+            'condition': _cell(row, 'Состояние') or 'used',
+            'photo_urls': _split_photo_urls(_cell(row, 'Фото')),
+            'feed_hash': _row_fingerprint(row),
+        }
+    return list(rows.values())
+
+
+def _part_row_problem(row):
+    """
+    Значение строки, которое БД всё равно отвергнет (длина строки, разрядность цены), или None.
+    Такие строки уходят в карантин до записи и до создания справочников по их значениям.
+    """
+    for key, limit in PART_ROW_LIMITS.items():
+        if len(row[key]) > limit:
+            return f"{key}: длина {len(row[key])} больше {limit}"
+    if abs(row['price']) >= PART_MAX_PRICE:
+        return f"price: {row['price']} не помещается в цену"
+    for url in row['photo_urls']:
+        if len(url) > PHOTO_URL_MAX_LENGTH:
+            return f"photo_urls: адрес длиной {len(url)} больше {PHOTO_URL_MAX_LENGTH}"
+    return None
+
+
+def _donor_vehicle(row):
+    """
+    (марка, модель, поколение) строки фида доноров; None — в строке нет марки или модели.
+    """
+    make_name = _cell(row, 'Марка').upper()
+    model_name = _cell(row, NEW_MODEL_COLUMN_NAME).upper()
+    if not make_name or not model_name:
+        return None
+    generation_name = _cell(row, NEW_GENERATION_COLUMN_NAME)
+    if not generation_name or generation_name.lower() in ['nan', 'none', 'n/a', '']: generation_name = "1"
+    return make_name, model_name, generation_name
 
-                donor_raw = str(row.get('Донор', '')).strip()    #Поиск DonorVehicle
-                if donor_raw and donor_raw.lower() != 'nan':
-                    donor_vin_to_lookup = donor_raw.upper().strip()
-                    try:
-                        donor_vehicle_obj = DonorVehicle.objects.get(donor_vin=donor_vin_to_lookup)
-                    except ObjectDoesNotExist:
-                        stdout.write(
-                            f"⚠️ Предупреждение: Донор ID '{donor_vin_to_lookup}' (строка {excel_row_num}) не найден.")
 
-                cat_name = row.get('Категория', '').strip()
-                cat_name_normalized = (cat_name if cat_name else 'Прочие запчасти').strip()
+def _write_donor(DonorVehicle, TRANSMISSION_MAP, resolver, row, donor_id_source, feed_hash, vehicle):
+    """
+    Создаёт донора или перезаписывает поля существующего значениями строки вместе с её отпечатком:
+    отпечаток, сохранённый без полей, выдал бы устаревшего донора за актуального, и следующий импорт его пропустил бы.
+    Возвращает (pk донора, создан ли). Фото синхронизируются пачкой в _write_donors_batch.
+    """
+    transmission_raw = _cell(row, 'Тип КПП (/automatic/manual/variator)').upper()
+    transmission_type_key = TRANSMISSION_MAP.get(transmission_raw, None)
+
+    donor_vehicle_obj, created = DonorVehicle.objects.update_or_create(
+        donor_vin=donor_id_source,
+        defaults={
+            'generation_id': resolver.generation_id(*vehicle),
+            'description': _cell(row, 'Описание'),
+            'production_year': _cell(row, 'Год') or None,
+            'engine_details': _cell(row, 'Двигатель'),
+            'color': _cell(row, 'Цвет'),
+            'transmission_type': transmission_type_key,
+            'feed_hash': feed_hash,
+        }
+    )
+    return donor_vehicle_obj.pk, created
+
+
+def _write_donors_part(DonorVehicle, DonorVehicleImage, TRANSMISSION_MAP, resolver, items):
+    """
+    Записывает доноров части пачки и синхронизирует их фото одним sync_feed_images. Возвращает (создано, обновлено).
+    """
+    created_count = 0
+    urls_by_donor = {}
+    for excel_row_num, row, donor_id_source, feed_hash, vehicle in items:
+        donor_pk, created = _write_donor(DonorVehicle, TRANSMISSION_MAP, resolver, row, donor_id_source, feed_hash,
+                                         vehicle)
+        urls_by_donor[donor_pk] = _split_photo_urls(_cell(row, 'Фото'))
+        created_count += created
+    sync_feed_images(DonorVehicleImage, 'donor_vehicle', urls_by_donor)
+    return created_count, len(items) - created_count
+
+
+def _write_donors_batch(DonorVehicle, DonorVehicleImage, TRANSMISSION_MAP, resolver, batch):
+    """
+    Записывает пачку доноров в одной транзакции через write_bisecting: чистая пачка — одна точка сохранения,
+    донор с ошибкой отсекается делением пачки пополам, остальные записываются.
+    Возвращает (создано, обновлено, [(строка пачки, ошибка), ...]).
+    """
+    rejected = []
+    with transaction.atomic():
+        results = write_bisecting(
+            lambda items: _write_donors_part(DonorVehicle, DonorVehicleImage, TRANSMISSION_MAP, resolver, items),
+            batch, lambda item, e: rejected.append((item, e)))
+    created_count = sum(created for _, (created, _) in results)
+    updated_count = sum(updated for _, (_, updated) in results)
+    return created_count, updated_count, rejected
+
 
+def import_donors_to_db(stdout, CarMake, CarModel, CarGeneration, DonorVehicle, DonorVehicleImage,
+                        TRANSMISSION_MAP, full_refresh=False, df=None, chunks=None, progress=None, run_id=None,
+                        feed_sha256=None, deferred_quarantine=None):
+    """
+    Импорт донорских автомобилей в БД из подготовленного фида (df) или, если он не передан, из DONOR_FILE.
+    chunks — итератор подготовленных частей фида (потоковый режим) вместо df.
+    Обрабатываются только новые доноры и доноры с изменившимся отпечатком строки фида (full_refresh — все).
+    progress — ImportProgress, в который отчитывается каждая строка фида.
+    Строки, которые не удалось записать, собираются в карантин (ImportQuarantine) с ключом запуска run_id;
+    feed_sha256 — SHA-256 фида, по которому карантин не дублирует строки повторного импорта того же фида.
+    deferred_quarantine — список, в который карантин добавляется вместо записи (см. RowQuarantine.defer).
+    """
+    if chunks is None:
+        if df is None:
+            try:
+                df = read_prepared_feed(DONOR_FILE)    #Файл передачи, сохранённый fetch_and_prepare_donors(write_handoff=True)
+            except FileNotFoundError:
+                stdout.write(f"❌ Ошибка: Файл доноров не найден по пути {DONOR_FILE}. Пропуск импорта.")
+                return
+        chunks = [df]
+    progress = progress or ImportProgress()
+    progress.start('Импорт доноров.', total=len(df) if df is not None else None)
+    known_hashes = dict(DonorVehicle.objects.exclude(donor_vin__isnull=True).values_list('donor_vin', 'feed_hash'))
+    resolver = None
+    feed_vins = set()
+    feed_complete = True
+    donors_created = 0
+    donors_updated = 0
+    donors_unchanged = 0
+    donors_failed = 0
+    quarantine = RowQuarantine('donors', run_id, feed_sha256)
+    try:
+        for chunk in chunks:
+            rows = []
+            for idx, row in zip(chunk.index, chunk.to_dict('records')):
+                donor_id_source = _cell(row, 'Номер').upper()
+                feed_vins.add(donor_id_source)
+                feed_hash = _row_fingerprint(row)
+                if not full_refresh and known_hashes.get(donor_id_source) == feed_hash:
+                    donors_unchanged += 1
+                    progress.advance()
+                    continue
+                vehicle = _donor_vehicle(row)
+                if vehicle is None:
+                    progress.advance()
+                    continue
+                rows.append((idx + 2, row, donor_id_source, feed_hash, vehicle))
+            if not rows:
+                continue
+
+            try:
+                if resolver is None:
+                    resolver = DimensionResolver(CarMake, CarModel, CarGeneration)
+                resolver.resolve_vehicles(vehicle for *_, vehicle in rows)    #Все марки/модели/поколения части за раз
+            except Exception as e:
+                stdout.write(f"❌ Критическая ошибка при подготовке справочников: {e}")
+                for excel_row_num, row, donor_id_source, *_ in rows:
+                    quarantine.add(excel_row_num, donor_id_source, e, row)
+                donors_failed += len(rows)
+                progress.advance(len(rows), errors=len(rows))
+                continue
+
+            for batch in _chunks(rows, BATCH_SIZE):
                 try:
-                    category_obj = Category.objects.get(name__iexact=cat_name_normalized)
-                except ObjectDoesNotExist:
-                    base_cat_slug = CATEGORY_SLUG_MAP.get(cat_name_normalized.upper(), None)
-                    if not base_cat_slug: base_cat_slug = slugify(cat_name_normalized) or str(uuid.uuid4())[:8]
-                    cat_slug = base_cat_slug
-                    cat_counter = 1
-                    while Category.objects.filter(slug=cat_slug).exists():
-                        unique_suffix = f"-{cat_counter}" if cat_counter > 0 else ""
-                        cat_slug = f"{base_cat_slug}{unique_suffix}"
-                        cat_counter += 1
-                    category_obj = Category.objects.create(name=cat_name_normalized, slug=cat_slug)
-
-                subcat_name = str(row.get('Наименование', '')).strip() or f'Подкатегория_{uuid.uuid4().hex[:6]}'
-                base_slug = slugify(subcat_name) or str(uuid.uuid4())[:8]
-                slug = base_slug
-                counter = 1
-                while PartSubCategory.objects.filter(slug=slug).exists():
-                    slug = f"{base_slug}-{counter}"
-                    counter += 1
-                subcat_obj, _ = PartSubCategory.objects.get_or_create(title=subcat_name,
-                                                                      defaults={'category': category_obj, 'slug': slug})
-                part_number = str(row.get('Номер производителя', '')).strip()
-
-                part_obj, created = Part.objects.update_or_create(
-                    part_id=part_unique_id,
-                    defaults={
-                        'title': str(row.get('Наименование', '')).strip(),
-                        'description': str(row.get('Комментарий', '')).strip(),
-                        'part_number': part_number,
-                        'category': category_obj,
-                        'subcategory': subcat_obj,
-                        'price': row.get('Цена', 0),
-                        'condition': str(row.get('Состояние', 'used')).strip(),
-                        'donor_generation': donor_generation_for_part,
-                        'donor_vehicle': donor_vehicle_obj,
-                    }
-                )
-                part_obj.car_generations.set([gen_obj])
-
-                photo_urls = set([url.strip() for url in str(row.get('Фото', '')).split(',') if url.strip()])
-                current_images_queryset = PartImage.objects.filter(part=part_obj)
-                current_image_urls = set(current_images_queryset.values_list('image_url', flat=True))
-
-                urls_to_create = photo_urls - current_image_urls    #Определяем URL для создания (в Excel, но нет в DB)
-                urls_to_delete = current_image_urls - photo_urls    #Определяем объекты для удаления (в DB, но нет в Excel)
-
-                new_images_to_create = []
-                for url in urls_to_create:
-                    new_images_to_create.append(PartImage(part=part_obj, image_url=url, is_main=False))
-                PartImage.objects.bulk_create(new_images_to_create)
-
-                current_images_queryset.filter(
-                    image_url__in=urls_to_delete).delete()    #Выполняем удаление лишних изображений
-                if urls_to_delete:
-                    stdout.write(f"❌ НА УДАЛЕНИЕ")
-                if created:
-                    parts_created += 1
-                else:
-                    parts_updated += 1
+                    created, updated, rejected = _write_donors_batch(DonorVehicle, DonorVehicleImage,
+                                                                     TRANSMISSION_MAP, resolver, batch)
+                except Exception as e:    #Синхронизация фото или COMMIT: пачка не записана целиком
+                    created, updated, rejected = 0, 0, [(item, e) for item in batch]
+                for (excel_row_num, row, donor_id_source, *_), e in rejected:
+                    quarantine.add(excel_row_num, donor_id_source, e, row)
+                failed = len(rejected)
+                donors_created += created
+                donors_updated += updated
+                donors_failed += failed
+                progress.advance(len(batch), errors=failed)
+    except Exception as e:
+        feed_complete = False    #Фид оборвался на середине: пропавшими считать некого
+        stdout.write(f"❌ Ошибка чтения фида доноров, импорт прерван: {e}")
+
+    progress.flush()
+    quarantine.defer(stdout, deferred_quarantine)
+    donors_removed = _clear_removed_fingerprints(DonorVehicle, 'donor_vin', known_hashes, feed_vins) \
+        if feed_complete else 0
+    stdout.write(f"Импорт донорских автомобилей в БД завершён! Создано новых: {donors_created}")
+    stdout.write(f"Обновлено: {donors_updated}, без изменений: {donors_unchanged}, пропало из фида: {donors_removed}")
+    if donors_failed:
+        stdout.write(f"⚠️ Не удалось импортировать доноров: {donors_failed}")
+    return {'created': donors_created, 'updated': donors_updated, 'unchanged': donors_unchanged,
+            'removed': donors_removed, 'failed': donors_failed, 'feed_complete': feed_complete}
 
-        except Exception as e:
+
+def _resolve_part_rows(resolver, DonorVehicle, rows, stdout):
+    """
+    Проставляет в строки id поколения, категории, подкатегории и донора.
+    Недостающие справочники создаются пачкой, дальше каждая строка — обращение к словарям резолвера.
+    """
+    resolver.resolve_vehicles((row['make'], row['model'], row['generation']) for row in rows)
+    resolver.resolve_categories(row['category'] for row in rows)
+    category_by_subcat = {}
+    for row in rows:
+        category_by_subcat.setdefault(row['subcategory'], row['category'])
+    resolver.resolve_subcategories(category_by_subcat)
+
+    donor_ids = {}
+    donor_vins = {row['donor_vin'] for row in rows if row['donor_vin']}
+    for donor_vin, pk in DonorVehicle.objects.filter(donor_vin__in=donor_vins).order_by('id').values_list(
+            'donor_vin', 'id'):
+        donor_ids.setdefault(donor_vin, pk)
+
+    for row in rows:
+        row['generation_id'] = resolver.generation_id(row['make'], row['model'], row['generation'])
+        row['category_id'] = resolver.category_id(row['category'])
+        row['subcategory_id'] = resolver.subcategory_id(row['subcategory'])
+        row['donor_vehicle_id'] = donor_ids.get(row['donor_vin'])
+        if row['donor_vin'] and row['donor_vehicle_id'] is None:
             stdout.write(
-                f"❌ Критическая ошибка при обработке строки {excel_row_num} (ID: {part_unique_id}): {e}")
-            pass
+                f"⚠️ Предупреждение: Донор ID '{row['donor_vin']}' (строка {row['row_num']}) не найден.")
+
+
+def _sync_part_generations(Part, part_pks_to_generation):
+    """
+    Аналог part.car_generations.set([gen]) для пачки запчастей: одно чтение, одно удаление, одна вставка.
+    """
+    through = Part.car_generations.through
+    existing = through.objects.filter(part_id__in=part_pks_to_generation).values_list('id', 'part_id',
+                                                                                      'cargeneration_id')
+    linked = set()
+    ids_to_delete = []
+    for link_id, part_pk, generation_id in existing:
+        if part_pks_to_generation[part_pk] == generation_id:
+            linked.add(part_pk)
+        else:
+            ids_to_delete.append(link_id)
+    if ids_to_delete:
+        through.objects.filter(id__in=ids_to_delete).delete()
+    through.objects.bulk_create([through(part_id=part_pk, cargeneration_id=generation_id)
+                                 for part_pk, generation_id in part_pks_to_generation.items()
+                                 if part_pk not in linked])
+
+
+def _write_parts_batch(Part, PartImage, batch):
+    """
+    Записывает пачку запчастей: upsert по part_id, связи с поколениями и фото, возврат в продажу вернувшихся в фид.
+    Возвращает (создано, обновлено, удалено фото).
+    """
+    part_ids = [row['part_id'] for row in batch]
+    existing_part_ids = set(Part.objects.filter(part_id__in=part_ids).values_list('part_id', flat=True))
+    Part.objects.bulk_create(
+        [Part(part_id=row['part_id'], title=row['title'], description=row['description'],
+              part_number=row['part_number'], part_number_key=normalize_part_number(row['part_number']),
+              category_id=row['category_id'], subcategory_id=row['subcategory_id'],
+              price=row['price'], condition=row['condition'], donor_generation_id=row['generation_id'],
+              donor_vehicle_id=row['donor_vehicle_id'], feed_hash=row['feed_hash']) for row in batch],
+        update_conflicts=True,
+        unique_fields=['part_id'],
+        update_fields=PART_UPDATE_FIELDS,
+    )
+    Part.objects.filter(part_id__in=part_ids, deactivated_by_sweep=True).update(
+        is_active=True, deactivated_by_sweep=False)    #Снятые импортом как пропавшие из фида вернулись в фид
+    part_pks = dict(Part.objects.filter(part_id__in=part_ids).values_list('part_id', 'id'))
+    refresh_part_search_vectors(Part, part_pks.values())    #bulk_create обходит Part.save
+    _sync_part_generations(Part, {part_pks[row['part_id']]: row['generation_id'] for row in batch})
+    _, images_deleted = sync_feed_images(PartImage, 'part', {part_pks[row['part_id']]: row['photo_urls'] for row in batch})
+    created = len(set(part_ids) - existing_part_ids)
+    return created, len(part_ids) - created, images_deleted
+
+
+def _committed_part_ids(df):
+    """
+    Артикулы строк, записанных до контрольной точки: те же правила отбора, что в _prepare_part_rows,
+    но без нормализации и отпечатков.
+    """
+    return {_cell(row, 'Артикул') for row in df.to_dict('records')
+            if _cell(row, 'Артикул') and _cell(row, 'Марка') and _cell(row, NEW_MODEL_COLUMN_NAME)}
+
 
+def _iter_resolved_part_rows(stdout, chunks, known_hashes, full_refresh, make_resolver, DonorVehicle, totals,
+                             feed_part_ids, progress, quarantine, resume_after_row=0, on_rows_committed=None,
+                             unlinked_part_ids=frozenset()):
+    """
+    Общая часть импорта запчастей: для каждой части фида отдаёт изменившиеся строки с id справочников.
+    Изменившейся считается и строка запчасти из unlinked_part_ids (сохранена без донора), донор которой
+    появился в БД, — иначе запчасть так и осталась бы не привязанной к донору.
+    Резолвер создаётся при первой изменившейся строке. Артикулы фида собираются в feed_part_ids,
+    в totals копятся 'unchanged', 'rejected' (строки, не прошедшие проверку _part_row_problem) и 'failed'
+    (строки, для которых не удалось разрешить справочники) — отклонённые и потерянные строки уходят в quarantine.
+    Отклонённая строка — ошибка в самом фиде: повтор импорта её не запишет, поэтому она, в отличие от 'failed',
+    не останавливает контрольную точку.
+    Ошибка чтения фида пробрасывается вызывающему коду. В progress засчитываются строки, которые
+    дальше не пойдут: пропущенные, неизменившиеся, отклонённые и с ошибкой справочников.
+    resume_after_row — строки фида до этого номера уже записаны прошлой попыткой (контрольная точка):
+    они только учитываются в feed_part_ids и 'unchanged'. on_rows_committed(row_num) вызывается, когда
+    потребитель записал часть фида и ни одна строка до row_num не потеряна.
+    """
+    resolver = None
+    checkpointing = on_rows_committed is not None
+    for chunk in chunks:
+        if resume_after_row and len(chunk):
+            committed = chunk.index + 2 <= resume_after_row
+            if committed.any():
+                committed_ids = _committed_part_ids(chunk[committed])
+                feed_part_ids.update(committed_ids)
+                totals['unchanged'] += len(committed_ids)
+                progress.advance(int(committed.sum()))
+                chunk = chunk[~committed]
+        if not len(chunk):
+            continue
+        failed_before = totals['failed']
+        rows = _prepare_part_rows(chunk, stdout, quarantine)
+        feed_part_ids.update(row['part_id'] for row in rows)
+        skipped = len(chunk) - len(rows)    #Без артикула, марки/модели или повтор артикула
+        if not full_refresh:
+            relink = _relinkable_part_ids(rows, unlinked_part_ids, lambda donor_vins: set(
+                DonorVehicle.objects.filter(donor_vin__in=donor_vins).values_list('donor_vin', flat=True)))
+            changed_rows = [row for row in rows
+                            if known_hashes.get(row['part_id']) != row['feed_hash'] or row['part_id'] in relink]
+            totals['unchanged'] += len(rows) - len(changed_rows)
+            skipped += len(rows) - len(changed_rows)
+            rows = changed_rows
+        progress.advance(skipped)
+        valid_rows = []
+        for row in rows:
+            problem = _part_row_problem(row)
+            if problem is None:
+                valid_rows.append(row)
+            else:
+                quarantine.add(row['row_num'], row['part_id'], RowRejected(problem), row)
+        totals['rejected'] += len(rows) - len(valid_rows)
+        progress.advance(len(rows) - len(valid_rows), errors=len(rows) - len(valid_rows))
+        rows = valid_rows
+        if rows:
+            try:
+                if resolver is None:
+                    resolver = make_resolver()
+                _resolve_part_rows(resolver, DonorVehicle, rows, stdout)
+            except Exception as e:
+                stdout.write(f"❌ Критическая ошибка при подготовке справочников: {e}")
+                for row in rows:
+                    quarantine.add(row['row_num'], row['part_id'], e, row)
+                totals['failed'] += len(rows)
+                progress.advance(len(rows), errors=len(rows))
+            else:
+                yield rows
+        if checkpointing and totals['failed'] == failed_before:
+            on_rows_committed(int(chunk.index[-1]) + 2)
+        else:
+            checkpointing = False    #За потерянными строками точку не двигаем: повтор должен их записать
+
+
+def _write_part_rows(stdout, Part, PartImage, rows, totals, progress, quarantine):
+    """
+    Пишет строки запчастей: на PostgreSQL большие объёмы — через COPY во временные таблицы и слияние
+    (pg_copy.copy_merge_parts) частями по COPY_BATCH_SIZE, иначе — пачками ORM. Часть, которую не удалось
+    записать через COPY, переписывается через ORM. Счётчики копятся в totals, незаписанные строки —
+    в quarantine; возвращает записанные строки.
+    Повтор артикула (строки шарда собраны из разных частей фида) оставляет последнюю строку, как
+    _prepare_part_rows: иначе первичный ключ временной таблицы COPY и upsert пачки отвергли бы её целиком.
+    """
+    unique_rows = list({row['part_id']: row for row in rows}.values())
+    progress.advance(len(rows) - len(unique_rows))
+    rows = unique_rows
+    if not copy_backend_available(len(rows)):
+        return _write_part_rows_batched(Part, PartImage, rows, totals, progress, quarantine)
+    written = []
+    for batch in _chunks(rows, COPY_BATCH_SIZE):
+        try:
+            with transaction.atomic():
+                created, updated, deleted = copy_merge_parts(Part, PartImage, batch)
+        except Exception as e:
+            stdout.write(f"⚠️ COPY-загрузка строк {batch[0]['row_num']}–{batch[-1]['row_num']} не удалась ({e}), "
+                         f"запись пачками через ORM.")
+            written.extend(_write_part_rows_batched(Part, PartImage, batch, totals, progress, quarantine))
+            continue
+        progress.advance(len(batch))
+        totals['created'] += created
+        totals['updated'] += updated
+        totals['images_deleted'] += deleted
+        written.extend(batch)
+    return written
+
+
+def _write_part_rows_batched(Part, PartImage, rows, totals, progress, quarantine):
+    """
+    Пишет строки запчастей пачками по BATCH_SIZE через ORM, каждая пачка — своя транзакция.
+    Если пачка не записалась, она делится пополам в точках сохранения (write_bisecting): корректные строки
+    записываются, а строки с ошибкой уходят в quarantine. Счётчики копятся в totals; возвращает записанные строки.
+    """
+    written = []
+    for batch in _chunks(rows, BATCH_SIZE):
+        rejected = []
+        try:
+            with transaction.atomic():
+                results = write_bisecting(lambda part: _write_parts_batch(Part, PartImage, part), batch,
+                                          lambda row, e: rejected.append((row, e)))
+        except Exception as e:    #Сбой самой транзакции (соединение, COMMIT): пачка не записана
+            results, rejected = [], [(row, e) for row in batch]
+        for row, e in rejected:
+            quarantine.add(row['row_num'], row['part_id'], e, row)
+        totals['failed'] += len(rejected)
+        progress.advance(len(batch), errors=len(rejected))
+        for part, (created, updated, deleted) in results:
+            totals['created'] += created
+            totals['updated'] += updated
+            totals['images_deleted'] += deleted
+            written.extend(part)
+    return written
+
+
+def _new_parts_totals():
+    return {'created': 0, 'updated': 0, 'unchanged': 0, 'rejected': 0, 'failed': 0, 'images_deleted': 0}
+
+
+def _report_parts_import(stdout, totals, parts_removed, feed_complete, sweep_blocked=False):
+    """
+    Итоговые сообщения импорта запчастей и результат в едином для всех режимов виде.
+    """
     stdout.write("Импорт завершён!")
-    stdout.write(f"Создано новых запчастей: {parts_created}")
-    stdout.write(f"Обновлено существующих запчастей: {parts_updated}")
\ No newline at end of file
+    stdout.write(f"Создано новых запчастей: {totals['created']}")
+    stdout.write(f"Обновлено существующих запчастей: {totals['updated']}")
+    stdout.write(f"Без изменений: {totals['unchanged']}")
+    stdout.write(f"Снято с продажи (пропали из фида): {parts_removed}")
+    if totals['images_deleted']:
+        stdout.write(f"Удалено устаревших фото: {totals['images_deleted']}")
+    if totals['rejected']:
+        stdout.write(f"⚠️ Отклонено проверкой (ошибка в фиде, строки в карантине): {totals['rejected']}")
+    if totals['failed']:
+        stdout.write(f"⚠️ Не удалось импортировать запчастей: {totals['failed']}")
+    return {'created': totals['created'], 'updated': totals['updated'], 'unchanged': totals['unchanged'],
+            'removed': parts_removed, 'rejected': totals['rejected'], 'failed': totals['failed'],
+            'feed_complete': feed_complete, 'sweep_blocked': sweep_blocked}
+
+
+def _read_parts_source(stdout, df, chunks):
+    """
+    Источник строк для импорта запчастей: chunks, df или файл передачи PARTS_FILE. None — файла нет.
+    """
+    if chunks is not None:
+        return chunks
+    if df is None:
+        try:
+            df = read_prepared_feed(PARTS_FILE)    #Файл передачи, сохранённый fetch_and_prepare_parts(write_handoff=True)
+        except FileNotFoundError:
+            stdout.write(f"❌ Ошибка: Файл запчастей не найден по пути {PARTS_FILE}. Пропуск импорта.")
+            return None
+    return [df]
+
+
+def import_parts_to_db(stdout, CarMake, CarModel, CarGeneration, DonorVehicle, Category, PartSubCategory, Part,
+                       PartImage, CATEGORY_SLUG_MAP, full_refresh=False, df=None, chunks=None, progress=None,
+                       allow_mass_removal=False, resume_after_row=0, on_rows_committed=None, run_id=None,
+                       feed_sha256=None, deferred_quarantine=None):
+    """
+    Импорт запчастей в БД из подготовленного фида (df) или, если он не передан, из PARTS_FILE.
+    chunks — итератор подготовленных частей фида (потоковый режим) вместо df; если передан и df — строки
+    берутся из chunks, а df даёт только их число для прогресса.
+    Справочники (марки, модели, поколения, категории, подкатегории, доноры) разрешаются через DimensionResolver
+    один раз на часть фида, запчасти пишутся пачками по BATCH_SIZE через bulk_create(update_conflicts=True),
+    а на PostgreSQL при больших объёмах — через COPY и слияние (см. _write_part_rows).
+    Записываются только новые запчасти и запчасти с изменившимся отпечатком строки фида (full_refresh — все).
+    progress — ImportProgress, в который отчитываются строки фида по мере записи пачек.
+    Запчасти из прошлых фидов, которых нет в этом, снимаются с продажи (_sweep_removed_parts) —
+    только если фид прочитан целиком.
+    resume_after_row и on_rows_committed — продолжение с контрольной точки и её запись после каждой
+    записанной части фида (см. import_checkpoint).
+    Отклонённые проверкой строки и строки, которые не удалось записать, собираются в карантин (ImportQuarantine)
+    с ключом запуска run_id; feed_sha256 — SHA-256 фида, по которому карантин не дублирует строки повторного
+    импорта того же фида. Отклонённые строки считаются отдельно ('rejected') и не мешают принять фид.
+    deferred_quarantine — список, в который карантин добавляется вместо записи (см. RowQuarantine.defer).
+    """
+    total = len(df) if df is not None else None
+    chunks = _read_parts_source(stdout, df, chunks)
+    if chunks is None:
+        return
+    progress = progress or ImportProgress()
+    progress.start('Импорт запчастей.', total=sum(map(len, chunks)) if isinstance(chunks, list) else total)
+    known_hashes, unlinked_part_ids = _known_parts(Part)
+    feed_part_ids = set()
+    feed_complete = True
+    totals = _new_parts_totals()
+    quarantine = RowQuarantine('parts', run_id, feed_sha256)
+    try:
+        for rows in _iter_resolved_part_rows(
+                stdout, chunks, known_hashes, full_refresh,
+                lambda: DimensionResolver(CarMake, CarModel, CarGeneration, Category, PartSubCategory),
+                DonorVehicle, totals, feed_part_ids, progress, quarantine, resume_after_row, on_rows_committed,
+                unlinked_part_ids):
+            for row in _write_part_rows(stdout, Part, PartImage, rows, totals, progress, quarantine):
+                known_hashes[row['part_id']] = row['feed_hash']
+    except Exception as e:
+        feed_complete = False    #Фид оборвался на середине: пропавшими считать некого
+        stdout.write(f"❌ Ошибка чтения фида запчастей, импорт прерван: {e}")
+
+    progress.flush()
+    quarantine.defer(stdout, deferred_quarantine)
+    parts_removed, sweep_blocked = 0, False
+    if feed_complete:    #Фид оборвался — пропавшими считать некого
+        feed_sourced_count = sum(1 for feed_hash in known_hashes.values() if feed_hash)
+        parts_removed, sweep_blocked = _sweep_removed_parts(stdout, Part, _removed_part_ids(known_hashes, feed_part_ids),
+                                                            feed_sourced_count, allow_mass_removal)
+    return _report_parts_import(stdout, totals, parts_removed, feed_complete, sweep_blocked)
+
+
+def _shard_of(part_id, shards):
+    """
+    Номер шарда по стабильному хешу артикула (встроенный hash() строк различается между процессами).
+    """
+    return int.from_bytes(hashlib.blake2b(part_id.encode('utf-8'), digest_size=8).digest(), 'big') % shards
+
+
+def plan_sharded_parts_import(stdout, CarMake, CarModel, CarGeneration, DonorVehicle, Category, PartSubCategory,
+                              Part, shards, full_refresh=False, df=None, chunks=None, progress=None, run_id=None,
+                              feed_sha256=None):
+    """
+    Первый шаг шардированного импорта запчастей (выполняет координатор). Фид нормализуется, строки
+    с неизменившимся отпечатком отбрасываются, справочники разрешаются здесь же один раз. Оставшиеся
+    строки делятся на shards частей по хешу артикула: запчасть всегда попадает в один и тот же шард,
+    поэтому шарды пишут в БД независимо и не конкурируют за одни строки.
+    Возвращает план {'shards': [[строка, ...], ...], 'totals', 'removed_part_ids', 'feed_sourced_count',
+    'feed_complete'}
+    (None — нет фида). План сериализуется в JSON: цена передаётся строкой.
+    """
+    chunks = _read_parts_source(stdout, df, chunks)
+    if chunks is None:
+        return None
+    progress = progress or ImportProgress()
+    progress.start('Подготовка шардов запчастей.', total=sum(map(len, chunks)) if isinstance(chunks, list) else None)
+    known_hashes, unlinked_part_ids = _known_parts(Part)
+    feed_part_ids = set()
+    feed_complete = True
+    totals = _new_parts_totals()
+    shard_rows = [[] for _ in range(shards)]
+    quarantine = RowQuarantine('parts', run_id, feed_sha256)
+    try:
+        for rows in _iter_resolved_part_rows(
+                stdout, chunks, known_hashes, full_refresh,
+                lambda: DimensionResolver(CarMake, CarModel, CarGeneration, Category, PartSubCategory),
+                DonorVehicle, totals, feed_part_ids, progress, quarantine, unlinked_part_ids=unlinked_part_ids):
+            progress.advance(len(rows))
+            for row in rows:
+                shard_row = {field: row[field] for field in SHARD_ROW_FIELDS}
+                shard_row['price'] = str(row['price'])
+                shard_rows[_shard_of(row['part_id'], shards)].append(shard_row)
+    except Exception as e:
+        feed_complete = False
+        stdout.write(f"❌ Ошибка чтения фида запчастей, импорт прерван: {e}")
+
+    progress.flush()
+    quarantine.flush(stdout)
+    removed_part_ids = _removed_part_ids(known_hashes, feed_part_ids) if feed_complete else []
+    stdout.write(f"Запчасти к записи: {sum(map(len, shard_rows))}, шардов: {shards}, "
+                 f"без изменений: {totals['unchanged']}.")
+    return {'shards': shard_rows, 'totals': totals, 'removed_part_ids': removed_part_ids,
+            'feed_sourced_count': sum(1 for feed_hash in known_hashes.values() if feed_hash),
+            'feed_complete': feed_complete}
+
+
+def import_part_shard(stdout, Part, PartImage, rows, run_id=None, feed_sha256=None):
+    """
+    Записывает один шард плана plan_sharded_parts_import (выполняется в подзадаче).
+    run_id — ключ запуска для карантина, общий с координатором, feed_sha256 — SHA-256 фида.
+    Возвращает счётчики шарда.
+    """
+    for row in rows:
+        row['price'] = Decimal(row['price'])
+    totals = _new_parts_totals()
+    quarantine = RowQuarantine('parts', run_id, feed_sha256)
+    _write_part_rows(stdout, Part, PartImage, rows, totals, ImportProgress(), quarantine)
+    quarantine.flush(stdout)
+    return totals
+
+
+def finalize_sharded_parts_import(stdout, Part, plan_totals, shard_totals, removed_part_ids, feed_sourced_count,
+                                  feed_complete, allow_mass_removal=False):
+    """
+    Последний шаг шардированного импорта: суммирует счётчики шардов, снимает с продажи
+    пропавшие из фида запчасти и печатает итог.
+    """
+    totals = {**_new_parts_totals(), **plan_totals}
+    for shard in shard_totals:
+        for key in ('created', 'updated', 'failed', 'images_deleted'):
+            totals[key] += shard[key]
+    parts_removed, sweep_blocked = _sweep_removed_parts(stdout, Part, removed_part_ids, feed_sourced_count,
+                                                        allow_mass_removal)
+    return _report_parts_import(stdout, totals, parts_removed, feed_complete, sweep_blocked)
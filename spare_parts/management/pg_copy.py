@@ -0,0 +1,147 @@
+import io
+from django.db import connection
+from spare_parts.search import normalize_part_number, refresh_part_search_vectors
+
+
+COPY_MIN_ROWS = 5000    #Меньше изменившихся строк — пишем через ORM: COPY окупается только на больших объёмах
+COPY_BATCH_SIZE = 50000    #Строк в одной транзакции COPY + слияние
+PART_STAGING_TABLE = 'spare_parts_part_staging'
+IMAGE_STAGING_TABLE = 'spare_parts_partimage_staging'
+PART_STAGING_COLUMNS = ['part_id', 'title', 'description', 'part_number', 'part_number_key', 'category_id',
+                        'subcategory_id', 'price', 'condition', 'donor_generation_id', 'donor_vehicle_id',
+                        'feed_hash']
+
+
+def copy_backend_available(rows_count):
+    """
+    COPY-загрузка используется на PostgreSQL (psycopg2) для частей фида от COPY_MIN_ROWS изменившихся строк.
+    На SQLite и для небольших обновлений остаётся пакетная запись через ORM.
+    """
+    return connection.vendor == 'postgresql' and rows_count >= COPY_MIN_ROWS
+
+
+def _copy_value(value):
+    """
+    Значение в текстовом формате COPY: \\N для NULL, экранирование обратной косой черты, табуляции и переводов строк.
+    """
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    return str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+
+def _copy_buffer(records):
+    buffer = io.StringIO()
+    for record in records:
+        buffer.write('\t'.join(_copy_value(value) for value in record))
+        buffer.write('\n')
+    buffer.seek(0)
+    return buffer
+
+
+def _create_staging_tables(cursor):
+    """
+    Временные таблицы транзакции: не пишутся в WAL, как UNLOGGED, видны только своей сессии
+    (параллельные шарды не мешают друг другу) и удаляются при COMMIT. Внутри внешней транзакции
+    (несколько частей фида подряд) таблицы переиспользуются и очищаются.
+    """
+    cursor.execute(f"""
+        CREATE TEMPORARY TABLE IF NOT EXISTS {PART_STAGING_TABLE} (
+            part_id varchar(50) PRIMARY KEY, title varchar(255), description text, part_number varchar(100),
+            part_number_key varchar(100), category_id bigint, subcategory_id bigint, price numeric(10, 2), condition varchar(10),
+            donor_generation_id bigint, donor_vehicle_id bigint, feed_hash varchar(64)
+        ) ON COMMIT DROP""")
+    cursor.execute(f"""
+        CREATE TEMPORARY TABLE IF NOT EXISTS {IMAGE_STAGING_TABLE} (
+            part_id varchar(50), position integer, image_url varchar(500)
+        ) ON COMMIT DROP""")
+    cursor.execute(f"TRUNCATE {PART_STAGING_TABLE}, {IMAGE_STAGING_TABLE}")
+
+
+def copy_merge_parts(Part, PartImage, rows):
+    """
+    Записывает строки запчастей через COPY FROM STDIN во временные таблицы и сливает их в каталог
+    несколькими запросами: upsert запчастей (INSERT ... ON CONFLICT), возврат в продажу, связь с поколением,
+    фото (удаление пропавших и повторов, вставка новых, выбор главного — как в sync_feed_images).
+    rows — без повторов part_id (первичный ключ временной таблицы), их убирает import_to_db._write_part_rows.
+    Вызывается внутри transaction.atomic(). Возвращает (создано, обновлено, удалено фото).
+    """
+    part_table = Part._meta.db_table
+    image_table = PartImage._meta.db_table
+    through_table = Part.car_generations.through._meta.db_table
+    with connection.cursor() as cursor:
+        _create_staging_tables(cursor)
+        cursor.copy_expert(
+            f"COPY {PART_STAGING_TABLE} ({', '.join(PART_STAGING_COLUMNS)}) FROM STDIN",
+            _copy_buffer([row['part_id'], row['title'], row['description'], row['part_number'],
+                          normalize_part_number(row['part_number']), row['category_id'], row['subcategory_id'], row['price'], row['condition'], row['generation_id'],
+                          row['donor_vehicle_id'], row['feed_hash']] for row in rows))
+        cursor.copy_expert(
+            f"COPY {IMAGE_STAGING_TABLE} (part_id, position, image_url) FROM STDIN",
+            _copy_buffer([row['part_id'], position, url] for row in rows
+                         for position, url in enumerate(row['photo_urls'])))
+        cursor.execute(f"ANALYZE {PART_STAGING_TABLE}")
+        cursor.execute(f"ANALYZE {IMAGE_STAGING_TABLE}")
+
+        cursor.execute(f"""
+            SELECT count(*) FROM {PART_STAGING_TABLE} s
+            WHERE NOT EXISTS (SELECT 1 FROM {part_table} p WHERE p.part_id = s.part_id)""")
+        created = cursor.fetchone()[0]
+        cursor.execute(f"""
+            INSERT INTO {part_table} (part_id, title, description, part_number, part_number_key, category_id,
+                                      subcategory_id, price, condition, donor_generation_id, donor_vehicle_id,
+                                      feed_hash, is_active, deactivated_by_sweep, created_at)
+            SELECT part_id, title, description, part_number, part_number_key, category_id, subcategory_id, price,
+                   condition, donor_generation_id, donor_vehicle_id, feed_hash, TRUE, FALSE, now()
+            FROM {PART_STAGING_TABLE}
+            ON CONFLICT (part_id) DO UPDATE SET
+                title = EXCLUDED.title, description = EXCLUDED.description, part_number = EXCLUDED.part_number,
+                part_number_key = EXCLUDED.part_number_key,
+                category_id = EXCLUDED.category_id, subcategory_id = EXCLUDED.subcategory_id,
+                price = EXCLUDED.price, condition = EXCLUDED.condition,
+                donor_generation_id = EXCLUDED.donor_generation_id, donor_vehicle_id = EXCLUDED.donor_vehicle_id,
+                feed_hash = EXCLUDED.feed_hash""")
+        cursor.execute(f"""
+            UPDATE {part_table} p SET is_active = TRUE, deactivated_by_sweep = FALSE
+            FROM {PART_STAGING_TABLE} s
+            WHERE p.part_id = s.part_id AND p.deactivated_by_sweep""")
+        refresh_part_search_vectors(Part, part_ids_sql=f"SELECT part_id FROM {PART_STAGING_TABLE}")
+
+        cursor.execute(f"""
+            DELETE FROM {through_table} t
+            USING {part_table} p, {PART_STAGING_TABLE} s
+            WHERE t.part_id = p.id AND p.part_id = s.part_id AND t.cargeneration_id <> s.donor_generation_id""")
+        cursor.execute(f"""
+            INSERT INTO {through_table} (part_id, cargeneration_id)
+            SELECT p.id, s.donor_generation_id
+            FROM {PART_STAGING_TABLE} s JOIN {part_table} p ON p.part_id = s.part_id
+            ON CONFLICT (part_id, cargeneration_id) DO NOTHING""")
+
+        cursor.execute(f"""
+            DELETE FROM {image_table} i
+            USING {part_table} p, {PART_STAGING_TABLE} s
+            WHERE i.part_id = p.id AND p.part_id = s.part_id AND i.image_url IS NOT NULL AND i.image_url <> ''
+              AND (NOT EXISTS (SELECT 1 FROM {IMAGE_STAGING_TABLE} g
+                               WHERE g.part_id = s.part_id AND g.image_url = i.image_url)
+                   OR EXISTS (SELECT 1 FROM {image_table} d
+                              WHERE d.part_id = i.part_id AND d.image_url = i.image_url AND d.id < i.id))""")
+        images_deleted = cursor.rowcount
+        cursor.execute(f"""
+            INSERT INTO {image_table} (part_id, image_url, is_main)
+            SELECT p.id, g.image_url, FALSE
+            FROM {IMAGE_STAGING_TABLE} g JOIN {part_table} p ON p.part_id = g.part_id
+            WHERE NOT EXISTS (SELECT 1 FROM {image_table} i WHERE i.part_id = p.id AND i.image_url = g.image_url)""")
+        cursor.execute(f"""
+            UPDATE {image_table} i SET is_main = m.should_be_main
+            FROM (
+                SELECT i2.id, (g.position = 0 AND NOT EXISTS (
+                    SELECT 1 FROM {image_table} manual
+                    WHERE manual.part_id = i2.part_id AND manual.is_main
+                      AND (manual.image_url IS NULL OR manual.image_url = ''))) AS should_be_main
+                FROM {image_table} i2
+                JOIN {part_table} p ON p.id = i2.part_id
+                JOIN {IMAGE_STAGING_TABLE} g ON g.part_id = p.part_id AND g.image_url = i2.image_url
+            ) m
+            WHERE i.id = m.id AND i.is_main <> m.should_be_main""")
+    return created, len(rows) - created, images_deleted
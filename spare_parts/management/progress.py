@@ -0,0 +1,73 @@
+import time
+
+
+PROGRESS_EVERY_ROWS = 1000    #Как часто (в строках фида) отдавать снимок прогресса
+
+
+class ImportCancelled(BaseException):
+    """
+    Обновление остановлено извне (cancel у ImportProgress) — например, потерян лок обновления.
+    Не Exception: обработчики ошибок пачек (карантин, разбиение пачки) не должны принять его за ошибку строк.
+    """
+
+
+class ImportProgress:
+    """
+    Прогресс обновления каталога: этап, обработанные строки, ошибки, скорость и оценка оставшегося времени.
+    Каждые every строк и при смене этапа снимок передаётся в on_progress(meta) —
+    например, в self.update_state задачи Celery. Без on_progress только считает.
+    cancel — threading.Event: когда он установлен, следующий отчёт о строках (после пачки) или смена этапа
+    прерывает обновление исключением ImportCancelled.
+    """
+    def __init__(self, on_progress=None, every=PROGRESS_EVERY_ROWS, cancel=None):
+        self.on_progress = on_progress
+        self.every = every
+        self.cancel = cancel
+        self.stage = None
+        self.start('Запуск обновления...')
+
+    def check_cancelled(self):
+        if self.cancel is not None and self.cancel.is_set():
+            raise ImportCancelled(f"Обновление остановлено на этапе '{self.stage}'.")
+
+    def start(self, stage, total=None):
+        """
+        Новый этап: счётчики строк и ошибок обнуляются. total — число строк этапа, если известно заранее.
+        """
+        self.check_cancelled()
+        self.stage = stage
+        self.total = total
+        self.processed = 0
+        self.errors = 0
+        self.started_at = time.monotonic()
+        self.reported_at_row = 0
+        self.report()
+
+    def advance(self, rows=1, errors=0):
+        self.check_cancelled()
+        self.processed += rows
+        self.errors += errors
+        if self.processed - self.reported_at_row >= self.every:
+            self.report()
+
+    def snapshot(self):
+        elapsed = time.monotonic() - self.started_at
+        rows_per_sec = self.processed / elapsed if elapsed > 0 else 0.0
+        eta_seconds = None
+        if self.total is not None and rows_per_sec > 0:
+            eta_seconds = round(max(self.total - self.processed, 0) / rows_per_sec, 1)
+        return {'stage': self.stage, 'processed': self.processed, 'total': self.total, 'errors': self.errors,
+                'rows_per_sec': round(rows_per_sec, 1), 'elapsed_seconds': round(elapsed, 1),
+                'eta_seconds': eta_seconds}
+
+    def flush(self):
+        """
+        Отдаёт последний снимок этапа, если после предыдущего были новые строки.
+        """
+        if self.processed != self.reported_at_row:
+            self.report()
+
+    def report(self):
+        self.reported_at_row = self.processed
+        if self.on_progress is not None:
+            self.on_progress(self.snapshot())
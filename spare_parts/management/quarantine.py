@@ -0,0 +1,152 @@
+import math
+from contextlib import contextmanager
+from datetime import timedelta
+from uuid import uuid4
+from django.db import transaction
+from django.utils import timezone
+
+
+QUARANTINE_BATCH_SIZE = 1000    #Строк карантина в одном INSERT
+QUARANTINE_SAMPLES = 3    #Сколько строк карантина показать в выводе импорта, остальные — в таблице
+QUARANTINE_VALUE_LENGTH = 1000    #Длиннее обрезаем: в карантине нужна причина, а не копия фида
+QUARANTINE_RETENTION_DAYS = 30
+
+
+class RowRejected(ValueError):
+    """
+    Строка отклонена проверкой до записи в БД (нет артикула, значение не помещается в поле).
+    """
+
+
+def _json_value(value):
+    if isinstance(value, (list, tuple)):
+        return [_json_value(item) for item in value]
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    if isinstance(value, (bool, int)) or (isinstance(value, float) and math.isfinite(value)):
+        return value
+    return str(value)[:QUARANTINE_VALUE_LENGTH]
+
+
+class RowQuarantine:
+    """
+    Карантин строк фида одного запуска импорта: номер строки, ключ записи (артикул, ID донора), класс ошибки
+    и значения строки копятся в памяти и в конце импорта записываются в ImportQuarantine одним bulk_create.
+    В вывод попадает сводка с несколькими примерами вместо сообщения на каждую строку.
+    run_id связывает строки карантина с запуском (ID задачи Celery) — в том числе строки из разных шардов.
+    feed_sha256 — SHA-256 содержимого фида: строка с тем же ключом и той же ошибкой из того же фида
+    (повтор импорта, продолжение с контрольной точки) в карантин второй раз не пишется.
+    """
+    def __init__(self, feed, run_id=None, feed_sha256=None):
+        self.feed = feed
+        self.run_id = run_id or uuid4().hex
+        self.feed_sha256 = feed_sha256
+        self.entries = []
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, row_num, key, error, values):
+        self.entries.append({'row_num': row_num, 'record_key': str(key)[:255] if key else None,
+                             'error_class': type(error).__name__, 'error': str(error)[:QUARANTINE_VALUE_LENGTH],
+                             'values': {str(name): _json_value(value) for name, value in values.items()}})
+
+    def _new_entries(self, ImportQuarantine, entries):
+        """
+        Строки, которых ещё нет в карантине этого фида: ключ (запись, класс ошибки, ошибка, SHA-256 фида).
+        Без feed_sha256 повтор не распознать — пишутся все строки.
+        """
+        if self.feed_sha256 is None:
+            return entries
+        seen = set()
+        keys = sorted({entry['record_key'] for entry in entries if entry['record_key']})
+        for start in range(0, len(keys), QUARANTINE_BATCH_SIZE):
+            seen.update(ImportQuarantine.objects.filter(
+                feed=self.feed, feed_sha256=self.feed_sha256,
+                record_key__in=keys[start:start + QUARANTINE_BATCH_SIZE]).values_list('record_key', 'error_class',
+                                                                                      'error'))
+        new_entries = []
+        for entry in entries:
+            key = (entry['record_key'], entry['error_class'], entry['error'])
+            if entry['record_key'] and key in seen:
+                continue
+            seen.add(key)
+            new_entries.append(entry)
+        return new_entries
+
+    def flush(self, stdout):
+        """
+        Записывает накопленные строки в ImportQuarantine (кроме уже записанных из того же фида)
+        и удаляет карантин старше QUARANTINE_RETENTION_DAYS. Возвращает число записанных строк.
+        """
+        from spare_parts.models import ImportQuarantine
+
+        entries, self.entries = self.entries, []
+        if not entries:
+            return 0
+        ImportQuarantine.objects.filter(
+            created_at__lt=timezone.now() - timedelta(days=QUARANTINE_RETENTION_DAYS)).delete()
+        new_entries = self._new_entries(ImportQuarantine, entries)
+        if len(new_entries) < len(entries):
+            stdout.write(f"⏭️ Строк фида '{self.feed}' уже в карантине с прошлых запусков того же фида: "
+                         f"{len(entries) - len(new_entries)}.")
+        entries = new_entries
+        if not entries:
+            return 0
+        ImportQuarantine.objects.bulk_create([ImportQuarantine(feed=self.feed, run_id=self.run_id,
+                                                               feed_sha256=self.feed_sha256, **entry)
+                                              for entry in entries], batch_size=QUARANTINE_BATCH_SIZE)
+        stdout.write(f"⚠️ Строк фида '{self.feed}' в карантине: {len(entries)} (запуск {self.run_id}, "
+                     f"таблица ImportQuarantine).")
+        for entry in entries[:QUARANTINE_SAMPLES]:
+            stdout.write(f"   строка {entry['row_num']} ({entry['record_key']}): "
+                         f"{entry['error_class']}: {entry['error']}")
+        return len(entries)
+
+    def defer(self, stdout, deferred=None):
+        """
+        Записывает карантин сразу или, если передан список deferred (deferred_quarantine), откладывает запись.
+        """
+        if deferred is None:
+            return self.flush(stdout)
+        deferred.append(self)
+        return 0
+
+
+@contextmanager
+def deferred_quarantine(stdout, enabled=True):
+    """
+    Откладывает запись карантинов импорта до выхода из блока: внутри транзакции атомарной публикации
+    отменённая публикация откатила бы и карантин. Блок отдаёт список для RowQuarantine.defer (None — enabled
+    выключен, карантин пишется сразу); на выходе — при любом исходе, в том числе по исключению, — отложенные
+    карантины записываются. Транзакцию открывают внутри блока, чтобы запись шла уже после неё.
+    """
+    deferred = [] if enabled else None
+    try:
+        yield deferred
+    finally:
+        for quarantine in deferred or ():
+            quarantine.flush(stdout)
+
+
+def write_bisecting(write, rows, reject):
+    """
+    Пишет rows через write(rows) в точке сохранения. Если пачка не записалась, она делится пополам и половины
+    пишутся снова, пока ошибка не сузится до одной строки — её получает reject(row, error), остальные строки
+    пачки записываются. Чистая пачка стоит одной точки сохранения, k плохих строк — порядка 2·k·log2(пачки).
+    Вызывается внутри transaction.atomic(). Возвращает [(записанные строки, результат write)].
+    """
+    results = []
+    pending = [rows]
+    while pending:
+        part = pending.pop()
+        try:
+            with transaction.atomic():
+                results.append((part, write(part)))
+        except Exception as e:
+            if len(part) == 1:
+                reject(part[0], e)
+                continue
+            middle = len(part) // 2
+            pending.extend([part[middle:], part[:middle]])    #Сначала первая половина: порядок записи как в фиде
+    return results
@@ -0,0 +1,85 @@
+import csv
+import random
+from spare_parts.management.feed_io import FEED_SEPARATOR
+
+
+SYNTHETIC_ENCODING = 'windows-1251'    #Как отдаёт поставщик
+PARTS_COLUMNS = ['Артикул', 'Наименование', 'Донор', 'Марка', 'Модель', 'Год', 'Кузов', 'Двигатель',
+                 'Перед/Зад (F/B)', 'Лев/Прав (L/R)', 'Верх/Низ (U/D)', 'Цвет', 'Маркировка', 'Кросс-номера',
+                 'Номер производителя', 'Производитель', 'Комментарий', 'Фото', 'Новый/БУ (new/used/contract)',
+                 'Цена', 'Склад']
+DONOR_COLUMNS = ['Номер', 'Поставка', 'Статус (reference)', 'Марка', 'Модель', 'Год', 'Кузов', 'Двигатель',
+                 'Руль (L/R)', 'Тип КПП (/automatic/manual/variator)', 'Модель КПП', 'Привод (/FD/BD/4WD)',
+                 'Комплектация', 'VIN', 'Описание', 'Видео', 'Пробег', 'Цвет', 'Стоимость', 'Фото']
+SYNTHETIC_VEHICLES = [('Kia', 'Rio 3'), ('Kia', 'Rio 4'), ('Kia', 'Sportage 4'), ('Kia', 'ceed 3'),
+                      ('Hyundai', 'Solaris 1'), ('Hyundai', 'Solaris 2'), ('Hyundai', 'Creta'),
+                      ('Hyundai', 'Tucson 3'), ('Renault', 'Duster 2'), ('Renault', 'Logan'),
+                      ('Renault', 'Sandero Stepway 2'), ('Volkswagen', 'Polo 5'), ('Volkswagen', 'Jetta 6'),
+                      ('Skoda', 'Rapid 2'), ('Chevrolet', 'Cruze'), ('Nissan', 'Almera'), ('Chery', 'Tiggo 4'),
+                      ('Lada', 'Vesta')]    #Модели из GENERATION_MODELS и вне его
+SYNTHETIC_EXTRA_NAMES = ['Фильтр салона', 'Коврик в багажник', 'Брызговик задний', 'Насос ГУР б/у']
+SYNTHETIC_ENGINES = ['G4FA', 'G4FG', 'G4NA', 'K4M', 'F4R', 'CFNA', 'CWVA', '']
+SYNTHETIC_COLORS = ['Белый', 'Черный', 'Серебристый', 'RHM - SLEEK SILVER', '']
+SYNTHETIC_PHOTO_URL = 'https://cdn.example.com/pub/productphoto/{:07d}_{:02d}.jpg'
+SYNTHETIC_MAX_PHOTOS = 8
+
+
+def _photos(rng, owner_num):
+    return ', '.join(SYNTHETIC_PHOTO_URL.format(owner_num, n) for n in range(rng.randint(0, SYNTHETIC_MAX_PHOTOS)))
+
+
+def _donor_id(num, vehicle):
+    return f"{num} {vehicle[1]}"    #Как у поставщика: '1 Rio 3'
+
+
+def write_synthetic_donors(path, donors, seed=42):
+    """
+    Синтетический фид доноров с настоящими колонками поставщика. Возвращает [(номер донора, (марка, модель)), ...].
+    """
+    rng = random.Random(seed)
+    donor_refs = []
+    with open(path, 'w', encoding=SYNTHETIC_ENCODING, newline='') as f:
+        writer = csv.writer(f, delimiter=FEED_SEPARATOR)
+        writer.writerow(DONOR_COLUMNS)
+        for num in range(1, donors + 1):
+            vehicle = rng.choice(SYNTHETIC_VEHICLES)
+            donor_id = _donor_id(num, vehicle)
+            donor_refs.append((donor_id, vehicle))
+            writer.writerow([
+                donor_id, '', 'in_store:В наличии', vehicle[0], vehicle[1], rng.randint(2005, 2023),
+                rng.choice(['1.0', '2', '']), rng.choice(SYNTHETIC_ENGINES), 'L:Левый руль',
+                rng.choice(['automatic:АКПП', 'manual:МКПП', '']), '', 'FD:Передний', '', '', '', '',
+                rng.randint(10000, 300000), rng.choice(SYNTHETIC_COLORS), rng.randint(100, 900) * 1000,
+                _photos(rng, num),
+            ])
+    return donor_refs
+
+
+def write_synthetic_parts(path, rows, donor_refs, seed=42):
+    """
+    Синтетический фид запчастей с настоящими колонками поставщика: наименования из CATEGORY_MAPPING
+    (и вне его), разный регистр и пробелы в моделях, пустые ячейки, многострочные комментарии, до
+    SYNTHETIC_MAX_PHOTOS фото. Большинство запчастей привязано к донорам из donor_refs.
+    """
+    from spare_parts.category_mapping import CATEGORY_MAPPING
+
+    rng = random.Random(seed)
+    names = [sub for info in CATEGORY_MAPPING.values() for sub in info['subcategories']] + SYNTHETIC_EXTRA_NAMES
+    with open(path, 'w', encoding=SYNTHETIC_ENCODING, errors='replace', newline='') as f:
+        writer = csv.writer(f, delimiter=FEED_SEPARATOR)
+        writer.writerow(PARTS_COLUMNS)
+        for num in range(1, rows + 1):
+            if donor_refs and rng.random() < 0.8:
+                donor_id, vehicle = rng.choice(donor_refs)
+            else:
+                donor_id, vehicle = '', rng.choice(SYNTHETIC_VEHICLES)
+            model = vehicle[1] if rng.random() < 0.7 else f"  {vehicle[1].upper().replace(' ', '  ')} "
+            name = rng.choice(names) if rng.random() > 0.02 else ''
+            writer.writerow([
+                f"SYN-{num:07d}", name, donor_id, vehicle[0], model, rng.randint(2005, 2023), rng.choice(['1', '']),
+                rng.choice(SYNTHETIC_ENGINES), rng.choice(['F', 'B', '']), rng.choice(['L', 'R', '']), '',
+                rng.choice(SYNTHETIC_COLORS), '', '', f"{rng.randint(10**9, 10**10 - 1)}", 'Hyundai / KIA',
+                f"{name} {vehicle[0]} {vehicle[1]} б/у\nОтправка по всей России!" if rng.random() < 0.5 else '',
+                _photos(rng, num), 'used' if rng.random() < 0.98 else 'new', rng.randint(1, 500) * 100,
+                rng.choice(['Энгельс', 'Саратов']),
+            ])
@@ -0,0 +1,82 @@
+import re
+import pandas as pd
+
+
+DEFAULT_CATEGORY_CODE = 'OTHER'
+DEFAULT_CATEGORY_TITLE = 'Прочие запчасти'
+MODEL_GENERATION_RE = re.compile(r'^(.*?)\s*(\d+)$')    #'Sandero Stepway 2' -> ('Sandero Stepway', '2')
+WHITESPACE_RE = re.compile(r'\s+')
+PUNCTUATION_RE = re.compile(r'[^\w\s]')
+
+
+def extract_model_generation(full_model_str, GENERATION_MODELS_SET):
+    """
+    Построчная версия: разделяет 'Rio 3' на ('Rio', '3'), если модель есть в GENERATION_MODELS_SET.
+    Оставлена как эталон для проверки векторной версии.
+    """
+    if not isinstance(full_model_str, str): return full_model_str, None
+    normalized_model = re.sub(r'\s+', ' ', full_model_str).strip()
+    normalized_model_lower = normalized_model.lower()
+    if normalized_model_lower in GENERATION_MODELS_SET:
+        model_gen_match = re.search(r'^(.*?)\s*(\d+)$', normalized_model)
+        if model_gen_match:
+            return model_gen_match.group(1).strip(), model_gen_match.group(2)
+    return full_model_str, None
+
+
+def get_category_info(product_name, FLAT_MAPPING):
+    """
+    Построчная версия: (код, название) категории по наименованию запчасти.
+    Оставлена как эталон для проверки векторной версии.
+    """
+    if not isinstance(product_name, str): return DEFAULT_CATEGORY_CODE, DEFAULT_CATEGORY_TITLE
+    name_clean = re.sub(r'[^\w\s]', '', product_name).strip().lower()
+    if name_clean in FLAT_MAPPING:
+        return FLAT_MAPPING[name_clean]['code'], FLAT_MAPPING[name_clean]['title']
+    return DEFAULT_CATEGORY_CODE, DEFAULT_CATEGORY_TITLE
+
+
+def _text_only(series):
+    """
+    Оставляет в колонке только строки (остальное -> NaN), чтобы к ней можно было применить .str.
+    Возвращает None, если строк в колонке нет.
+    """
+    is_text = series.map(type).eq(str)
+    if not is_text.any():
+        return None
+    return series.where(is_text).astype(object)
+
+
+def extract_model_generation_vectorized(models, GENERATION_MODELS_SET):
+    """
+    Векторная версия extract_model_generation для целой колонки.
+    Возвращает (базовая модель, поколение) в виде двух Series; результат совпадает с построчной версией:
+    у нераспознанных моделей исходное значение и поколение None.
+    """
+    generations = pd.Series([None] * len(models), index=models.index, dtype=object)
+    text = _text_only(models)
+    if text is None:
+        return models.copy(), generations
+    normalized = text.str.replace(WHITESPACE_RE, ' ', regex=True).str.strip()
+    in_set = normalized.str.lower().isin(GENERATION_MODELS_SET)
+    if not in_set.any():
+        return models.copy(), generations
+    parts = normalized.where(in_set).str.extract(MODEL_GENERATION_RE)
+    matched = in_set & parts[1].notna()
+    base_models = models.astype(object).copy()
+    base_models[matched] = parts.loc[matched, 0].str.strip()
+    generations[matched] = parts.loc[matched, 1]
+    return base_models, generations
+
+
+def get_category_title_vectorized(product_names, FLAT_MAPPING):
+    """
+    Векторная версия get_category_info(...)[1]: название категории для целой колонки наименований.
+    Один проход регулярного выражения по колонке и Series.map по словарю вместо поиска на каждую строку.
+    """
+    text = _text_only(product_names)
+    if text is None:
+        return pd.Series(DEFAULT_CATEGORY_TITLE, index=product_names.index, dtype=object)
+    cleaned = text.str.replace(PUNCTUATION_RE, '', regex=True).str.strip().str.lower()
+    title_by_name = {name: info['title'] for name, info in FLAT_MAPPING.items()}
+    return cleaned.map(title_by_name).fillna(DEFAULT_CATEGORY_TITLE).astype(object)
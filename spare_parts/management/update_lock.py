@@ -0,0 +1,123 @@
+import threading
+import time
+from contextlib import contextmanager
+from django.conf import settings
+from django.core.cache import cache
+
+
+LOCK_KEY = 'catalog:update:lock'
+LOCK_TTL = 300    #Секунд: столько лок живёт без продления (запуск, который ждёт воркера, или упавший воркер)
+LOCK_HEARTBEAT = 60    #Как часто работающее обновление продлевает лок
+SHARDS_LOCK_TTL = 3 * 3600    #Лок, переданный завершающей задаче шардов: шарды его не продлевают
+
+_RENEW_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    redis.call('set', KEYS[1], ARGV[2], 'EX', ARGV[3])
+    return 1
+end
+return 0
+"""
+_RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+def _lock_url():
+    return getattr(settings, 'CATALOG_LOCK_URL', None) or getattr(settings, 'CELERY_BROKER_URL', '')
+
+
+class CatalogUpdateLock:
+    """
+    Single-flight лок обновления каталога в Redis (брокер Celery): значение ключа — ID задачи-владельца,
+    поэтому повторный запуск может присоединиться к уже идущему обновлению. Лок живёт LOCK_TTL секунд
+    и продлевается heartbeat, так что упавший воркер не держит его вечно. Продление, передача и снятие
+    выполняются скриптами Lua только владельцем.
+    Адрес Redis — settings.CATALOG_LOCK_URL или брокер Celery. Если это не Redis (разработка, eager-режим),
+    лок хранится в кэше Django — без атомарности сравнения, чего достаточно для одного хоста.
+    """
+    def __init__(self, client=None):
+        url = _lock_url()
+        if client is None and url.startswith(('redis://', 'rediss://')):
+            import redis
+            client = redis.Redis.from_url(url, decode_responses=True)
+        self.client = client
+        self._handed_over = set()    #Владельцы, передавшие лок через этот экземпляр
+        if client is not None:
+            self._renew = client.register_script(_RENEW_SCRIPT)
+            self._release = client.register_script(_RELEASE_SCRIPT)
+
+    def holder(self):
+        """
+        ID владельца лока или None, если обновление не выполняется.
+        """
+        return self.client.get(LOCK_KEY) if self.client is not None else cache.get(LOCK_KEY)
+
+    def acquire(self, owner, ttl=LOCK_TTL):
+        if self.client is not None:
+            return bool(self.client.set(LOCK_KEY, owner, nx=True, ex=ttl))
+        return cache.add(LOCK_KEY, owner, ttl)
+
+    def renew(self, owner, ttl=LOCK_TTL, new_owner=None):
+        """
+        Продлевает лок владельца; new_owner — передать лок другой задаче. False — лок уже не наш.
+        """
+        new_owner = new_owner or owner
+        if self.client is not None:
+            renewed = bool(self._renew(keys=[LOCK_KEY], args=[owner, new_owner, ttl]))
+        elif cache.get(LOCK_KEY) != owner:
+            renewed = False
+        else:
+            cache.set(LOCK_KEY, new_owner, ttl)
+            renewed = True
+        if renewed and new_owner != owner:
+            self._handed_over.add(owner)
+        return renewed
+
+    def release(self, owner):
+        """
+        Снимает лок, только если он всё ещё принадлежит owner (после передачи — ничего не делает).
+        """
+        if self.client is not None:
+            return bool(self._release(keys=[LOCK_KEY], args=[owner]))
+        if cache.get(LOCK_KEY) != owner:
+            return False
+        cache.delete(LOCK_KEY)
+        return True
+
+    @contextmanager
+    def heartbeat(self, owner, interval=LOCK_HEARTBEAT, ttl=LOCK_TTL):
+        """
+        Продлевает лок в фоновом потоке, пока выполняется блок with, и отдаёт threading.Event «лок потерян»
+        (для ImportProgress(cancel=...)): он устанавливается, если лок истёк или занят другим владельцем
+        или если продлить его не удаётся дольше ttl (ошибки Redis выводятся и не останавливают поток раньше).
+        Лок, переданный этим экземпляром другой задаче (renew с new_owner), потерянным не считается.
+        """
+        stop, lost = threading.Event(), threading.Event()
+
+        def beat():
+            renewed_at = time.monotonic()
+            while not stop.wait(interval):
+                try:
+                    renewed = self.renew(owner, ttl)
+                except Exception as e:
+                    print(f"⚠️ Не удалось продлить лок обновления каталога: {e}")
+                    if time.monotonic() - renewed_at < ttl:
+                        continue
+                    renewed = False
+                if not renewed:
+                    if owner not in self._handed_over:
+                        print(f"❌ Лок обновления каталога потерян (владелец {owner}), обновление будет остановлено.")
+                        lost.set()
+                    return
+                renewed_at = time.monotonic()
+
+        thread = threading.Thread(target=beat, daemon=True)
+        thread.start()
+        try:
+            yield lost
+        finally:
+            stop.set()
+            thread.join()
@@ -0,0 +1,180 @@
+from contextlib import nullcontext
+from functools import partial
+from uuid import uuid4
+from django.db import transaction
+from spare_parts.management.catalog_publish import snapshot_catalog, publish_catalog_snapshot, \
+    expire_catalog_snapshot
+from spare_parts.management.fetch_feeds import fetch_and_prepare_feeds, downloaded_feeds, save_feed_state
+from spare_parts.management.dry_run import run_dry_run
+from spare_parts.management.fetch_prepare_donors import stream_and_prepare_donors
+from spare_parts.management.fetch_prepare_parts import stream_and_prepare_parts
+from spare_parts.management.import_checkpoint import open_checkpoint, persist_prepared_chunks, \
+    persist_prepared_frame, resumed_chunks, record_checkpoint, clear_checkpoint
+from spare_parts.management.progress import ImportProgress
+from spare_parts.management.quarantine import deferred_quarantine
+from spare_parts.management.import_to_db import import_donors_to_db, import_parts_to_db, plan_sharded_parts_import, \
+    finalize_sharded_parts_import
+
+
+def _import_succeeded(result):
+    """
+    Фид принят целиком: импорт дочитал его до конца, не потерял ни одной строки и снял с продажи пропавшие запчасти.
+    Строки, отклонённые проверкой ('rejected'), — ошибки самого фида: они в карантине и приёму фида не мешают.
+    """
+    return bool(result) and result['feed_complete'] and not result['failed'] and not result.get('sweep_blocked')
+
+
+def run_catalog_update(stdout, streaming=False, force=False, write_xlsx=False, on_progress=None, parts_shards=0,
+                       dispatch_parts_shards=None, allow_mass_removal=False, dry_run=False, report_path=None,
+                       atomic_publish=False, run_id=None, cancel=None):
+    """
+    Полный цикл обновления каталога, общий для задачи Celery и команды update_catalog.
+    Оба фида скачиваются одновременно с условными заголовками; неизменившийся фид не обрабатывается
+    и не импортируется. streaming — импорт частями из временного файла, force — игнорировать сохранённые
+    ETag/Last-Modified/SHA-256, write_xlsx — сохранить копии подготовленных фидов для просмотра.
+    on_progress(meta) получает снимки ImportProgress: этап, строки, ошибки, скорость, ETA.
+    Возвращает {'donors': ..., 'parts': ...}: результат импорта, 'unchanged' или None,
+    если фид не удалось подготовить.
+    parts_shards > 1 и dispatch_parts_shards — шардированный импорт запчастей: здесь строится план,
+    а dispatch_parts_shards(shards, finalize_kwargs) запускает запись шардов и finalize_parts_shards
+    (например, chord Celery) и возвращает результат для отчёта.
+    allow_mass_removal — снять с продажи пропавшие из фида запчасти, даже если их подозрительно много.
+    dry_run — пробный запуск: те же скачивание, подготовка и чтение справочников, но вместо импорта
+    считается набор изменений (dry_run.run_dry_run) и сохраняется отчёт в report_path; каталог и состояние фидов
+    не меняются. Возвращает {'dry_run': сводка, 'report_path': путь}.
+    atomic_publish — доноры, запчасти, снятие с продажи и состояние фидов пишутся одной транзакцией:
+    витрина до её завершения видит прежний каталог целиком, а публикация — это COMMIT. Если хотя бы один
+    изменившийся фид принят не полностью (оборвался, потерял строки, снятие с продажи заблокировано),
+    транзакция откатывается целиком: каталог, состояние фидов и снимок остаются прежними. Прежний каталог
+    копируется в начале транзакции и становится снимком *_prev для отката (rollback_catalog) только вместе
+    с принятой публикацией. Копия полная — запчасти, доноры, фото и связи, — поэтому публикация дольше
+    обычного импорта на время копирования каталога. Обычный импорт после публикации делает снимок негодным
+    для отката (expire_catalog_snapshot).
+    Карантин отклонённых строк пишется после транзакции и сохраняется и при отменённой публикации.
+    Шардированный импорт в этом режиме не используется: шарды пишут в своих транзакциях.
+    Импорт запчастей (кроме шардированного) идёт с контрольными точками (import_checkpoint): подготовленный
+    фид по мере импорта дописывается в файл точки, после каждой записанной части фида запоминается последняя
+    строка. Если прошлая попытка прервалась, а содержимое фида (SHA-256) то же, импорт продолжается с точки —
+    по сохранённому файлу без подготовки, если прошлая попытка дочитала фид до конца.
+    run_id — ключ запуска в карантине импорта (ImportQuarantine), по умолчанию новый UUID.
+    cancel — threading.Event (CatalogUpdateLock.heartbeat): установлен — обновление прерывается на следующей
+    пачке исключением ImportCancelled; атомарная публикация при этом откатывается целиком.
+    """
+    from spare_parts.category_mapping import TRANSMISSION_MAP, CATEGORY_SLUG_MAP, CATEGORY_MAPPING, \
+        GENERATION_MODELS
+    from spare_parts.models import (
+        CarMake, CarModel, CarGeneration, PartSubCategory, Part,
+        DonorVehicle, Category, PartImage, DonorVehicleImage, FeedState, ImportCheckpoint
+    )
+    progress = ImportProgress(on_progress, cancel=cancel)
+    run_id = run_id or uuid4().hex
+
+    progress.start('Скачивание фидов.')
+    with downloaded_feeds(stdout, FeedState, force=force) as feeds:
+        results = {key: 'unchanged' for key, feed in feeds.items() if not feed['changed']}
+        if atomic_publish:
+            parts_shards = 0
+        checkpoint, resumed = None, False
+        if 'parts' not in results and not dry_run and not (parts_shards > 1 and dispatch_parts_shards is not None):
+            checkpoint, resumed = open_checkpoint(ImportCheckpoint, 'parts', feeds['parts'])
+        elif results.get('parts') == 'unchanged' and not dry_run:
+            clear_checkpoint(ImportCheckpoint, 'parts')    #Точка прерванного принудительного запуска устарела
+        to_prepare = {key: feed for key, feed in feeds.items()
+                      if key not in results and not (key == 'parts' and resumed)}    #Продолжение — без подготовки
+        if streaming:
+            sources = {key: {'chunks': stream(stdout, CATEGORY_MAPPING, GENERATION_MODELS, feed=feeds[key])}
+                       for key, stream in (('donors', stream_and_prepare_donors), ('parts', stream_and_prepare_parts))
+                       if key in to_prepare}    #Генераторы: фид разбирается по мере импорта
+        else:
+            progress.start('Подготовка фидов.')
+            donors_df, parts_df = fetch_and_prepare_feeds(stdout, CATEGORY_MAPPING, GENERATION_MODELS,
+                                                          feeds=to_prepare, write_xlsx=write_xlsx)
+            sources = {key: {'df': df} for key, df in (('donors', donors_df), ('parts', parts_df)) if df is not None}
+        if resumed:
+            stdout.write(f"⏭️ Фид 'parts' уже подготовлен прерванной попыткой, импорт продолжается "
+                         f"после строки {checkpoint.rows_committed}.")
+            sources['parts'] = {'chunks': resumed_chunks(checkpoint)}
+        elif checkpoint is not None and 'parts' in sources:
+            parts = sources['parts']
+            if streaming:
+                sources['parts'] = {'chunks': persist_prepared_chunks(ImportCheckpoint, checkpoint, parts['chunks'])}
+            else:
+                sources['parts'] = {'df': parts['df'],    #Только число строк для прогресса — строки идут из chunks
+                                    'chunks': persist_prepared_frame(ImportCheckpoint, checkpoint, parts['df'])}
+        if checkpoint is not None and 'parts' in sources:
+            sources['parts'].update(resume_after_row=checkpoint.rows_committed,
+                                    on_rows_committed=partial(record_checkpoint, ImportCheckpoint, checkpoint))
+
+        if dry_run:
+            return run_dry_run(stdout, feeds, results, sources, progress, report_path)
+        atomic_publish = atomic_publish and bool(sources)    #Оба фида не изменились — публиковать нечего
+        with deferred_quarantine(stdout, atomic_publish) as quarantines, \
+                transaction.atomic() if atomic_publish else nullcontext():    #Карантин пишется после исхода транзакции
+            if atomic_publish:
+                snapshot_catalog(Part, PartImage, DonorVehicle, DonorVehicleImage, FeedState)    #Пока в *_prev_pending
+            elif sources:
+                expire_catalog_snapshot(FeedState)    #Снимок прошлой публикации не покрывает этот импорт
+            if 'donors' in sources:    #Доноры раньше запчастей: запчасти ссылаются на них по ID донора
+                results['donors'] = import_donors_to_db(stdout, CarMake, CarModel, CarGeneration, DonorVehicle,
+                                                        DonorVehicleImage, TRANSMISSION_MAP, progress=progress,
+                                                        run_id=run_id, feed_sha256=feeds['donors']['sha256'],
+                                                        deferred_quarantine=quarantines, **sources['donors'])
+            sharded = 'parts' in sources and parts_shards > 1 and dispatch_parts_shards is not None
+            if sharded:
+                plan = plan_sharded_parts_import(stdout, CarMake, CarModel, CarGeneration, DonorVehicle, Category,
+                                                 PartSubCategory, Part, parts_shards, progress=progress,
+                                                 run_id=run_id, feed_sha256=feeds['parts']['sha256'],
+                                                 **sources['parts'])
+                if plan is not None:
+                    finalize_kwargs = {'plan_totals': plan['totals'], 'removed_part_ids': plan['removed_part_ids'],
+                                       'feed_sourced_count': plan['feed_sourced_count'],
+                                       'feed_complete': plan['feed_complete'], 'feed': feeds['parts'],
+                                       'allow_mass_removal': allow_mass_removal}
+                    shards = [rows for rows in plan['shards'] if rows]
+                    results['parts'] = dispatch_parts_shards(shards, finalize_kwargs) if shards else \
+                        finalize_parts_shards(stdout, [], **finalize_kwargs)    #Записывать нечего: итог сразу
+            elif 'parts' in sources:
+                results['parts'] = import_parts_to_db(stdout, CarMake, CarModel, CarGeneration, DonorVehicle,
+                                                      Category, PartSubCategory, Part, PartImage, CATEGORY_SLUG_MAP,
+                                                      progress=progress, allow_mass_removal=allow_mass_removal,
+                                                      run_id=run_id, feed_sha256=feeds['parts']['sha256'],
+                                                      deferred_quarantine=quarantines, **sources['parts'])
+
+            accepted = {key: results.get(key) == 'unchanged' or _import_succeeded(results.get(key))
+                        for key in feeds if not (key == 'parts' and sharded)}    #Шарды: состояние сохранит finalize
+            published = not atomic_publish or all(accepted.values())
+            if not published:
+                transaction.set_rollback(True)
+                rejected = ', '.join(f"'{key}'" for key, ok in accepted.items() if not ok)
+                stdout.write(f"⚠️ Атомарная публикация отменена: фид {rejected} принят не полностью. Каталог, "
+                             f"состояние фидов и снимок для отката не изменились.")
+            else:
+                for key, ok in accepted.items():
+                    if ok:
+                        save_feed_state(FeedState, key, feeds[key])
+                    else:
+                        stdout.write(f"⚠️ Фид '{key}' принят не полностью: при следующем запуске он будет "
+                                     f"обработан снова.")
+                if atomic_publish:
+                    publish_catalog_snapshot(Part, PartImage, DonorVehicle, DonorVehicleImage, FeedState)
+    if published and checkpoint is not None and _import_succeeded(results.get('parts')):
+        clear_checkpoint(ImportCheckpoint, 'parts')
+    return {'donors': results.get('donors'), 'parts': results.get('parts')}
+
+
+def finalize_parts_shards(stdout, shard_totals, plan_totals, removed_part_ids, feed_sourced_count, feed_complete,
+                          feed, allow_mass_removal=False):
+    """
+    Завершение шардированного импорта запчастей: итог по шардам, сброс отпечатков пропавших запчастей
+    и сохранение состояния фида, если все шарды записаны без потерь.
+    """
+    from spare_parts.models import Part, FeedState
+
+    result = finalize_sharded_parts_import(stdout, Part, plan_totals, shard_totals, removed_part_ids,
+                                           feed_sourced_count, feed_complete, allow_mass_removal)
+    if _import_succeeded(result):
+        save_feed_state(FeedState, 'parts', feed)
+    else:
+        stdout.write("⚠️ Фид 'parts' принят не полностью: при следующем запуске он будет обработан снова.")
+    return result
+
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-18 06:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spare_parts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='donorvehicle',
+            name='feed_hash',
+            field=models.CharField(blank=True, help_text='SHA-256 нормализованной строки фида поставщика', max_length=64, null=True, verbose_name='Отпечаток строки фида'),
+        ),
+        migrations.AddField(
+            model_name='part',
+            name='feed_hash',
+            field=models.CharField(blank=True, help_text='SHA-256 нормализованной строки фида поставщика', max_length=64, null=True, verbose_name='Отпечаток строки фида'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-18 06:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spare_parts', '0002_feed_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('feed', models.CharField(help_text="'donors' или 'parts'", max_length=50, unique=True, verbose_name='Фид')),
+                ('url', models.URLField(blank=True, max_length=500, null=True, verbose_name='Адрес фида')),
+                ('etag', models.CharField(blank=True, max_length=255, null=True, verbose_name='ETag')),
+                ('last_modified', models.CharField(blank=True, max_length=64, null=True, verbose_name='Last-Modified')),
+                ('body_sha256', models.CharField(blank=True, max_length=64, null=True, verbose_name='SHA-256 содержимого')),
+                ('imported_at', models.DateTimeField(auto_now=True, verbose_name='Последний успешный импорт')),
+            ],
+            options={
+                'verbose_name': 'Состояние фида',
+                'verbose_name_plural': 'Состояния фидов',
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spare_parts', '0003_feed_state'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('feed', models.CharField(help_text="'donors' или 'parts'", max_length=50, unique=True, verbose_name='Фид')),
+                ('body_sha256', models.CharField(max_length=64, verbose_name='SHA-256 содержимого')),
+                ('prepared_file', models.CharField(max_length=500, verbose_name='Подготовленный фид')),
+                ('prepared_rows', models.PositiveIntegerField(blank=True, help_text='Пусто, пока файл не записан целиком', null=True, verbose_name='Строк в подготовленном фиде')),
+                ('rows_committed', models.PositiveIntegerField(default=0, verbose_name='Записано до строки фида')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Обновлена')),
+            ],
+            options={
+                'verbose_name': 'Контрольная точка импорта',
+                'verbose_name_plural': 'Контрольные точки импорта',
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spare_parts', '0004_import_checkpoint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportQuarantine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('run_id', models.CharField(db_index=True, max_length=64, verbose_name='Запуск импорта')),
+                ('feed', models.CharField(help_text="'donors' или 'parts'", max_length=50, verbose_name='Фид')),
+                ('row_num', models.PositiveIntegerField(verbose_name='Строка фида')),
+                ('record_key', models.CharField(blank=True, max_length=255, null=True, verbose_name='Артикул / ID донора')),
+                ('error_class', models.CharField(max_length=100, verbose_name='Класс ошибки')),
+                ('error', models.TextField(verbose_name='Ошибка')),
+                ('values', models.JSONField(default=dict, verbose_name='Значения строки')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Дата')),
+            ],
+            options={
+                'verbose_name': 'Строка в карантине импорта',
+                'verbose_name_plural': 'Карантин импорта',
+            },
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:24
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+BACKFILL_SQL = """
+    UPDATE spare_parts_part p SET search_vector =
+        setweight(to_tsvector('russian', coalesce(p.title, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(p.part_number, '')), 'A') ||
+        setweight(to_tsvector('russian', coalesce(mk.name, '') || ' ' || coalesce(m.name, '')), 'B') ||
+        setweight(to_tsvector('russian', coalesce(p.description, '')), 'C')
+    FROM spare_parts_cargeneration g
+    JOIN spare_parts_carmodel m ON m.id = g.model_id
+    JOIN spare_parts_carmake mk ON mk.id = m.make_id
+    WHERE g.id = p.donor_generation_id
+"""    #Копия spare_parts.search на момент миграции: миграция не должна зависеть от будущих правок модуля
+
+
+def backfill_search_vectors(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(BACKFILL_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spare_parts', '0005_import_quarantine'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='part',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, help_text='Заголовок, номер, марка и модель донора, описание — для полнотекстового поиска', null=True, verbose_name='Поисковый вектор'),
+        ),
+        migrations.AddIndex(
+            model_name='part',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='part_search_vector_gin'),
+        ),
+        migrations.RunPython(backfill_search_vectors, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:26
+
+from django.db import migrations, models
+
+
+HOMOGLYPHS = str.maketrans('АВЕКМНОРСТУХ', 'ABEKMHOPCTYX')
+BATCH_SIZE = 2000
+
+
+def _part_number_key(value):    #Копия spare_parts.search.normalize_part_number на момент миграции
+    if not value:
+        return None
+    key = ''.join(char for char in str(value).upper().translate(HOMOGLYPHS) if char.isalnum())
+    return key[:100] or None
+
+
+def backfill_part_number_keys(apps, schema_editor):
+    Part = apps.get_model('spare_parts', 'Part')
+    batch = []
+    for part in Part.objects.exclude(part_number__isnull=True).exclude(part_number='').only(
+            'id', 'part_number').iterator(chunk_size=BATCH_SIZE):
+        part.part_number_key = _part_number_key(part.part_number)
+        batch.append(part)
+        if len(batch) >= BATCH_SIZE:
+            Part.objects.bulk_update(batch, ['part_number_key'])
+            batch = []
+    if batch:
+        Part.objects.bulk_update(batch, ['part_number_key'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spare_parts', '0006_part_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='part',
+            name='part_number_key',
+            field=models.CharField(blank=True, editable=False, help_text='Номер производителя без разделителей, в верхнем регистре, латиницей — для поиска по номеру', max_length=100, null=True, verbose_name='Ключ номера'),
+        ),
+        migrations.RunPython(backfill_part_number_keys, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='part',
+            index=models.Index(fields=['part_number_key'], name='part_number_key_idx', opclasses=['varchar_pattern_ops']),
+        ),
+    ]
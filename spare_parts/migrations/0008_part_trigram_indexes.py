@@ -0,0 +1,24 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:28
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spare_parts', '0007_part_number_key'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddIndex(
+            model_name='part',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['title'], name='part_title_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='part',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['part_number_key'], name='part_number_key_trgm', opclasses=['gin_trgm_ops']),
+        ),
+    ]
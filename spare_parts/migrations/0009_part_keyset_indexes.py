@@ -0,0 +1,21 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spare_parts', '0008_part_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='part',
+            index=models.Index(fields=['title', 'id'], name='part_title_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='part',
+            index=models.Index(fields=['created_at', 'id'], name='part_created_at_id_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spare_parts', '0009_part_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importquarantine',
+            name='feed_sha256',
+            field=models.CharField(blank=True, db_index=True, help_text='Содержимое фида, в котором строка отклонена: повторный импорт того же фида не дублирует карантин', max_length=64, null=True, verbose_name='SHA-256 фида'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spare_parts', '0010_import_quarantine_feed_sha256'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='part',
+            name='deactivated_by_sweep',
+            field=models.BooleanField(default=False, editable=False, help_text='Снята с продажи, потому что пропала из фида: вернётся в продажу, когда снова появится в фиде', verbose_name='Снята импортом'),
+        ),
+    ]
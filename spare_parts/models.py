@@ -1,9 +1,12 @@
-import uuid
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.core.exceptions import ValidationError
 from django.db import models
 from django.utils.text import slugify
 
 from spare_parts.category_mapping import CATEGORY_SLUG_MAP
+from spare_parts.search import normalize_part_number, refresh_part_search_vectors, SEARCH_VECTOR_FIELDS
+from spare_parts.slugs import fallback_slug, save_with_unique_slug
 
 NULLABLE = {'blank': True, 'null': True}
 
@@ -72,18 +75,9 @@ class Category(models.Model):
         Автоматически генерирует slug
         """
         if not self.slug or self._state.adding:
-            name_normalized = self.name.upper().strip()
-            base_slug = None
-            base_slug = CATEGORY_SLUG_MAP.get(name_normalized)
-            if not base_slug:
-                base_slug = str(uuid.uuid4())[:8]
-            self.slug = base_slug
-            counter = 1
-            while Category.objects.filter(slug=self.slug).exists():
-                if self.pk is not None and Category.objects.get(pk=self.pk).slug == self.slug:
-                    break
-                self.slug = f"{base_slug}-{counter}"
-                counter += 1
+            base_slug = CATEGORY_SLUG_MAP.get(self.name.upper().strip()) or fallback_slug()
+            save_with_unique_slug(self, base_slug, lambda: super(Category, self).save(*args, **kwargs))
+            return
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -132,11 +126,9 @@ class PartSubCategory(models.Model):
 
     def save(self, *args, **kwargs):
         if not self.slug:
-            if self.title:
-                self.slug = slugify(self.title)
-            else:
-                # Если title пустой, создаём уникальный slug по UUID
-                self.slug = str(uuid.uuid4())[:8]  # 8 символов достаточно
+            base_slug = slugify(self.title) or fallback_slug()    #Пустой title или только кириллица
+            save_with_unique_slug(self, base_slug, lambda: super(PartSubCategory, self).save(*args, **kwargs))
+            return
         super().save(*args, **kwargs)
 
 
@@ -156,6 +148,7 @@ class Part(models.Model):
     title = models.CharField(max_length=255, verbose_name='Заголовок')
     description = models.TextField(verbose_name='Подробное описание')
     part_number = models.CharField(max_length=100, verbose_name='OEM/Артикул', **NULLABLE)
+    part_number_key = models.CharField(max_length=100, editable=False, verbose_name='Ключ номера', help_text="Номер производителя без разделителей, в верхнем регистре, латиницей — для поиска по номеру", **NULLABLE)
     donor_generation = models.ForeignKey('CarGeneration',on_delete=models.PROTECT,related_name='donor_parts',verbose_name='Автомобиль-донор (Поколение/Модификация)')
     car_generations = models.ManyToManyField('CarGeneration',related_name='compatible_parts', verbose_name='Совместимые модификации/поколения', blank=True)    #Связь с совместимыми машинами (куда подходит запчасть)
     donor_vehicle = models.ForeignKey('DonorVehicle',on_delete=models.SET_NULL,blank=True,null=True,related_name='parts',verbose_name="Конкретная машина-донор (поступление)",help_text="С какой конкретной машины снята эта запчасть")
@@ -163,6 +156,9 @@ class Part(models.Model):
     condition = models.CharField(max_length=10, choices=CONDITION_CHOICES, default='used', verbose_name='Состояние')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
     is_active = models.BooleanField(default=True, verbose_name='Активно')
+    deactivated_by_sweep = models.BooleanField(default=False, editable=False, verbose_name='Снята импортом', help_text="Снята с продажи, потому что пропала из фида: вернётся в продажу, когда снова появится в фиде")
+    feed_hash = models.CharField(max_length=64, verbose_name='Отпечаток строки фида', help_text="SHA-256 нормализованной строки фида поставщика", **NULLABLE)
+    search_vector = SearchVectorField(null=True, editable=False, verbose_name='Поисковый вектор', help_text="Заголовок, номер, марка и модель донора, описание — для полнотекстового поиска")
 
     def __str__(self):
         return self.title
@@ -171,6 +167,27 @@ class Part(models.Model):
         verbose_name = 'Запчасть (Объявление)'
         verbose_name_plural = 'Запчасти (Объявления)'
         ordering = ('-created_at',)
+        indexes = [
+            GinIndex(fields=['search_vector'], name='part_search_vector_gin'),
+            models.Index(fields=['part_number_key'], name='part_number_key_idx', opclasses=['varchar_pattern_ops']),    #= и LIKE 'ключ%'
+            GinIndex(fields=['title'], name='part_title_trgm', opclasses=['gin_trgm_ops']),    #Нечёткий поиск, pg_trgm
+            GinIndex(fields=['part_number_key'], name='part_number_key_trgm', opclasses=['gin_trgm_ops']),
+            models.Index(fields=['title', 'id'], name='part_title_id_idx'),    #Пагинация по ключу (spare_parts.pagination)
+            models.Index(fields=['created_at', 'id'], name='part_created_at_id_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.part_number_key = normalize_part_number(self.part_number)
+        if self.is_active:
+            self.deactivated_by_sweep = False    #Возвращённая в продажу вручную запчасть больше не «снята импортом»
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'part_number' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'part_number_key'}
+        if update_fields is not None and 'is_active' in update_fields:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'deactivated_by_sweep'}
+        super().save(*args, **kwargs)
+        if update_fields is None or SEARCH_VECTOR_FIELDS.intersection(update_fields):    #Цена, is_active — не в векторе
+            refresh_part_search_vectors(Part, [self.pk])    #Вектор включает марку и модель донора — считается в БД
 
     def get_main_image_source(self):
         """
@@ -236,6 +253,7 @@ class DonorVehicle(models.Model):
     description = models.TextField(blank=True, null=True, verbose_name="Полное описание донора")
     transmission_type = models.CharField(max_length=10, choices=TRANSMISSION_CHOICES, blank=True, null=True,verbose_name="Тип КПП")
     arrival_date = models.DateField(auto_now_add=True,verbose_name="Дата поступления")
+    feed_hash = models.CharField(max_length=64, verbose_name='Отпечаток строки фида', help_text="SHA-256 нормализованной строки фида поставщика", **NULLABLE)
 
     class Meta:
         verbose_name = "Машина-донор (поступление)"
@@ -290,3 +308,69 @@ class DonorVehicleImage(models.Model):
             raise ValidationError(
                 'Нельзя заполнять одновременно "Файл Изображения" и "Внешний URL Изображения".'
             )
+
+
+class FeedState(models.Model):
+    """
+    Состояние фида поставщика после последнего успешного импорта.
+    ETag и Last-Modified отправляются при следующей загрузке (условный запрос), SHA-256 тела
+    позволяет распознать неизменившийся фид, даже если поставщик не поддерживает условные запросы.
+    """
+    feed = models.CharField(max_length=50, unique=True, verbose_name='Фид', help_text="'donors' или 'parts'")
+    url = models.URLField(max_length=500, verbose_name='Адрес фида', **NULLABLE)
+    etag = models.CharField(max_length=255, verbose_name='ETag', **NULLABLE)
+    last_modified = models.CharField(max_length=64, verbose_name='Last-Modified', **NULLABLE)
+    body_sha256 = models.CharField(max_length=64, verbose_name='SHA-256 содержимого', **NULLABLE)
+    imported_at = models.DateTimeField(auto_now=True, verbose_name='Последний успешный импорт')
+
+    class Meta:
+        verbose_name = 'Состояние фида'
+        verbose_name_plural = 'Состояния фидов'
+
+    def __str__(self):
+        return self.feed
+
+
+class ImportCheckpoint(models.Model):
+    """
+    Контрольная точка незавершённого импорта фида: подготовленный фид сохранён в prepared_file,
+    строки фида до rows_committed уже записаны в каталог. Повторный запуск с тем же содержимым фида
+    (SHA-256) пропускает подготовку и записанные строки. Удаляется после успешного импорта.
+    """
+    feed = models.CharField(max_length=50, unique=True, verbose_name='Фид', help_text="'donors' или 'parts'")
+    body_sha256 = models.CharField(max_length=64, verbose_name='SHA-256 содержимого')
+    prepared_file = models.CharField(max_length=500, verbose_name='Подготовленный фид')
+    prepared_rows = models.PositiveIntegerField(verbose_name='Строк в подготовленном фиде',
+                                                help_text='Пусто, пока файл не записан целиком', **NULLABLE)
+    rows_committed = models.PositiveIntegerField(default=0, verbose_name='Записано до строки фида')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Обновлена')
+
+    class Meta:
+        verbose_name = 'Контрольная точка импорта'
+        verbose_name_plural = 'Контрольные точки импорта'
+
+    def __str__(self):
+        return f"{self.feed}: {self.rows_committed}"
+
+
+class ImportQuarantine(models.Model):
+    """
+    Строка фида, не попавшая в каталог: номер строки, артикул или ID донора, класс и текст ошибки, значения строки.
+    Пишется пачкой в конце импорта (quarantine.RowQuarantine), поэтому не теряется вместе с выводом воркера Celery.
+    """
+    run_id = models.CharField(max_length=64, db_index=True, verbose_name='Запуск импорта')
+    feed = models.CharField(max_length=50, verbose_name='Фид', help_text="'donors' или 'parts'")
+    row_num = models.PositiveIntegerField(verbose_name='Строка фида')
+    record_key = models.CharField(max_length=255, verbose_name='Артикул / ID донора', **NULLABLE)
+    error_class = models.CharField(max_length=100, verbose_name='Класс ошибки')
+    error = models.TextField(verbose_name='Ошибка')
+    values = models.JSONField(default=dict, verbose_name='Значения строки')
+    feed_sha256 = models.CharField(max_length=64, db_index=True, verbose_name='SHA-256 фида', help_text="Содержимое фида, в котором строка отклонена: повторный импорт того же фида не дублирует карантин", **NULLABLE)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Дата')
+
+    class Meta:
+        verbose_name = 'Строка в карантине импорта'
+        verbose_name_plural = 'Карантин импорта'
+
+    def __str__(self):
+        return f"{self.feed}:{self.row_num} {self.error_class}"
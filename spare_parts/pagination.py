@@ -0,0 +1,271 @@
+import json
+import math
+from datetime import date, datetime
+from decimal import Decimal
+from urllib.parse import urlencode
+from django.core import signing
+from django.core.paginator import EmptyPage, InvalidPage, PageNotAnInteger
+from django.db import connections
+from django.db.models import Q
+from django.http import Http404
+from django.utils.functional import cached_property
+
+
+CURSOR_PARAM = 'cursor'
+CURSOR_SALT = 'spare_parts.pagination.cursor'    #Курсор подписан: значения сортировки в нём не подделать
+ESTIMATED_COUNT_THRESHOLD = 1000    #От стольких строк по оценке планировщика точный COUNT(*) не выполняется
+
+
+def _ordering_fields(queryset):
+    """
+    Поля сортировки queryset ('title', '-created_at', 'category__name', аннотации) с pk в конце — без него
+    строки с одинаковыми значениями сортировки делили бы одну позицию курсора.
+    """
+    ordering = list(queryset.query.order_by) or list(queryset.model._meta.ordering)
+    ordering = [field for field in ordering if isinstance(field, str) and field != '?']
+    if not ({'pk', 'id', '-pk', '-id'} & set(ordering)):
+        ordering.append('-pk' if ordering and ordering[-1].startswith('-') else 'pk')
+    return ordering
+
+
+def _reversed(ordering):
+    return [field[1:] if field.startswith('-') else f'-{field}' for field in ordering]
+
+
+def _object_value(obj, field):
+    value = obj
+    for attr in field.lstrip('-').split('__'):
+        value = getattr(value, attr) if value is not None else None
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def planner_row_estimate(queryset):
+    """
+    Оценка числа строк queryset планировщиком PostgreSQL (EXPLAIN без выполнения): статистика таблиц
+    (reltuples) с учётом фильтров, соединений и DISTINCT. Стоит как планирование запроса, а не как COUNT(*).
+    """
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def _keyset_filter(ordering, values, forward):
+    """
+    Условие «после строки с values» (forward) или «до неё» в порядке ordering:
+    (a > x) OR (a = x AND b > y) OR ... Для каждого поля сравнение зависит от его направления.
+    Первое поле дополнительно ограничено нестрогим неравенством: по нему индекс (title, id) начинает
+    просмотр сразу с позиции курсора, и страница стоит одинаково на любой глубине.
+    """
+    condition = Q()
+    equal = Q()
+    for field, value in zip(ordering, values):
+        name = field.lstrip('-')
+        after = forward != field.startswith('-')
+        condition |= equal & Q(**{f"{name}__{'gt' if after else 'lt'}": value})
+        equal &= Q(**{name: value})
+    first = ordering[0].lstrip('-')
+    bound = 'gte' if forward != ordering[0].startswith('-') else 'lte'
+    return Q(**{f'{first}__{bound}': values[0]}) & condition
+
+
+class KeysetPage:
+    """
+    Страница KeysetPaginator. Повторяет интерфейс django.core.paginator.Page, который используют шаблоны
+    (has_next, number, paginator.count, ...), и добавляет курсоры соседних страниц:
+    next_page_query / previous_page_query — готовые GET-параметры ('cursor=...') для ссылок «вперёд» и «назад».
+    """
+    def __init__(self, object_list, number, paginator, has_previous, has_next):
+        self.object_list = object_list
+        self.number = number
+        self.paginator = paginator
+        self._has_previous = has_previous
+        self._has_next = has_next
+
+    def __repr__(self):
+        return f'<KeysetPage {self.number}>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    def next_page_number(self):
+        return self.number + 1
+
+    def previous_page_number(self):
+        return self.number - 1
+
+    def _cursor(self, obj, forward):
+        number = self.number + 1 if forward else self.number - 1
+        return signing.dumps({'v': [_object_value(obj, field) for field in self.paginator.ordering],
+                              'f': forward, 'n': number}, salt=CURSOR_SALT, compress=True)
+
+    @property
+    def next_cursor(self):
+        return self._cursor(self.object_list[-1], True) if self._has_next else None
+
+    @property
+    def previous_cursor(self):
+        return self._cursor(self.object_list[0], False) if self._has_previous else None
+
+    @property
+    def next_page_query(self):
+        return urlencode({CURSOR_PARAM: self.next_cursor}) if self._has_next else ''
+
+    @property
+    def previous_page_query(self):
+        if not self._has_previous:
+            return ''
+        if self.number == 2:
+            return 'page=1'    #Первая страница — без курсора: тот же адрес, что у ссылки «1»
+        return urlencode({CURSOR_PARAM: self.previous_cursor})
+
+
+class KeysetPaginator:
+    """
+    Пагинация по ключу (keyset): страница после курсора выбирается условием WHERE (title, id) > (последняя
+    строка предыдущей страницы) с LIMIT — без OFFSET, поэтому страница 5000 стоит столько же, сколько первая.
+    Порядок берётся из order_by queryset, pk добавляется в конец для однозначности.
+    Переход по номеру (?page=N) остаётся — через OFFSET, как у django.core.paginator.Paginator.
+    Общее число строк (count, num_pages) считается только при обращении — например, из шаблона.
+    """
+    def __init__(self, object_list, per_page):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.ordering = _ordering_fields(object_list)
+
+    @cached_property
+    def count(self):
+        return self.object_list.count()
+
+    count_is_estimated = False    #Шаблон показывает «~N», если True
+
+    @cached_property
+    def num_pages(self):
+        return max(math.ceil(self.count / self.per_page), 1)
+
+    @property
+    def page_range(self):
+        return range(1, self.num_pages + 1)
+
+    def page(self, number=1):
+        """
+        Страница по номеру (OFFSET). Исключения — как у Paginator: PageNotAnInteger, EmptyPage.
+        """
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger('Номер страницы должен быть целым числом')
+        if number < 1:
+            raise EmptyPage('Номер страницы меньше 1')
+        offset = (number - 1) * self.per_page
+        rows = list(self.object_list.order_by(*self.ordering)[offset:offset + self.per_page + 1])
+        if not rows and number > 1:
+            if self.count_is_estimated and number <= self.num_pages:
+                return self._last_page(number)    #Оценка завысила число страниц: ссылка на «последнюю» ведёт сюда
+            raise EmptyPage('Страница пуста')
+        return KeysetPage(rows[:self.per_page], number, self, number > 1, len(rows) > self.per_page)
+
+    def _last_page(self, number):
+        """
+        Последние per_page строк — обратной сортировкой с LIMIT, без OFFSET.
+        """
+        rows = list(self.object_list.order_by(*_reversed(self.ordering))[:self.per_page])
+        rows.reverse()
+        return KeysetPage(rows, number, self, number > 1, False)
+
+    def page_after(self, cursor):
+        """
+        Страница по курсору KeysetPage.next_cursor / previous_cursor.
+        Неверный курсор — PageNotAnInteger, как нечисловой номер.
+        """
+        try:
+            data = signing.loads(cursor, salt=CURSOR_SALT)
+            values, forward, number = data['v'], data['f'], max(int(data['n']), 1)
+        except (signing.BadSignature, KeyError, TypeError, ValueError):
+            raise PageNotAnInteger('Неверный курсор')
+        if len(values) != len(self.ordering):
+            raise PageNotAnInteger('Курсор от другой сортировки')
+        ordering = self.ordering if forward else _reversed(self.ordering)
+        rows = list(self.object_list.filter(_keyset_filter(self.ordering, values, forward))
+                    .order_by(*ordering)[:self.per_page + 1])
+        more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if forward:
+            return KeysetPage(rows, number, self, True, more)
+        rows.reverse()
+        return KeysetPage(rows, number, self, more, True)
+
+    def page_from_request(self, request, page_kwarg='page'):
+        """
+        Страница из GET-параметров: cursor (переход «вперёд»/«назад») или номер страницы.
+        """
+        cursor = request.GET.get(CURSOR_PARAM)
+        if cursor:
+            return self.page_after(cursor)
+        page = request.GET.get(page_kwarg) or 1
+        if page == 'last':
+            page = self.num_pages
+        return self.page(page)
+
+
+class EstimatedCountPaginator(KeysetPaginator):
+    """
+    KeysetPaginator, который не считает большие выборки точно. На PostgreSQL число строк сначала оценивает
+    планировщик: меньше ESTIMATED_COUNT_THRESHOLD — выполняется точный COUNT(*) (небольшая отфильтрованная
+    выборка считается быстро), иначе count — оценка и count_is_estimated = True. Номер последней страницы
+    по оценке может не совпасть с настоящим — такая ссылка открывает последнюю страницу.
+    На других СУБД — точный COUNT(*).
+    """
+    @cached_property
+    def _counted(self):
+        if connections[self.object_list.db].vendor == 'postgresql':
+            estimate = planner_row_estimate(self.object_list)
+            if estimate >= ESTIMATED_COUNT_THRESHOLD:
+                return estimate, True
+        return self.object_list.count(), False
+
+    @property
+    def count(self):
+        return self._counted[0]
+
+    @property
+    def count_is_estimated(self):
+        return self._counted[1]
+
+
+class KeysetPaginationMixin:
+    """
+    Для ListView: страницы через KeysetPaginator (по умолчанию — с оценкой числа строк, EstimatedCountPaginator)
+    вместо Paginator. Неверный номер или курсор — 404, как в ListView.
+    """
+    keyset_paginator_class = EstimatedCountPaginator
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator = self.keyset_paginator_class(queryset, page_size)
+        try:
+            page = paginator.page_from_request(self.request, self.page_kwarg)
+        except InvalidPage as e:
+            raise Http404(f'Неверная страница: {e}')
+        return paginator, page, page.object_list, page.has_other_pages()
@@ -0,0 +1,129 @@
+import re
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramSimilarity, TrigramWordSimilarity
+from django.db import connection
+from django.db.models import F, FloatField, Q
+from django.db.models.functions import Cast, Greatest
+
+
+SEARCH_CONFIG = 'russian'    #Стемминг кириллицы; латиница (марки, модели) — english_stem
+SEARCH_VECTOR_SQL = """
+    setweight(to_tsvector('russian', coalesce(p.title, '')), 'A') ||
+    setweight(to_tsvector('simple', coalesce(p.part_number, '')), 'A') ||
+    setweight(to_tsvector('russian', coalesce(mk.name, '') || ' ' || coalesce(m.name, '')), 'B') ||
+    setweight(to_tsvector('russian', coalesce(p.description, '')), 'C')
+"""    #Номер производителя — без стемминга: 'simple' разбирает его на те же части, что и запрос
+SEARCH_VECTOR_FIELDS = frozenset({'title', 'part_number', 'description', 'donor_generation',
+                                  'donor_generation_id'})    #Поля Part, из которых собран SEARCH_VECTOR_SQL
+PART_NUMBER_HOMOGLYPHS = str.maketrans('АВЕКМНОРСТУХ', 'ABEKMHOPCTYX')    #Кириллица, набранная вместо латиницы
+PART_NUMBER_QUERY_RE = re.compile(r'[0-9A-Za-zА-Яа-яЁё\s.\-/]+')    #Номер в том виде, как его вставляют: пробелы, точки, дефисы
+PART_NUMBER_KEY_RE = re.compile(r'(?=.*[0-9])[0-9A-Z]+')
+PART_NUMBER_MIN_LENGTH = 4    #Короче — скорее модель или опечатка, чем номер производителя
+PART_NUMBER_DIGITS_MIN_LENGTH = 6    #Номер из одних цифр — не короче: год (2015) и объём (1600) — не номера
+FUZZY_WORD_SIMILARITY = 0.4    #word_similarity запроса и заголовка: 'бампр' / 'Бампер передний' — 0.67, 'дврь' / 'Дверь' — 0.4
+FUZZY_NUMBER_SIMILARITY = 0.3    #similarity ключей номера: переставленные соседние цифры — около 0.45
+
+
+def normalize_part_number(value):
+    """
+    Ключ номера производителя (Part.part_number_key): только буквы и цифры в верхнем регистре,
+    кириллические двойники латинских букв заменены латиницей. '85311-4y.000' и '853114Y000' дают один ключ.
+    """
+    if not value:
+        return None
+    key = ''.join(char for char in str(value).upper().translate(PART_NUMBER_HOMOGLYPHS) if char.isalnum())
+    return key[:100] or None
+
+
+def fulltext_search_available():
+    return connection.vendor == 'postgresql'
+
+
+def refresh_part_search_vectors(Part, part_pks=None, part_ids_sql=None, params=()):
+    """
+    Пересчитывает Part.search_vector одним UPDATE: заголовок и номер производителя (вес A), марка и модель
+    донора (B), описание (C). part_pks — id запчастей, part_ids_sql — подзапрос артикулов (part_id) вместо них,
+    без обоих — весь каталог. Вызывается импортом после записи пачки и Part.save; вне PostgreSQL ничего не делает.
+    """
+    if not fulltext_search_available():
+        return 0
+    where, where_params = '', []
+    if part_pks is not None:
+        if not part_pks:
+            return 0
+        where, where_params = 'AND p.id = ANY(%s)', [list(part_pks)]
+    elif part_ids_sql is not None:
+        where, where_params = f'AND p.part_id IN ({part_ids_sql})', list(params)
+    Generation = Part._meta.get_field('donor_generation').related_model
+    Model = Generation._meta.get_field('model').related_model
+    Make = Model._meta.get_field('make').related_model
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            UPDATE {Part._meta.db_table} p SET search_vector = {SEARCH_VECTOR_SQL}
+            FROM {Generation._meta.db_table} g
+            JOIN {Model._meta.db_table} m ON m.id = g.model_id
+            JOIN {Make._meta.db_table} mk ON mk.id = m.make_id
+            WHERE g.id = p.donor_generation_id {where}""", where_params)
+        return cursor.rowcount
+
+
+def part_number_query_key(query):
+    """
+    Ключ номера производителя, если запрос похож на номер: латиница (с двойниками из кириллицы) и цифры,
+    хотя бы одна цифра, разделители — пробелы, точки, дефисы, слэши. Иначе None.
+    Ключ из одних цифр короче PART_NUMBER_DIGITS_MIN_LENGTH — скорее год или объём двигателя: такой запрос
+    идёт в полнотекстовый поиск, а не перекрывается номерами, которые с него начинаются.
+    """
+    if not PART_NUMBER_QUERY_RE.fullmatch(query.strip()):
+        return None
+    key = normalize_part_number(query)
+    if not key or len(key) < PART_NUMBER_MIN_LENGTH or not PART_NUMBER_KEY_RE.fullmatch(key):
+        return None
+    if key.isdigit() and len(key) < PART_NUMBER_DIGITS_MIN_LENGTH:
+        return None
+    return key
+
+
+def fuzzy_search_parts(queryset, query, key=None):
+    """
+    Нечёткий поиск (pg_trgm) для запросов, которые точный поиск не нашёл: опечатки в словах заголовка
+    (word_similarity не ниже FUZZY_WORD_SIMILARITY) и в номере производителя (similarity не ниже
+    FUZZY_NUMBER_SIMILARITY). Пороги — явные условия на сходство, а не настройки pg_trgm.*_threshold:
+    set_config на сессию остался бы на соединении из пула и изменил бы операторы %> и % в чужих запросах.
+    Сортировка — по наибольшему сходству (similarity).
+    """
+    word_similarity = TrigramWordSimilarity(query, 'title')
+    condition = Q(title_similarity__gte=FUZZY_WORD_SIMILARITY)
+    annotations = {'title_similarity': word_similarity}
+    similarity = word_similarity
+    if key:
+        number_similarity = TrigramSimilarity('part_number_key', key)
+        condition |= Q(number_similarity__gte=FUZZY_NUMBER_SIMILARITY)
+        annotations['number_similarity'] = number_similarity
+        similarity = Greatest(word_similarity, number_similarity)
+    return (queryset.alias(**annotations).filter(condition)
+            .annotate(similarity=Cast(similarity, FloatField())))    #См. search_parts
+
+
+def search_parts(queryset, query):
+    """
+    Поиск запчастей по строке пользователя. Запрос, похожий на номер производителя, сначала ищется по индексу
+    part_number_key (точное совпадение и совпадение по началу). Если так ничего не нашлось или запрос не номер:
+    на PostgreSQL — полнотекстовый поиск по search_vector (GIN-индекс) с рангом search_rank, а если пуст и он —
+    нечёткий поиск по триграммам (fuzzy_search_parts); иначе — прежний icontains по заголовку, описанию и номеру.
+    Каждый следующий уровень запрашивается, только когда предыдущий ничего не нашёл (EXISTS по индексу).
+    Возвращает (queryset, сортировка).
+    """
+    key = part_number_query_key(query)
+    if key:
+        by_number = queryset.filter(part_number_key__startswith=key)
+        if by_number.exists():
+            return by_number, ('part_number_key', 'title')    #Точное совпадение — короче ключ — первым
+    if not fulltext_search_available():
+        return queryset.filter(Q(title__icontains=query) | Q(description__icontains=query) |
+                               Q(part_number__icontains=query)), ('title',)
+    search_query = SearchQuery(query, config=SEARCH_CONFIG, search_type='websearch')
+    found = queryset.filter(search_vector=search_query)
+    if found.exists():
+        rank = Cast(SearchRank(F('search_vector'), search_query), FloatField())    #double вместо real: ранг из курсора пагинации сравнивается без потери точности
+        return found.annotate(search_rank=rank), ('-search_rank', 'title')
+    return fuzzy_search_parts(queryset, query, key), ('-similarity', 'title')
@@ -0,0 +1,96 @@
+import uuid
+from django.db import IntegrityError, transaction
+
+
+SLUG_ALLOCATION_ATTEMPTS = 3    #Сколько раз подбирать slug заново, если его успел занять параллельный импорт
+
+
+def fallback_slug():
+    """
+    Slug для названий, из которых slugify ничего не оставил (например, только кириллица).
+    """
+    return str(uuid.uuid4())[:8]
+
+
+class SlugAllocator:
+    """
+    Подбор уникальных slug для модели без запроса к БД на каждую попытку.
+    Занятые slug читаются одним запросом: все сразу (preload) или по префиксу базового slug
+    (slug LIKE 'base%'), после чего суффиксы -1, -2, ... выдаются в памяти.
+    Выданный slug сразу считается занятым, поэтому пачка новых объектов не пересекается между собой.
+    """
+    def __init__(self, Model, field='slug'):
+        self.Model = Model
+        self.field = field
+        self.max_length = Model._meta.get_field(field).max_length
+        self.taken = {}    #{slug: pk владельца или None, если slug выдан, но ещё не сохранён}
+        self.loaded_prefixes = set()
+        self.preloaded = False
+
+    def preload(self):
+        """
+        Загружает все занятые slug модели одним запросом.
+        """
+        rows = self.Model.objects.exclude(**{f'{self.field}__isnull': True}).values_list(self.field, 'pk')
+        self.taken.update(rows)
+        self.preloaded = True
+
+    def _load_prefix(self, base_slug):
+        if self.preloaded or any(base_slug.startswith(prefix) for prefix in self.loaded_prefixes):
+            return
+        rows = self.Model.objects.filter(**{f'{self.field}__startswith': base_slug}).values_list(self.field, 'pk')
+        self.taken.update(rows)
+        self.loaded_prefixes.add(base_slug)
+
+    def allocate(self, base_slug, pk=None):
+        """
+        Свободный slug вида base_slug или base_slug-N. pk — сохраняемый объект: его собственный slug свободен.
+        """
+        base_slug = base_slug[:self.max_length]
+        self._load_prefix(base_slug)
+        slug = base_slug
+        counter = 1
+        while slug in self.taken and (pk is None or self.taken[slug] != pk):
+            suffix = f"-{counter}"
+            slug = f"{base_slug[:self.max_length - len(suffix)]}{suffix}"
+            counter += 1
+        self.taken[slug] = pk
+        return slug
+
+    def allocate_many(self, base_slugs):
+        """
+        Slug для пачки новых объектов (список в том же порядке). Для больших пачек занятые slug
+        читаются одним запросом вместо запроса на каждый префикс.
+        """
+        base_slugs = list(base_slugs)
+        if len(base_slugs) > 1 and not self.preloaded:
+            self.preload()
+        return [self.allocate(base_slug) for base_slug in base_slugs]
+
+    def refresh(self):
+        """
+        Забывает загруженное: следующий allocate перечитает занятые slug из БД (после конфликта).
+        """
+        self.taken.clear()
+        self.loaded_prefixes.clear()
+        self.preloaded = False
+
+
+def save_with_unique_slug(instance, base_slug, save, field='slug'):
+    """
+    Присваивает instance свободный slug и вызывает save() в точке сохранения.
+    Если slug успели занять между подбором и вставкой, подбирает его заново
+    (до SLUG_ALLOCATION_ATTEMPTS раз); прочие IntegrityError пробрасываются сразу.
+    """
+    allocator = SlugAllocator(type(instance), field)
+    for attempt in range(SLUG_ALLOCATION_ATTEMPTS):
+        setattr(instance, field, allocator.allocate(base_slug, pk=instance.pk))
+        try:
+            with transaction.atomic():
+                return save()
+        except IntegrityError:
+            slug_taken = type(instance).objects.filter(**{field: getattr(instance, field)}).exclude(
+                pk=instance.pk).exists()
+            if not slug_taken or attempt == SLUG_ALLOCATION_ATTEMPTS - 1:
+                raise
+            allocator.refresh()
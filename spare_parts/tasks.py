@@ -1,7 +1,12 @@
-from celery import shared_task
-from spare_parts.management.fetch_prepare_donors import fetch_and_prepare_donors
-from spare_parts.management.fetch_prepare_parts import fetch_and_prepare_parts
-from spare_parts.management.import_to_db import import_donors_to_db, import_parts_to_db
+from functools import partial
+from celery import shared_task, chord, group
+from celery.utils import uuid
+from django.db import InterfaceError, OperationalError
+from requests import RequestException
+from spare_parts.management.import_to_db import import_part_shard
+from spare_parts.management.progress import ImportCancelled
+from spare_parts.management.update_lock import CatalogUpdateLock, LOCK_TTL, SHARDS_LOCK_TTL
+from spare_parts.management.update_pipeline import run_catalog_update, finalize_parts_shards
 
 
 class MockStdout:
@@ -16,35 +21,144 @@ class MockStdout:
 
 mock_stdout = MockStdout()
 
+UPDATE_RETRY_ERRORS = (RequestException, OperationalError, InterfaceError)    #Сеть поставщика и соединение с БД
+UPDATE_MAX_RETRIES = 3
+UPDATE_RETRY_DELAY = 120    #Секунд до первого повтора; дальше задержка удваивается
 
-@shared_task(bind=True)
-def update_catalog_task(self):
+
+def _retry_holding_lock(task, lock, owner, exc=None):
+    """
+    Повтор обновления с тем же ID задачи, не отпуская лок: он продлевается на задержку повтора с запасом
+    LOCK_TTL. Иначе за время ожидания обновление запустил бы кто-то другой, а повтор завершился бы SKIPPED.
+    Возвращает исключение Retry — его нужно бросить; если повтор не удалось поставить, ошибка пробрасывается.
+    """
+    countdown = UPDATE_RETRY_DELAY * 2 ** task.request.retries
+    lock.renew(owner, ttl=countdown + LOCK_TTL)
+    return task.retry(exc=exc, countdown=countdown, throw=False)
+
+
+@shared_task(bind=True, max_retries=UPDATE_MAX_RETRIES)
+def update_catalog_task(self, streaming=False, force=False, shards=0, allow_mass_removal=False, dry_run=False,
+                        atomic_publish=False):
     """
     Основная задача Celery для запуска полного цикла обновления каталога в фоне.
+    streaming — потоковый режим: фиды скачиваются во временный файл и импортируются частями,
+    пиковая память воркера не растёт вместе с каталогом.
+    force — скачать и импортировать фиды, даже если поставщик сообщает, что они не изменились.
+    shards > 1 — запчасти записываются параллельно: по подзадаче на шард и завершающий шаг (chord).
+    Прогресс (этап, строки, скорость, ошибки, ETA) публикуется в meta состояния PROGRESS.
+    allow_mass_removal — снять с продажи пропавшие из фида запчасти, даже если их подозрительно много.
+    dry_run — пробный запуск: только отчёт об изменениях (catalog_dry_run.json), каталог не меняется.
+    atomic_publish — новый каталог публикуется одной транзакцией, прежний остаётся в снимке для отката.
+    Одновременно выполняется только одно обновление (CatalogUpdateLock): задача, запущенная через
+    start_update_catalog_task, уже владеет локом, иначе берёт его сама; если лок занят — завершается
+    со статусом SKIPPED и ID выполняющейся задачи. Пробный запуск каталог не меняет и лок не берёт.
+    Если лок потерян (не продлился), обновление останавливается на следующей пачке со статусом ABORTED.
+    Сбой сети или БД (UPDATE_RETRY_ERRORS) и оборванный на середине импорт запчастей повторяются
+    (до UPDATE_MAX_RETRIES раз, задержка удваивается): лок на время ожидания остаётся за задачей,
+    повтор продолжает импорт с контрольной точки, если фид не изменился. Лок снимается после успеха
+    или последней неудачи.
+    """
+    run = partial(run_catalog_update, mock_stdout, streaming=streaming, force=force,
+                  on_progress=lambda meta: self.update_state(state='PROGRESS', meta=meta),
+                  allow_mass_removal=allow_mass_removal, dry_run=dry_run, atomic_publish=atomic_publish,
+                  run_id=self.request.id)
+    if dry_run:
+        return {'status': 'SUCCESS', 'result': 'Пробный запуск завершён, каталог не изменён.', **run()}
+
+    lock = CatalogUpdateLock()
+    owner = self.request.id
+    if not (lock.renew(owner) or lock.acquire(owner)):    #Лок зарезервирован для этой задачи или свободен
+        running_task_id = lock.holder()
+        print(f"--- Обновление каталога уже выполняется (задача {running_task_id}), запуск пропущен ---")
+        return {'status': 'SKIPPED', 'result': 'Обновление каталога уже выполняется.',
+                'running_task_id': running_task_id}
+    print("--- НАЧАЛО: Обновление каталога ---")
+    retrying = False
+    try:
+        try:
+            with lock.heartbeat(owner) as lock_lost:
+                results = run(parts_shards=shards, cancel=lock_lost,
+                              dispatch_parts_shards=partial(_dispatch_parts_shards, lock=lock, owner=owner))
+        except UPDATE_RETRY_ERRORS as e:
+            if self.request.retries >= self.max_retries:
+                raise
+            print(f"--- СБОЙ: {e}, повтор обновления ---")
+            retry = _retry_holding_lock(self, lock, owner, e)
+            retrying = True
+            raise retry
+        parts = results.get('parts')
+        if isinstance(parts, dict) and not parts.get('feed_complete', True) and self.request.retries < self.max_retries:
+            print("--- ПРЕРВАНО: Импорт запчастей оборвался, повтор с контрольной точки ---")
+            retry = _retry_holding_lock(self, lock, owner)
+            retrying = True
+            raise retry
+    except ImportCancelled as e:
+        print(f"--- ОСТАНОВЛЕНО: лок обновления потерян ({e}) ---")
+        return {'status': 'ABORTED', 'result': 'Лок обновления потерян, обновление остановлено.'}
+    finally:
+        if not retrying:
+            lock.release(owner)    #После передачи лока завершающей задаче шардов ничего не делает
+    print("--- ЗАВЕРШЕНО: Обновление каталога ---")
+
+    return {'status': 'SUCCESS', 'result': 'Обновление каталога полностью завершено!', 'feeds': results}
+
+
+def start_update_catalog_task(**kwargs):
+    """
+    Single-flight запуск update_catalog_task: лок резервируется под ID новой задачи до отправки в очередь.
+    Если обновление уже выполняется, новая задача не ставится. Возвращает (ID задачи, запущена ли новая).
+    """
+    lock = CatalogUpdateLock()
+    for _ in range(2):    #Лок мог освободиться между неудачным захватом и чтением владельца
+        task_id = uuid()
+        if lock.acquire(task_id):
+            try:
+                update_catalog_task.apply_async(kwargs=kwargs, task_id=task_id)
+            except Exception:
+                lock.release(task_id)
+                raise
+            return task_id, True
+        running_task_id = lock.holder()
+        if running_task_id is not None:
+            return running_task_id, False
+    return None, False
+
+
+def _dispatch_parts_shards(shards, finalize_kwargs, lock=None, owner=None):
+    """
+    Запускает chord: import_parts_shard_task на каждый шард, затем finalize_parts_import_task.
+    Лок обновления передаётся завершающей задаче (её ID известен заранее): она снимет его после всех шардов.
+    """
+    finalize = finalize_parts_import_task.s(**finalize_kwargs).set(task_id=uuid())
+    if lock is not None:
+        lock.renew(owner, ttl=SHARDS_LOCK_TTL, new_owner=finalize.id)
+    feed_sha256 = finalize_kwargs['feed']['sha256']
+    result = chord(group(import_parts_shard_task.s(rows, feed_sha256) for rows in shards))(finalize)
+    print(f"--- Запись запчастей запущена: шардов {len(shards)}, итоговая задача {result.id} ---")
+    return {'shards': len(shards), 'finalize_task_id': result.id}
+
+
+@shared_task(bind=True)
+def import_parts_shard_task(self, rows, feed_sha256=None):
+    """
+    Записывает один шард запчастей со справочниками, уже разрешёнными координатором.
+    Строки карантина шарда помечаются ID задачи обновления каталога (корень chord) и SHA-256 фида.
+    """
+    from spare_parts.models import Part, PartImage
+    return import_part_shard(mock_stdout, Part, PartImage, rows, run_id=self.request.root_id,
+                             feed_sha256=feed_sha256)
+
+
+@shared_task(bind=True)
+def finalize_parts_import_task(self, shard_totals, plan_totals, removed_part_ids, feed_sourced_count, feed_complete,
+                               feed, allow_mass_removal=False):
+    """
+    Завершающий шаг chord: итог по всем шардам и снятие с продажи пропавших из фида запчастей.
+    Снимает лок обновления, переданный ей координатором.
     """
     try:
-        from spare_parts.category_mapping import TRANSMISSION_MAP, CATEGORY_SLUG_MAP, CATEGORY_MAPPING, \
-            GENERATION_MODELS
-        from spare_parts.models import (
-            CarMake, CarModel, CarGeneration, PartSubCategory, Part,
-            DonorVehicle, Category, PartImage, DonorVehicleImage
-        )
-    except Exception as e:
-        print(f"ОШИБКА ИМПОРТА ВНУТРИ ЗАДАЧИ: {e}")
-        raise
-    self.update_state(state='PROGRESS', meta={'stage': 'Запуск обновления...'})     #Вывод ошибки в Worker'е и покажет, что именно не так
-
-    print("--- НАЧАЛО: Скачивание и обработка файлов ---")
-    fetch_and_prepare_donors(mock_stdout, CATEGORY_MAPPING, GENERATION_MODELS)
-    fetch_and_prepare_parts(mock_stdout, CATEGORY_MAPPING, GENERATION_MODELS)
-    print("--- ЗАВЕРШЕНО: Файлы Excel подготовлены ---")
-    self.update_state(state='PROGRESS', meta={'stage': 'Подготовка файлов завершена. Начало импорта в БД.'})
-
-    print("--- НАЧАЛО: Импорт данных в базу ---")
-    import_donors_to_db(mock_stdout, CarMake, CarModel, CarGeneration, DonorVehicle, DonorVehicleImage,
-                        TRANSMISSION_MAP)
-    import_parts_to_db(mock_stdout, CarMake, CarModel, CarGeneration, DonorVehicle, Category, PartSubCategory,
-                       Part, PartImage, CATEGORY_SLUG_MAP)
-    print("--- ЗАВЕРШЕНО: Импорт данных в базу ---")
-
-    return {'status': 'SUCCESS', 'result': 'Обновление каталога полностью завершено!'}
\ No newline at end of file
+        return finalize_parts_shards(mock_stdout, shard_totals, plan_totals, removed_part_ids, feed_sourced_count,
+                                     feed_complete, feed, allow_mass_removal)
+    finally:
+        CatalogUpdateLock().release(self.request.id)
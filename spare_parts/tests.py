@@ -1,3 +1,1346 @@
-from django.test import TestCase
+import csv
+import hashlib
+import tempfile
+import threading
+from contextlib import redirect_stdout
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+from pathlib import Path
+from unittest import mock, skipUnless
+import numpy as np
+import pandas as pd
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from spare_parts.management.feed_io import FEED_SEPARATOR
+from spare_parts.management.import_to_db import import_parts_to_db, NEW_MODEL_COLUMN_NAME, \
+    NEW_GENERATION_COLUMN_NAME
+from spare_parts.management.synthetic_feeds import write_synthetic_donors, write_synthetic_parts, \
+    SYNTHETIC_ENCODING
+from spare_parts.management.update_pipeline import run_catalog_update
 
-# Create your tests here.
+
+def part_feed_row(part_id, **values):
+    """
+    Строка подготовленного фида запчастей (как после fetch_and_prepare_parts); values заменяют значения по умолчанию.
+    """
+    row = {'Артикул': part_id, 'Наименование': 'Фара левая', 'Донор': '', 'Марка': 'Kia',
+           NEW_MODEL_COLUMN_NAME: 'Rio', NEW_GENERATION_COLUMN_NAME: '3', 'Категория': 'Оптика',
+           'Комментарий': '', 'Номер производителя': '92101-4Y000', 'Цена': '1500', 'Состояние': 'used',
+           'Фото': f'https://cdn.example.com/{part_id}-1.jpg, https://cdn.example.com/{part_id}-2.jpg'}
+    row.update(values)
+    return row
+
+
+def part_feed(rows):
+    return pd.DataFrame(rows)
+
+
+def import_parts(df, stdout=None, **kwargs):
+    """
+    import_parts_to_db с моделями приложения; stdout по умолчанию — StringIO.
+    """
+    from spare_parts.category_mapping import CATEGORY_SLUG_MAP
+    from spare_parts.models import CarMake, CarModel, CarGeneration, DonorVehicle, Category, PartSubCategory, \
+        Part, PartImage
+
+    return import_parts_to_db(stdout or StringIO(), CarMake, CarModel, CarGeneration, DonorVehicle, Category,
+                              PartSubCategory, Part, PartImage, CATEGORY_SLUG_MAP, df=df, **kwargs)
+
+
+class PartsImportTests(TestCase):
+    """
+    Импорт запчастей пачками: upsert по артикулу, пропуск неизменившихся строк по отпечатку, синхронизация фото.
+    """
+    def test_first_import_creates_parts_with_links(self):
+        from spare_parts.models import Part
+
+        result = import_parts(part_feed([part_feed_row('P1'), part_feed_row('P2', Цена='2500')]))
+
+        self.assertEqual((result['created'], result['updated'], result['failed']), (2, 0, 0))
+        part = Part.objects.get(part_id='P2')
+        self.assertEqual(part.price, Decimal('2500'))
+        self.assertEqual(part.part_number_key, '921014Y000')
+        self.assertEqual(part.donor_generation.model.make.name, 'KIA')
+        self.assertEqual(list(part.car_generations.all()), [part.donor_generation])
+        self.assertEqual(list(part.images.order_by('-is_main', 'id').values_list('image_url', 'is_main')),
+                         [('https://cdn.example.com/P2-1.jpg', True), ('https://cdn.example.com/P2-2.jpg', False)])
+
+    def test_unchanged_rows_are_skipped(self):
+        from spare_parts.models import Part
+
+        feed = part_feed([part_feed_row('P1'), part_feed_row('P2')])
+        import_parts(feed)
+        Part.objects.filter(part_id='P1').update(title='Изменено в админке')    #Отпечаток строки тот же
+
+        result = import_parts(feed)
+
+        self.assertEqual((result['created'], result['updated'], result['unchanged']), (0, 0, 2))
+        self.assertEqual(Part.objects.get(part_id='P1').title, 'Изменено в админке')
+
+    def test_changed_row_is_updated_in_place(self):
+        from spare_parts.models import Part
+
+        import_parts(part_feed([part_feed_row('P1'), part_feed_row('P2')]))
+        pk = Part.objects.get(part_id='P1').pk
+
+        result = import_parts(part_feed([
+            part_feed_row('P1', Цена='990', Фото='https://cdn.example.com/P1-2.jpg, https://cdn.example.com/P1-3.jpg'),
+            part_feed_row('P2'),
+        ]))
+
+        self.assertEqual((result['created'], result['updated'], result['unchanged']), (0, 1, 1))
+        part = Part.objects.get(part_id='P1')
+        self.assertEqual((part.pk, part.price), (pk, Decimal('990')))
+        self.assertEqual(list(part.images.order_by('-is_main', 'id').values_list('image_url', 'is_main')),
+                         [('https://cdn.example.com/P1-2.jpg', True), ('https://cdn.example.com/P1-3.jpg', False)])
+        self.assertEqual(result['removed'], 0)
+
+    def test_repeated_part_id_last_row_wins(self):
+        from spare_parts.models import Part
+
+        result = import_parts(part_feed([part_feed_row('P1', Цена='100'), part_feed_row('P1', Цена='200')]))
+
+        self.assertEqual(result['created'], 1)
+        self.assertEqual(Part.objects.get(part_id='P1').price, Decimal('200'))
+
+    def test_import_spans_several_batches(self):
+        from spare_parts.models import Part
+
+        feed = part_feed([part_feed_row(f'P{num}', Цена=str(100 + num)) for num in range(25)])
+        with mock.patch('spare_parts.management.import_to_db.BATCH_SIZE', 10):
+            result = import_parts(feed)
+
+        self.assertEqual(result['created'], 25)
+        self.assertEqual(Part.objects.count(), 25)
+        self.assertEqual(Part.objects.get(part_id='P24').price, Decimal('124'))
+
+
+class ImageSyncTests(TestCase):
+    """
+    Синхронизация фото пачкой: число запросов не зависит от числа владельцев, фото из админки остаются.
+    """
+    def setUp(self):
+        from spare_parts.models import Part
+
+        import_parts(part_feed([part_feed_row(f'P{num}') for num in range(10)]))
+        self.parts = list(Part.objects.order_by('part_id'))
+
+    def sync(self, urls_by_owner):
+        from spare_parts.management.image_sync import sync_feed_images
+        from spare_parts.models import PartImage
+
+        return sync_feed_images(PartImage, 'part', urls_by_owner)
+
+    def images(self, part):
+        return list(part.images.order_by('id').values_list('image_url', 'is_main'))
+
+    def test_queries_do_not_grow_with_owners(self):
+        def urls(part):
+            return [f'https://cdn.example.com/{part.part_id}-2.jpg', f'https://cdn.example.com/{part.part_id}-3.jpg']
+
+        with CaptureQueriesContext(connection) as one:
+            self.sync({part.pk: urls(part)[::-1] for part in self.parts[:1]})
+        with CaptureQueriesContext(connection) as many:
+            added, deleted = self.sync({part.pk: urls(part)[::-1] for part in self.parts[1:]})
+
+        self.assertEqual(len(many), len(one))
+        self.assertLessEqual(len(many), 5)    #Чтение, удаление, вставка и не более двух UPDATE для is_main
+        self.assertEqual((added, deleted), (9, 9))
+        self.assertEqual(self.images(self.parts[1]), [('https://cdn.example.com/P1-2.jpg', False),
+                                                      ('https://cdn.example.com/P1-3.jpg', True)])
+
+    def test_manual_main_photo_is_kept(self):
+        from spare_parts.models import PartImage
+
+        part = self.parts[0]
+        part.images.update(is_main=False)
+        manual = PartImage.objects.create(part=part, image='part_images/manual.jpg', is_main=True)
+
+        added, deleted = self.sync({part.pk: ['https://cdn.example.com/P0-9.jpg', 'https://cdn.example.com/P0-1.jpg']})
+
+        self.assertEqual((added, deleted), (1, 1))
+        self.assertEqual(part.images.get(is_main=True), manual)
+        self.assertEqual(self.images(part), [('https://cdn.example.com/P0-1.jpg', False), (None, True),
+                                             ('https://cdn.example.com/P0-9.jpg', False)])
+
+    def test_repeated_url_is_removed(self):
+        from spare_parts.models import PartImage
+
+        part = self.parts[0]
+        PartImage.objects.create(part=part, image_url='https://cdn.example.com/P0-1.jpg')
+
+        added, deleted = self.sync({part.pk: ['https://cdn.example.com/P0-1.jpg']})
+
+        self.assertEqual((added, deleted), (0, 2))    #Повтор того же URL и пропавшее из фида P0-2
+        self.assertEqual(self.images(part), [('https://cdn.example.com/P0-1.jpg', True)])
+
+
+class FeedServer:
+    """
+    Поставщик фидов на http.server в отдельном потоке. Отдаёт feeds {имя: тело} с ETag (по содержимому)
+    и Last-Modified, на условный запрос с текущим ETag отвечает 304. Заголовки запросов копятся в requests.
+    """
+    LAST_MODIFIED = 'Mon, 12 Oct 2026 08:00:00 GMT'
+
+    def __init__(self):
+        self.feeds = {}
+        self.requests = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.respond(self)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def url(self, name):
+        return f'http://127.0.0.1:{self.httpd.server_port}/{name}'
+
+    def etag(self, name):
+        return f'"{hashlib.sha256(self.feeds[name]).hexdigest()[:16]}"'
+
+    def respond(self, handler):
+        name = handler.path.lstrip('/')
+        self.requests.append((name, dict(handler.headers)))
+        if name not in self.feeds:
+            handler.send_response(404)
+            handler.end_headers()
+            return
+        if handler.headers.get('If-None-Match') == self.etag(name):
+            handler.send_response(304)
+            handler.send_header('ETag', self.etag(name))
+            handler.end_headers()
+            return
+        body = self.feeds[name]
+        handler.send_response(200)
+        handler.send_header('Content-Type', 'text/csv; charset=windows-1251')
+        handler.send_header('Content-Length', str(len(body)))
+        handler.send_header('ETag', self.etag(name))
+        handler.send_header('Last-Modified', self.LAST_MODIFIED)
+        handler.end_headers()
+        handler.wfile.write(body)
+
+
+def feed_rows(body):
+    return list(csv.reader(StringIO(body.decode(SYNTHETIC_ENCODING), newline=''), delimiter=FEED_SEPARATOR))
+
+
+def feed_body(rows):
+    buffer = StringIO(newline='')
+    csv.writer(buffer, delimiter=FEED_SEPARATOR).writerows(rows)
+    return buffer.getvalue().encode(SYNTHETIC_ENCODING, errors='replace')
+
+
+class CatalogUpdateTestCase(TestCase):
+    """
+    Полный цикл run_catalog_update против FeedServer с синтетическими фидами поставщика.
+    Файлы передачи и контрольных точек — во временном каталоге.
+    """
+    PARTS_ROWS = 300
+    DONORS = 20
+
+    def setUp(self):
+        self.server = FeedServer().start()
+        self.addCleanup(self.server.stop)
+        workdir = Path(self.enterContext(tempfile.TemporaryDirectory()))
+        donors_path, parts_path = workdir / 'donors.csv', workdir / 'parts.csv'
+        donor_refs = write_synthetic_donors(donors_path, self.DONORS)
+        write_synthetic_parts(parts_path, self.PARTS_ROWS, donor_refs)
+        self.server.feeds = {'donors.csv': donors_path.read_bytes(), 'parts.csv': parts_path.read_bytes()}
+        for target, value in (
+                ('spare_parts.management.fetch_feeds.FEED_URLS', {'donors': self.server.url('donors.csv'),
+                                                                   'parts': self.server.url('parts.csv')}),
+                ('spare_parts.management.import_checkpoint.CHECKPOINT_DIR', workdir / 'checkpoints'),
+                ('spare_parts.management.fetch_prepare_donors.DONOR_FILE', workdir / 'donors.csv.gz'),
+                ('spare_parts.management.fetch_prepare_parts.PARTS_FILE', workdir / 'parts.csv.gz')):
+            self.enterContext(mock.patch(target, value))
+
+    def update_catalog(self, **kwargs):
+        stdout = StringIO()
+        return run_catalog_update(stdout, **kwargs), stdout.getvalue()
+
+    def truncate_parts_feed(self, rows):
+        """
+        Оставляет в фиде запчастей первые rows строк; у первой меняется цена, чтобы импорт было что записать.
+        """
+        header, *body = feed_rows(self.server.feeds['parts.csv'])
+        body = body[:rows]
+        body[0][header.index('Цена')] = '123456'
+        self.server.feeds['parts.csv'] = feed_body([header] + body)
+
+    def catalog_state(self):
+        from spare_parts.models import Part, PartImage, FeedState
+
+        return (list(Part.objects.order_by('id').values_list('part_id', 'price', 'is_active', 'feed_hash')),
+                PartImage.objects.count(),
+                list(FeedState.objects.order_by('feed').values_list('feed', 'body_sha256')))
+
+
+class TransformParityTests(SimpleTestCase):
+    """
+    Векторные преобразования фида дают то же, что построчные эталоны, на пограничных значениях колонок:
+    NaN, None, числа, пустые строки, лишние пробелы и регистр, неизвестные модели и наименования.
+    """
+    MODELS = [np.nan, None, 2015, 3.0, '', '   ', 'Rio 3', '  RIO   3 ', 'Sandero  Stepway 2', 'sandero 2',
+              'Logan', 'Creta 2', 'rio3', 'Rio', 'Sorento Prime 3']
+    NAMES = [np.nan, None, 123, 4.5, '', '   ', 'Бампер', ' БАМПЕР! ', 'Дверь.', 'Фильтр салона', 'Бампер (б/у)',
+             'Зеркало заднего вида', 'зеркало, заднего вида', 'Капот ']
+
+    @classmethod
+    def setUpClass(cls):
+        from spare_parts.category_mapping import CATEGORY_MAPPING, GENERATION_MODELS
+        from spare_parts.management.fetch_prepare_parts import _get_generation_mapping, _get_flat_category_mapping
+
+        super().setUpClass()
+        cls.GENERATION_MODELS_SET = _get_generation_mapping(GENERATION_MODELS)
+        cls.FLAT_MAPPING = _get_flat_category_mapping(CATEGORY_MAPPING)
+
+    @staticmethod
+    def comparable(values):
+        """
+        None и NaN — одно «пусто», как в benchmark_transforms.
+        """
+        return [None if not isinstance(value, str) and pd.isna(value) else value for value in values]
+
+    def assert_model_parity(self, models):
+        from spare_parts.management.transforms import extract_model_generation, extract_model_generation_vectorized
+
+        expected = [extract_model_generation(value, self.GENERATION_MODELS_SET) for value in models]
+        base_models, generations = extract_model_generation_vectorized(models, self.GENERATION_MODELS_SET)
+        self.assertEqual(self.comparable(base_models), self.comparable(model for model, _ in expected))
+        self.assertEqual(self.comparable(generations), self.comparable(generation for _, generation in expected))
+
+    def assert_category_parity(self, names):
+        from spare_parts.management.transforms import get_category_info, get_category_title_vectorized
+
+        expected = [get_category_info(value, self.FLAT_MAPPING)[1] for value in names]
+        self.assertEqual(list(get_category_title_vectorized(names, self.FLAT_MAPPING)), expected)
+
+    def test_model_generation_matches_reference(self):
+        self.assert_model_parity(pd.Series(self.MODELS, dtype=object))
+        self.assert_model_parity(pd.Series([2015, 3.5, np.nan]))    #Колонка без строк
+        self.assert_model_parity(pd.Series(['Logan', 'Creta 2']))    #Ни одной модели с поколением
+        self.assert_model_parity(pd.Series([], dtype=object))
+
+    def test_category_title_matches_reference(self):
+        self.assert_category_parity(pd.Series(self.NAMES, dtype=object))
+        self.assert_category_parity(pd.Series([np.nan, 1.0]))
+        self.assert_category_parity(pd.Series([], dtype=object))
+
+    def test_reference_splits_known_models(self):
+        from spare_parts.management.transforms import extract_model_generation
+
+        self.assertEqual(extract_model_generation('  RIO   3 ', self.GENERATION_MODELS_SET), ('RIO', '3'))
+        self.assertEqual(extract_model_generation('Creta 2', self.GENERATION_MODELS_SET), ('Creta 2', None))
+
+
+class AtomicPublishTests(CatalogUpdateTestCase):
+    """
+    atomic_publish: публикация либо принимается целиком, либо откатывается вместе со снимком для отката.
+    """
+    def snapshot_rows(self):
+        from spare_parts.models import Part
+
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT count(*) FROM {connection.ops.quote_name(Part._meta.db_table + "_prev")}')
+            return cursor.fetchone()[0]
+
+    def test_first_publish_keeps_previous_catalog_in_snapshot(self):
+        from spare_parts.models import Part
+
+        result, _ = self.update_catalog(atomic_publish=True)
+
+        self.assertEqual(result['parts']['created'], Part.objects.count())
+        self.assertEqual(self.snapshot_rows(), 0)    #Каталог до публикации был пуст
+
+    def test_truncated_feed_leaves_catalog_unchanged(self):
+        from spare_parts.models import Part
+
+        self.update_catalog(atomic_publish=True)
+        before = self.catalog_state()
+        self.truncate_parts_feed(50)    #Пропало 250 из 300 — снятие с продажи заблокировано
+
+        result, output = self.update_catalog(atomic_publish=True)
+
+        self.assertTrue(result['parts']['sweep_blocked'])
+        self.assertIn('публикация отменена', output)
+        self.assertEqual(self.catalog_state(), before)
+        self.assertFalse(Part.objects.filter(price=Decimal('123456')).exists())
+        self.assertEqual(self.snapshot_rows(), 0)    #Снимок прошлой публикации не заменён
+        self.assertNotIn(Part._meta.db_table + '_prev_pending', connection.introspection.table_names())
+
+    def test_cancelled_publish_keeps_quarantine(self):
+        from spare_parts.models import ImportQuarantine
+
+        self.update_catalog(atomic_publish=True)
+        self.truncate_parts_feed(50)
+        header, *body = feed_rows(self.server.feeds['parts.csv'])
+        body[1][header.index('Наименование')] = 'Ф' * 300
+        self.server.feeds['parts.csv'] = feed_body([header] + body)
+
+        result, output = self.update_catalog(atomic_publish=True)
+
+        self.assertIn('публикация отменена', output)
+        self.assertEqual(result['parts']['rejected'], 1)
+        self.assertEqual(list(ImportQuarantine.objects.values_list('feed', 'error_class')),
+                         [('parts', 'RowRejected')])
+
+
+class RollbackTests(CatalogUpdateTestCase):
+    """
+    rollback_catalog: возврат к снимку по id без потери фото и связей, добавленных позже, один раз
+    и только пока каталог не менял обычный импорт.
+    """
+    PARTS_ROWS = 30
+
+    def rollback(self):
+        from spare_parts.management.catalog_publish import rollback_catalog
+        from spare_parts.models import Part, PartImage, DonorVehicle, DonorVehicleImage, FeedState
+
+        stdout = StringIO()
+        return rollback_catalog(stdout, Part, PartImage, DonorVehicle, DonorVehicleImage, FeedState), stdout.getvalue()
+
+    def publish_two_catalogs(self):
+        """
+        Первая публикация — фид без последних пяти строк, вторая — полный фид с новой ценой первой строки.
+        """
+        header, *body = feed_rows(self.server.feeds['parts.csv'])
+        self.server.feeds['parts.csv'] = feed_body([header] + body[:-5])
+        self.update_catalog(atomic_publish=True)
+        body[0][header.index('Цена')] = '123456'
+        self.server.feeds['parts.csv'] = feed_body([header] + body)
+        self.update_catalog(atomic_publish=True)
+        return body
+
+    def test_rollback_restores_snapshot_and_keeps_later_rows(self):
+        from spare_parts.models import Part, PartImage
+
+        body = self.publish_two_catalogs()
+        first, added = Part.objects.get(part_id=body[0][0]), Part.objects.get(part_id=body[-1][0])
+        first_price = first.price
+        uploaded = PartImage.objects.create(part=first, image='part_images/manual.jpg')    #Фото из админки
+        added_images = added.images.count()
+        self.assertTrue(added_images)
+
+        restored, _ = self.rollback()
+
+        self.assertEqual(restored[Part._meta.db_table], self.PARTS_ROWS - 5)
+        first.refresh_from_db()
+        self.assertNotEqual(first.price, first_price)
+        self.assertTrue(PartImage.objects.filter(pk=uploaded.pk).exists())
+        added.refresh_from_db()
+        self.assertFalse(added.is_active)
+        self.assertEqual(added.images.count(), added_images)    #Запчасть снята с продажи, фото при ней
+
+        restored, output = self.rollback()    #Снимок уже использован
+        self.assertIsNone(restored)
+        self.assertIn('Снимок каталога не найден', output)
+
+    def test_rollback_refused_after_plain_import(self):
+        self.publish_two_catalogs()
+        self.truncate_parts_feed(self.PARTS_ROWS)    #Новая цена первой строки
+        self.update_catalog()
+        before = self.catalog_state()
+
+        restored, output = self.rollback()
+
+        self.assertIsNone(restored)
+        self.assertIn('снимок устарел', output)
+        self.assertEqual(self.catalog_state(), before)
+
+
+class UpdateLockTests(CatalogUpdateTestCase):
+    """
+    Лок обновления: потерянный лок останавливает обновление, ошибки Redis не убивают продление,
+    повтор задачи не отпускает лок.
+    """
+    PARTS_ROWS = 20
+
+    def setUp(self):
+        from django.core.cache import cache
+
+        super().setUp()
+        cache.clear()    #Лок в кэше (locmem) переживает тест
+        self.addCleanup(cache.clear)
+
+    def test_heartbeat_reports_lost_lock(self):
+        from django.core.cache import cache
+        from spare_parts.management.update_lock import CatalogUpdateLock, LOCK_KEY
+
+        lock = CatalogUpdateLock()
+        self.assertTrue(lock.acquire('first'))
+        with redirect_stdout(StringIO()), lock.heartbeat('first', interval=0.01) as lost:
+            cache.set(LOCK_KEY, 'second')    #Лок истёк, и его взяло другое обновление
+            self.assertTrue(lost.wait(2))
+
+    def test_heartbeat_survives_lock_errors_until_ttl(self):
+        from spare_parts.management.update_lock import CatalogUpdateLock
+
+        lock = CatalogUpdateLock()
+        with redirect_stdout(StringIO()) as output, \
+                mock.patch.object(lock, 'renew', side_effect=ConnectionError('Redis недоступен')) as renew, \
+                lock.heartbeat('first', interval=0.01, ttl=0.3) as lost:
+            self.assertFalse(lost.wait(0.1))
+            self.assertGreater(renew.call_count, 1)    #Поток жив после ошибки
+            self.assertTrue(lost.wait(2))
+        self.assertIn('Redis недоступен', output.getvalue())
+
+    def test_handed_over_lock_is_not_lost(self):
+        from spare_parts.management.update_lock import CatalogUpdateLock
+
+        lock = CatalogUpdateLock()
+        self.assertTrue(lock.acquire('first'))
+        with lock.heartbeat('first', interval=0.01) as lost:
+            lock.renew('first', new_owner='finalize')    #Лок передан завершающей задаче шардов
+            self.assertFalse(lost.wait(0.1))
+
+    def test_lost_lock_stops_atomic_publish(self):
+        import threading
+        from spare_parts.management.progress import ImportCancelled
+        from spare_parts.models import Part, DonorVehicle, FeedState
+
+        lost = threading.Event()
+
+        def on_progress(meta):
+            if meta['stage'] == 'Импорт запчастей.':
+                lost.set()
+
+        with self.assertRaises(ImportCancelled):
+            self.update_catalog(atomic_publish=True, cancel=lost, on_progress=on_progress)
+        self.assertFalse(Part.objects.exists())
+        self.assertFalse(DonorVehicle.objects.exists())    #Доноры откатились вместе с публикацией
+        self.assertFalse(FeedState.objects.exists())
+
+    def test_task_keeps_lock_for_retry(self):
+        from django.db import OperationalError
+        from spare_parts.management.update_lock import CatalogUpdateLock
+        from spare_parts.tasks import update_catalog_task
+
+        calls, taken_during_countdown = [], []
+        retry = update_catalog_task.retry
+
+        def run(*args, **kwargs):
+            calls.append(kwargs)
+            if len(calls) == 1:
+                raise OperationalError('соединение с БД потеряно')
+            return {'donors': 'unchanged', 'parts': 'unchanged'}
+
+        def retry_later(*args, **kwargs):
+            taken_during_countdown.append(CatalogUpdateLock().acquire('other'))    #Другое обновление в ожидании
+            return retry(*args, **kwargs)
+
+        with redirect_stdout(StringIO()), mock.patch('spare_parts.tasks.run_catalog_update', run), \
+                mock.patch.object(update_catalog_task, 'retry', retry_later):
+            result = update_catalog_task.apply(task_id='update-1')
+
+        self.assertEqual(result.get()['status'], 'SUCCESS')
+        self.assertEqual((len(calls), taken_during_countdown), (2, [False]))
+        self.assertIsNone(CatalogUpdateLock().holder())    #Снят после успешного повтора
+
+
+def import_donors(df, stdout=None, **kwargs):
+    """
+    import_donors_to_db с моделями приложения; stdout по умолчанию — StringIO.
+    """
+    from spare_parts.category_mapping import TRANSMISSION_MAP
+    from spare_parts.management.import_to_db import import_donors_to_db
+    from spare_parts.models import CarMake, CarModel, CarGeneration, DonorVehicle, DonorVehicleImage
+
+    return import_donors_to_db(stdout or StringIO(), CarMake, CarModel, CarGeneration, DonorVehicle,
+                               DonorVehicleImage, TRANSMISSION_MAP, df=df, **kwargs)
+
+
+def donor_feed_row(donor_id, **values):
+    row = {'Номер': donor_id, 'Марка': 'Kia', NEW_MODEL_COLUMN_NAME: 'Rio', NEW_GENERATION_COLUMN_NAME: '3',
+           'Год': '2015', 'Описание': '', 'Двигатель': 'G4FA', 'Цвет': 'Белый',
+           'Тип КПП (/automatic/manual/variator)': 'AUTOMATIC', 'Фото': f'https://cdn.example.com/{donor_id}.jpg'}
+    row.update(values)
+    return row
+
+
+class QuarantineTests(TestCase):
+    """
+    Карантин: строки, отклонённые проверкой, отдельно от ошибок записи и без повторов для того же фида.
+    """
+    def feed_with_reject(self):
+        return part_feed([part_feed_row('P1'), part_feed_row('P2', Наименование='Ф' * 300), part_feed_row('P3')])
+
+    def test_rejected_rows_do_not_count_as_failed(self):
+        from spare_parts.management.update_pipeline import _import_succeeded
+        from spare_parts.models import ImportQuarantine
+
+        result = import_parts(self.feed_with_reject())
+
+        self.assertEqual((result['created'], result['rejected'], result['failed']), (2, 1, 0))
+        self.assertTrue(_import_succeeded(result))
+        self.assertEqual(list(ImportQuarantine.objects.values_list('record_key', 'error_class')),
+                         [('P2', 'RowRejected')])
+
+    def test_rejected_rows_do_not_stop_checkpoint(self):
+        committed = []
+
+        import_parts(self.feed_with_reject(), on_rows_committed=committed.append)
+
+        self.assertEqual(committed, [4])    #Последняя строка части фида (заголовок — строка 1)
+
+    def test_same_feed_is_not_quarantined_twice(self):
+        from spare_parts.models import ImportQuarantine
+
+        import_parts(self.feed_with_reject(), feed_sha256='a' * 64)
+        import_parts(self.feed_with_reject(), feed_sha256='a' * 64, full_refresh=True)
+        self.assertEqual(ImportQuarantine.objects.count(), 1)
+
+        import_parts(self.feed_with_reject(), feed_sha256='b' * 64)    #Другой фид — своя запись
+        self.assertEqual(ImportQuarantine.objects.count(), 2)
+
+    def test_donor_write_error_rejects_only_that_donor(self):
+        from spare_parts.models import DonorVehicle, ImportQuarantine
+
+        result = import_donors(part_feed([donor_feed_row('1 Rio'), donor_feed_row('2 Rio', Год='не год'),
+                                          donor_feed_row('3 Rio')]))
+
+        self.assertEqual((result['created'], result['failed']), (2, 1))
+        self.assertEqual(sorted(DonorVehicle.objects.values_list('donor_vin', flat=True)), ['1 RIO', '3 RIO'])
+        self.assertEqual(DonorVehicle.objects.get(donor_vin='3 RIO').images.get().image_url,
+                         'https://cdn.example.com/3 Rio.jpg')
+        self.assertEqual(list(ImportQuarantine.objects.values_list('feed', 'record_key')), [('donors', '2 RIO')])
+
+
+class RejectedRowsUpdateTests(CatalogUpdateTestCase):
+    """
+    Фид с отклонёнными строками принимается: состояние фида сохраняется, следующий запуск его пропускает.
+    """
+    PARTS_ROWS = 20
+
+    def test_feed_with_rejected_row_is_accepted(self):
+        from spare_parts.models import FeedState, ImportQuarantine
+
+        header, *body = feed_rows(self.server.feeds['parts.csv'])
+        body[0][header.index('Наименование')] = 'Ф' * 300
+        self.server.feeds['parts.csv'] = feed_body([header] + body)
+
+        result, _ = self.update_catalog()
+        self.assertEqual((result['parts']['rejected'], result['parts']['failed']), (1, 0))
+        self.assertTrue(FeedState.objects.filter(feed='parts').exists())
+
+        result, _ = self.update_catalog()
+        self.assertEqual(result['parts'], 'unchanged')
+        self.assertEqual(ImportQuarantine.objects.filter(feed='parts').count(), 1)
+
+
+class CheckpointResumeTests(CatalogUpdateTestCase):
+    """
+    Контрольные точки импорта запчастей: прерванный импорт того же фида продолжается после последней записанной
+    части, отклонённая строка точку не держит, после успешного импорта точка и её файл удаляются.
+    """
+    PARTS_ROWS = 50
+    CHUNK_ROWS = 10
+
+    def setUp(self):
+        super().setUp()
+        self.enterContext(mock.patch('spare_parts.management.import_checkpoint.CHECKPOINT_CHUNK_SIZE',
+                                     self.CHUNK_ROWS))
+
+    def interrupted_update(self, after_chunks):
+        """
+        Обновление, которое обрывается на записи части фида номер after_chunks + 1.
+        """
+        from spare_parts.management import import_to_db
+
+        write_part_rows = import_to_db._write_part_rows
+        calls = []
+
+        def interrupted(*args):
+            calls.append(args)
+            if len(calls) > after_chunks:
+                raise ConnectionError('соединение с БД потеряно')
+            return write_part_rows(*args)
+
+        with mock.patch('spare_parts.management.import_to_db._write_part_rows', interrupted):
+            return self.update_catalog()
+
+    def test_interrupted_import_resumes_after_last_committed_chunk(self):
+        from spare_parts.management.feed_io import read_prepared_feed
+        from spare_parts.models import Part, FeedState, ImportCheckpoint
+
+        header, *body = feed_rows(self.server.feeds['parts.csv'])
+        body[0][header.index('Наименование')] = 'Ф' * 300    #Отклонённая строка в первой части
+        self.server.feeds['parts.csv'] = feed_body([header] + body)
+
+        result, output = self.interrupted_update(after_chunks=2)
+
+        self.assertIn('импорт прерван', output)
+        checkpoint = ImportCheckpoint.objects.get(feed='parts')
+        self.assertEqual(checkpoint.rows_committed, 2 * self.CHUNK_ROWS + 1)    #Строка 1 — заголовок
+        self.assertIsNone(checkpoint.prepared_rows)    #Фид не дочитан — продолжать по файлу нельзя
+        prepared = read_prepared_feed(checkpoint.prepared_file)
+        self.assertEqual(len(prepared), 3 * self.CHUNK_ROWS)    #Файл дописывается по мере импорта, не весь фид заранее
+        self.assertEqual(Part.objects.count(), 2 * self.CHUNK_ROWS - 1)
+        self.assertFalse(FeedState.objects.filter(feed='parts').exists())
+
+        result, output = self.update_catalog()
+
+        self.assertEqual(result['parts']['created'], self.PARTS_ROWS - 2 * self.CHUNK_ROWS)
+        self.assertEqual(Part.objects.count(), self.PARTS_ROWS - 1)
+        self.assertFalse(ImportCheckpoint.objects.exists())
+        self.assertFalse(Path(checkpoint.prepared_file).exists())
+        self.assertTrue(FeedState.objects.filter(feed='parts').exists())
+
+    def test_import_resumes_from_prepared_file_of_same_feed(self):
+        from spare_parts.models import Part, ImportCheckpoint
+
+        with mock.patch('spare_parts.management.import_to_db._sweep_removed_parts',
+                        side_effect=ConnectionError('соединение с БД потеряно')):
+            with self.assertRaises(ConnectionError):
+                self.update_catalog()    #Фид записан и дочитан, обрыв — на снятии с продажи
+        checkpoint = ImportCheckpoint.objects.get(feed='parts')
+        self.assertEqual(checkpoint.prepared_rows, self.PARTS_ROWS)
+
+        result, output = self.update_catalog()
+
+        self.assertIn(f'продолжается после строки {self.PARTS_ROWS + 1}', output)
+        self.assertEqual((result['parts']['created'], result['parts']['unchanged']), (0, self.PARTS_ROWS))
+        self.assertEqual(Part.objects.count(), self.PARTS_ROWS)
+        self.assertFalse(ImportCheckpoint.objects.exists())
+
+    def test_changed_feed_starts_over(self):
+        from spare_parts.models import ImportCheckpoint
+
+        self.interrupted_update(after_chunks=2)
+        self.truncate_parts_feed(self.PARTS_ROWS - 1)    #Другое содержимое — другой SHA-256
+
+        result, output = self.interrupted_update(after_chunks=0)
+
+        self.assertEqual(ImportCheckpoint.objects.get(feed='parts').rows_committed, 0)
+
+
+class SlugAllocationTests(TestCase):
+    """
+    Подбор уникальных slug в памяти: суффиксы внутри пачки, один запрос на префикс, собственный slug объекта,
+    повтор после конфликта с параллельной вставкой и постоянное число запросов на пачку подкатегорий.
+    """
+    def setUp(self):
+        from spare_parts.models import Category
+
+        self.category = Category.objects.create(name='Кузов')
+
+    def subcategory(self, title, slug):
+        from spare_parts.models import PartSubCategory
+
+        return PartSubCategory.objects.create(title=title, slug=slug, category=self.category)
+
+    def recording_save(self, instance, slugs):
+        """
+        save для save_with_unique_slug, который запоминает slug каждой попытки вставки.
+        """
+        from spare_parts.models import PartSubCategory
+
+        def save():
+            slugs.append(instance.slug)
+            return super(PartSubCategory, instance).save()
+        return save
+
+    def test_batch_gets_suffixes_past_taken_slugs(self):
+        from spare_parts.models import PartSubCategory
+        from spare_parts.slugs import SlugAllocator
+
+        self.subcategory('Bamper', 'bamper')
+
+        slugs = SlugAllocator(PartSubCategory).allocate_many(['bamper', 'bamper', 'fara', 'bamper'])
+
+        self.assertEqual(slugs, ['bamper-1', 'bamper-2', 'fara', 'bamper-3'])
+
+    def test_taken_slugs_loaded_once_per_prefix(self):
+        from spare_parts.models import PartSubCategory
+        from spare_parts.slugs import SlugAllocator
+
+        for slug in ('fara', 'fara-1', 'fara-levaya', 'kapot'):
+            self.subcategory(slug.title(), slug)
+        allocator = SlugAllocator(PartSubCategory)
+
+        with self.assertNumQueries(1):    #slug LIKE 'fara%'
+            self.assertEqual(allocator.allocate('fara'), 'fara-2')
+        with self.assertNumQueries(0):    #Префикс 'fara' уже загружен
+            self.assertEqual(allocator.allocate('fara-levaya'), 'fara-levaya-1')
+            self.assertEqual(allocator.allocate('fara'), 'fara-3')
+
+    def test_existing_object_keeps_its_slug(self):
+        from spare_parts.models import PartSubCategory
+        from spare_parts.slugs import SlugAllocator, save_with_unique_slug
+
+        bamper = self.subcategory('Bamper', 'bamper')
+
+        self.assertEqual(SlugAllocator(PartSubCategory).allocate('bamper', pk=bamper.pk), 'bamper')
+        bamper.title = 'Bamper perednij'
+        save_with_unique_slug(bamper, 'bamper', bamper.save)
+        bamper.refresh_from_db()
+        self.assertEqual((bamper.slug, bamper.title), ('bamper', 'Bamper perednij'))
+
+    def test_slug_taken_by_parallel_insert_is_allocated_again(self):
+        from django.db import IntegrityError
+        from spare_parts.models import PartSubCategory
+        from spare_parts.slugs import SlugAllocator, save_with_unique_slug
+
+        self.subcategory('Bamper', 'bamper')    #Вставлен параллельным импортом после того, как slug подобран
+        load_prefix = SlugAllocator._load_prefix
+        loads = []
+
+        def stale_load_prefix(allocator, base_slug):
+            loads.append(base_slug)
+            if len(loads) > 1:
+                load_prefix(allocator, base_slug)
+
+        subcategory = PartSubCategory(title='Bamper zadnij', category=self.category)
+        saved_slugs = []
+        with mock.patch.object(SlugAllocator, '_load_prefix', stale_load_prefix):
+            save_with_unique_slug(subcategory, 'bamper', self.recording_save(subcategory, saved_slugs))
+        self.assertEqual(saved_slugs, ['bamper', 'bamper-1'])
+        self.assertTrue(PartSubCategory.objects.filter(title='Bamper zadnij', slug='bamper-1').exists())
+
+        duplicate = PartSubCategory(title='Bamper zadnij', category=self.category)    #Конфликт не по slug
+        saved_slugs = []
+        with self.assertRaises(IntegrityError):
+            save_with_unique_slug(duplicate, 'bamper-zadnij', self.recording_save(duplicate, saved_slugs))
+        self.assertEqual(saved_slugs, ['bamper-zadnij'])    #Без повторов
+
+    def test_subcategories_resolved_with_constant_queries(self):
+        from spare_parts.management.dimension_resolver import DimensionResolver
+        from spare_parts.models import CarMake, CarModel, CarGeneration, Category, PartSubCategory
+
+        resolver = DimensionResolver(CarMake, CarModel, CarGeneration, Category, PartSubCategory)
+        titles = [title for num in range(150) for title in (f'Fara {num}', f'Fara-{num}')]    #Пары с одним slug
+
+        with self.assertNumQueries(3):    #Занятые slug, bulk_create, id созданных
+            resolver.resolve_subcategories({title: 'Кузов' for title in titles})
+
+        slugs = set(PartSubCategory.objects.values_list('slug', flat=True))
+        self.assertEqual(len(slugs), len(titles))
+        self.assertIn('fara-7-1', slugs)
+        self.assertEqual(resolver.subcategory_id('Fara-7'), PartSubCategory.objects.get(title='Fara-7').pk)
+
+
+class RemovedPartsTests(TestCase):
+    """
+    Пропавшие из фида запчасти снимаются с продажи и возвращаются, когда снова появляются в фиде.
+    Снятые с продажи вручную импорт не возвращает.
+    """
+    def test_part_removed_from_feed_returns_when_back(self):
+        from spare_parts.models import Part
+
+        full_feed = part_feed([part_feed_row('P1'), part_feed_row('P2')])
+        import_parts(full_feed)
+
+        result = import_parts(part_feed([part_feed_row('P1')]))
+        self.assertEqual(result['removed'], 1)
+        part = Part.objects.get(part_id='P2')
+        self.assertEqual((part.is_active, part.deactivated_by_sweep, part.feed_hash), (False, True, None))
+
+        import_parts(full_feed)
+        part.refresh_from_db()
+        self.assertEqual((part.is_active, part.deactivated_by_sweep), (True, False))
+        self.assertIsNotNone(part.feed_hash)
+
+    def test_manually_deactivated_part_stays_inactive(self):
+        from spare_parts.models import Part
+
+        import_parts(part_feed([part_feed_row('P1'), part_feed_row('P2')]))
+        Part.objects.filter(part_id='P2').update(is_active=False, feed_hash=None)    #Как после миграции отпечатков
+
+        result = import_parts(part_feed([part_feed_row('P1'), part_feed_row('P2', Цена='700')]))
+
+        self.assertEqual(result['updated'], 1)
+        part = Part.objects.get(part_id='P2')
+        self.assertEqual((part.is_active, part.price), (False, Decimal('700')))
+
+    def test_manually_deactivated_part_is_not_marked_by_sweep(self):
+        from spare_parts.models import Part
+
+        import_parts(part_feed([part_feed_row('P1'), part_feed_row('P2')]))
+        part = Part.objects.get(part_id='P2')
+        part.is_active = False
+        part.save()
+
+        import_parts(part_feed([part_feed_row('P1')]))    #Пропала из фида, уже снятая вручную
+        import_parts(part_feed([part_feed_row('P1'), part_feed_row('P2')]))
+
+        part.refresh_from_db()
+        self.assertEqual((part.is_active, part.deactivated_by_sweep), (False, False))
+
+
+class DonorLinkTests(TestCase):
+    """
+    Запчасть, импортированная раньше своего донора, привязывается к нему, когда донор появляется в БД.
+    """
+    def test_part_is_linked_once_donor_appears(self):
+        from spare_parts.models import Part
+
+        feed = part_feed([part_feed_row('P1', Донор='7 Rio'), part_feed_row('P2', Донор='8 Rio')])
+        import_parts(feed)
+        self.assertIsNone(Part.objects.get(part_id='P1').donor_vehicle)
+
+        import_donors(part_feed([donor_feed_row('7 Rio')]))
+        result = import_parts(feed)
+
+        self.assertEqual((result['updated'], result['unchanged']), (1, 1))    #Донора '8 Rio' всё ещё нет
+        self.assertEqual(Part.objects.get(part_id='P1').donor_vehicle.donor_vin, '7 RIO')
+        self.assertIsNone(Part.objects.get(part_id='P2').donor_vehicle)
+
+        result = import_parts(feed)
+        self.assertEqual((result['updated'], result['unchanged']), (0, 2))
+
+
+class DonorUpdateTests(TestCase):
+    """
+    Донор с изменившейся строкой фида перезаписывается целиком, а не только отпечатком.
+    """
+    def test_changed_donor_row_updates_fields(self):
+        from spare_parts.models import DonorVehicle
+
+        import_donors(part_feed([donor_feed_row('7 Rio')]))
+        changed = part_feed([donor_feed_row('7 Rio', Год='2017', Цвет='Серый', Описание='После ДТП',
+                                            **{'Тип КПП (/automatic/manual/variator)': 'МКПП'})])
+
+        result = import_donors(changed)
+
+        self.assertEqual((result['created'], result['updated']), (0, 1))
+        donor = DonorVehicle.objects.get(donor_vin='7 RIO')
+        self.assertEqual((donor.production_year, donor.color, donor.description, donor.transmission_type),
+                         (2017, 'Серый', 'После ДТП', 'MT'))
+        result = import_donors(changed)
+        self.assertEqual((result['updated'], result['unchanged']), (0, 1))
+
+
+class ConditionalDownloadTests(CatalogUpdateTestCase):
+    """
+    Условная загрузка фидов: валидаторы успешного импорта уходят в If-None-Match / If-Modified-Since,
+    304 пропускает фид, состояние фида сохраняется только после успешного импорта.
+    """
+    PARTS_ROWS = 150
+
+    def last_request_headers(self, name):
+        return [headers for requested, headers in self.server.requests if requested == name][-1]
+
+    def test_first_download_saves_feed_state(self):
+        from spare_parts.models import FeedState
+
+        result, _ = self.update_catalog()
+
+        self.assertNotIn('If-None-Match', self.last_request_headers('parts.csv'))
+        self.assertEqual(result['parts']['created'], self.PARTS_ROWS)
+        state = FeedState.objects.get(feed='parts')
+        self.assertEqual((state.etag, state.last_modified, state.body_sha256),
+                         (self.server.etag('parts.csv'), FeedServer.LAST_MODIFIED,
+                          hashlib.sha256(self.server.feeds['parts.csv']).hexdigest()))
+
+    def test_not_modified_feed_is_skipped(self):
+        self.update_catalog()
+
+        result, output = self.update_catalog()
+
+        headers = self.last_request_headers('parts.csv')
+        self.assertEqual(headers['If-None-Match'], self.server.etag('parts.csv'))
+        self.assertEqual(headers['If-Modified-Since'], FeedServer.LAST_MODIFIED)
+        self.assertEqual(result, {'donors': 'unchanged', 'parts': 'unchanged'})
+        self.assertIn("Фид 'parts' не изменился", output)
+
+    def test_changed_feed_is_downloaded_and_imported(self):
+        from spare_parts.models import FeedState
+
+        self.update_catalog()
+        header, *body = feed_rows(self.server.feeds['parts.csv'])
+        body[0][header.index('Цена')] = '4321'
+        self.server.feeds['parts.csv'] = feed_body([header] + body)
+
+        result, _ = self.update_catalog()
+
+        self.assertEqual((result['donors'], result['parts']['updated']), ('unchanged', 1))
+        self.assertEqual(FeedState.objects.get(feed='parts').etag, self.server.etag('parts.csv'))
+
+    def test_feed_state_is_not_saved_after_failed_import(self):
+        from spare_parts.models import FeedState
+
+        self.update_catalog()
+        accepted_etag = FeedState.objects.get(feed='parts').etag
+        self.truncate_parts_feed(20)    #Пропало больше, чем разрешено снять за раз
+
+        result, output = self.update_catalog()
+        self.assertTrue(result['parts']['sweep_blocked'])
+        self.assertIn("Фид 'parts' принят не полностью", output)
+        self.assertEqual(FeedState.objects.get(feed='parts').etag, accepted_etag)
+
+        result, _ = self.update_catalog()    #Тот же фид обрабатывается снова, а не пропускается
+        self.assertEqual(self.last_request_headers('parts.csv')['If-None-Match'], accepted_etag)
+        self.assertIsInstance(result['parts'], dict)
+
+
+class SweepGuardTests(TestCase):
+    """
+    Защита снятия с продажи от обрезанного фида: больше SWEEP_MAX_REMOVED_SHARE каталога (и больше
+    SWEEP_ALWAYS_ALLOWED запчастей) за один запуск не снимается без allow_mass_removal.
+    """
+    def import_first(self, count, **kwargs):
+        """
+        Импорт фида из первых count запчастей P0, P1, ...
+        """
+        return import_parts(part_feed([part_feed_row(f'P{num}', Фото='') for num in range(count)]), **kwargs)
+
+    def test_mass_removal_is_blocked(self):
+        from spare_parts.models import Part
+
+        self.import_first(400)
+
+        result = self.import_first(250)    #Пропало 150 из 400: больше 30% и больше 100
+
+        self.assertEqual((result['removed'], result['sweep_blocked']), (0, True))
+        self.assertEqual(Part.objects.filter(is_active=True).count(), 400)
+        self.assertEqual(Part.objects.filter(feed_hash__isnull=True).count(), 0)    #Следующий запуск повторит проверку
+
+    def test_removal_up_to_share_is_allowed(self):
+        from spare_parts.models import Part
+
+        self.import_first(400)
+
+        result = self.import_first(280)    #Ровно 30%
+
+        self.assertEqual((result['removed'], result['sweep_blocked']), (120, False))
+        self.assertEqual(Part.objects.filter(is_active=False).count(), 120)
+
+    def test_small_catalog_removal_is_allowed(self):
+        self.import_first(150)
+
+        result = self.import_first(50)    #Пропало 2/3 каталога, но не больше 100 запчастей
+
+        self.assertEqual((result['removed'], result['sweep_blocked']), (100, False))
+
+    def test_mass_removal_allowed_explicitly(self):
+        from spare_parts.models import Part
+
+        self.import_first(400)
+
+        result = self.import_first(250, allow_mass_removal=True)
+
+        self.assertEqual((result['removed'], result['sweep_blocked']), (150, False))
+        self.assertEqual(Part.objects.filter(is_active=False, deactivated_by_sweep=True).count(), 150)
+
+
+class KeysetPaginationTests(TestCase):
+    """
+    Пагинация по ключу: переход по курсорам проходит выборку без пропусков и повторов, подделанный курсор отклоняется.
+    """
+    def setUp(self):
+        titles = ['Фара', 'Бампер', 'Фара', 'Зеркало', 'Бампер', 'Фара', 'Капот']    #Повторы: порядок решает pk
+        import_parts(part_feed([part_feed_row(f'P{num}', Наименование=titles[num % len(titles)], Фото='')
+                                for num in range(23)]))
+
+    def paginator(self):
+        from spare_parts.models import Part
+        from spare_parts.pagination import KeysetPaginator
+
+        return KeysetPaginator(Part.objects.order_by('title'), 5)
+
+    def test_cursor_walk_matches_ordering(self):
+        from spare_parts.models import Part
+
+        paginator = self.paginator()
+        page = paginator.page(1)
+        walked = list(page)
+        while page.has_next():
+            page = paginator.page_after(page.next_cursor)
+            walked.extend(page)
+
+        self.assertEqual(page.number, 5)
+        self.assertEqual([part.pk for part in walked], list(Part.objects.order_by('title', 'pk').values_list(
+            'pk', flat=True)))
+
+    def test_previous_cursor_returns_previous_page(self):
+        paginator = self.paginator()
+        second = paginator.page_after(paginator.page(1).next_cursor)
+        third = paginator.page_after(second.next_cursor)
+
+        back = paginator.page_after(third.previous_cursor)
+
+        self.assertEqual((back.number, list(back)), (2, list(second)))
+        self.assertEqual(list(paginator.page(2)), list(second))    #Номер страницы (OFFSET) даёт те же строки
+
+    def test_tampered_cursor_is_rejected(self):
+        from django.core import signing
+        from django.core.paginator import PageNotAnInteger
+        from spare_parts.models import Part
+        from spare_parts.pagination import KeysetPaginator, CURSOR_SALT
+
+        paginator = self.paginator()
+        cursor = paginator.page(1).next_cursor
+        data = signing.loads(cursor, salt=CURSOR_SALT)
+        data['v'][0] = 'А'    #Подменённое значение сортировки без подписи
+        forged = signing.dumps(data, salt='другая соль', compress=True)
+
+        for bad in (cursor[:-2] + 'xx', forged, 'не курсор'):
+            with self.assertRaises(PageNotAnInteger):
+                paginator.page_after(bad)
+        with self.assertRaises(PageNotAnInteger):    #Курсор другой сортировки
+            KeysetPaginator(Part.objects.order_by('title', '-price', 'created_at'), 5).page_after(cursor)
+
+    def test_view_follows_next_page_link(self):
+        first = self.client.get('/catalog/all_parts/', secure=True)
+        by_cursor = self.client.get(f"/catalog/all_parts/?{first.context['page_obj'].next_page_query}", secure=True)
+        by_number = self.client.get('/catalog/all_parts/', {'page': 2}, secure=True)
+
+        self.assertEqual(by_cursor.status_code, 200)
+        self.assertEqual(list(by_cursor.context['page_obj']), list(by_number.context['page_obj']))
+
+    def test_view_answers_404_to_tampered_cursor(self):
+        response = self.client.get('/catalog/all_parts/', {'cursor': 'подделка'}, secure=True)
+
+        self.assertEqual(response.status_code, 404)
+
+
+class EstimatedCountTests(TestCase):
+    """
+    Оценка числа строк: небольшая выборка считается точно, большая — по оценке планировщика PostgreSQL,
+    а завышенная оценка не ломает ссылку на последнюю страницу.
+    """
+    def setUp(self):
+        import_parts(part_feed([part_feed_row(f'P{num}', Фото='') for num in range(23)]))
+
+    def paginator(self):
+        from spare_parts.models import Part
+        from spare_parts.pagination import EstimatedCountPaginator
+
+        return EstimatedCountPaginator(Part.objects.order_by('title'), 5)
+
+    def test_small_listing_uses_exact_count(self):
+        paginator = self.paginator()
+
+        self.assertEqual((paginator.count, paginator.count_is_estimated), (23, False))
+
+    @skipUnless(connection.vendor == 'postgresql', 'Оценку даёт планировщик PostgreSQL')
+    def test_planner_estimate_is_a_row_count(self):
+        from spare_parts.models import Part
+        from spare_parts.pagination import planner_row_estimate
+
+        with connection.cursor() as cursor:
+            cursor.execute(f'ANALYZE {connection.ops.quote_name(Part._meta.db_table)}')
+
+        self.assertEqual(planner_row_estimate(Part.objects.order_by('title')), 23)
+
+    @skipUnless(connection.vendor == 'postgresql', 'Оценку даёт планировщик PostgreSQL')
+    def test_large_estimate_replaces_count(self):
+        from spare_parts.models import Part
+
+        with mock.patch('spare_parts.pagination.planner_row_estimate', return_value=5000), \
+                CaptureQueriesContext(connection) as queries:
+            paginator = self.paginator()
+            self.assertEqual((paginator.count, paginator.count_is_estimated, paginator.num_pages), (5000, True, 1000))
+            last = paginator.page(paginator.num_pages)    #Оценка завышена: страницы 1000 на самом деле нет
+
+        self.assertFalse(any('COUNT(' in query['sql'].upper() for query in queries))
+        self.assertEqual(list(last), list(Part.objects.order_by('title', 'pk'))[-5:])
+        self.assertFalse(last.has_next())
+
+    @skipUnless(connection.vendor == 'postgresql', 'Оценку даёт планировщик PostgreSQL')
+    def test_view_marks_estimated_count(self):
+        with mock.patch('spare_parts.pagination.planner_row_estimate', return_value=5000):
+            response = self.client.get('/catalog/all_parts/', secure=True)
+
+        self.assertContains(response, 'Найдено позиций: ~5000')
+
+
+class PartSaveSearchVectorTests(TestCase):
+    """
+    Part.save пересчитывает поисковый вектор, только если менялись поля, из которых он собран.
+    """
+    def test_vector_refreshed_only_for_search_fields(self):
+        from spare_parts.models import Part
+
+        import_parts(part_feed([part_feed_row('P1', Фото='')]))
+        part = Part.objects.get(part_id='P1')
+
+        with mock.patch('spare_parts.models.refresh_part_search_vectors') as refresh:
+            part.price = Decimal('999')
+            part.save(update_fields=['price'])
+            part.is_active = False
+            part.save(update_fields=['is_active'])
+            self.assertFalse(refresh.called)
+
+            part.title = 'Фара правая'
+            part.save(update_fields=['title', 'price'])
+            part.save()
+        self.assertEqual(refresh.call_count, 2)
+        refresh.assert_called_with(Part, [part.pk])
+
+
+class PartNumberQueryTests(TestCase):
+    """
+    Ключ номера производителя: нормализация разделителей и кириллических двойников, какие запросы считаются номером.
+    """
+    def test_normalize_part_number(self):
+        from spare_parts.search import normalize_part_number
+
+        self.assertEqual(normalize_part_number('85311-4у.000'), '853114Y000')    #'у' — кириллица
+        self.assertEqual(normalize_part_number('1К0 407/271'), '1K0407271')
+        self.assertIsNone(normalize_part_number(' -./ '))
+        self.assertIsNone(normalize_part_number(None))
+
+    def test_part_number_query_key(self):
+        from spare_parts.search import part_number_query_key
+
+        self.assertEqual(part_number_query_key(' 85311-4у.000 '), '853114Y000')
+        self.assertEqual(part_number_query_key('A2C4'), 'A2C4')
+        self.assertEqual(part_number_query_key('853114'), '853114')
+        for query in ('Бампер', 'бампер 2015', 'bmw', 'A2C', '2015', '1600', '12-34', 'фара, левая'):
+            self.assertIsNone(part_number_query_key(query), query)
+
+    def test_year_query_is_not_a_part_number(self):
+        from spare_parts.models import Part
+        from spare_parts.search import search_parts
+
+        import_parts(part_feed([part_feed_row('P1', Наименование='Фара Kia Rio 2015', Фото=''),
+                                part_feed_row('P2', Наименование='Стартер', Фото='',
+                                              **{'Номер производителя': '20-150XY'})]))    #Ключ 20150XY
+
+        found, _ = search_parts(Part.objects.all(), '2015')
+        self.assertEqual([part.part_id for part in found], ['P1'])
+        found, ordering = search_parts(Part.objects.all(), '20150x')
+        self.assertEqual(([part.part_id for part in found], ordering), (['P2'], ('part_number_key', 'title')))
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Нечёткий поиск (pg_trgm) работает только на PostgreSQL')
+class FuzzySearchTests(TestCase):
+    """
+    Нечёткий поиск находит опечатки со своими порогами и не меняет пороги pg_trgm на соединении.
+    """
+    def setUp(self):
+        import_parts(part_feed([part_feed_row('P1', Наименование='Бампер передний', Фото=''),
+                                part_feed_row('P2', Наименование='Дверь задняя правая', Фото='',
+                                              **{'Номер производителя': '85311-4Y000'}),
+                                part_feed_row('P3', Наименование='Зеркало левое', Фото='')]))
+
+    def trgm_thresholds(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT current_setting('pg_trgm.word_similarity_threshold'), "
+                           "current_setting('pg_trgm.similarity_threshold')")
+            return cursor.fetchone()
+
+    def test_typos_found_without_session_thresholds(self):
+        from spare_parts.models import Part
+        from spare_parts.search import fuzzy_search_parts
+
+        before = self.trgm_thresholds()
+        found = fuzzy_search_parts(Part.objects.all(), 'бампр')
+        self.assertEqual([part.part_id for part in found], ['P1'])
+        found = fuzzy_search_parts(Part.objects.all(), '853141Y000', key='853141Y000')    #Переставлены цифры
+        self.assertEqual([part.part_id for part in found], ['P2'])
+        self.assertGreaterEqual(found[0].similarity, 0.3)
+        self.assertEqual(self.trgm_thresholds(), before)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'COPY-загрузка работает только на PostgreSQL')
+class CopyMergeTests(TestCase):
+    """
+    Запись через COPY и слияние (pg_copy) даёт в каталоге те же строки, что пакетная запись через ORM.
+    """
+    def write(self, use_copy, df, **kwargs):
+        stdout = StringIO()
+        with mock.patch('spare_parts.management.import_to_db.copy_backend_available', lambda rows_count: use_copy):
+            result = import_parts(df, stdout, **kwargs)
+        self.assertNotIn('COPY-загрузка', stdout.getvalue())    #COPY не откатился на ORM
+        return result
+
+    def catalog(self):
+        from spare_parts.models import Part, PartImage
+
+        parts = list(Part.objects.order_by('part_id').values_list(
+            'part_id', 'title', 'description', 'part_number', 'part_number_key', 'category_id', 'subcategory_id',
+            'price', 'condition', 'donor_generation_id', 'donor_vehicle_id', 'feed_hash', 'is_active',
+            'deactivated_by_sweep', 'search_vector'))
+        images = list(PartImage.objects.order_by('part__part_id', 'image_url').values_list(
+            'part__part_id', 'image_url', 'is_main'))
+        links = list(Part.car_generations.through.objects.order_by('part__part_id').values_list(
+            'part__part_id', 'cargeneration_id'))
+        return parts, images, links
+
+    def run_feeds(self, use_copy):
+        from spare_parts.models import Part
+
+        import_donors(part_feed([donor_feed_row('1 Rio')]))
+        first = part_feed([part_feed_row(f'P{num}', Донор='1 Rio' if num % 2 else '', Цена=str(100 + num))
+                           for num in range(30)])
+        second = part_feed([part_feed_row('P0', Цена='999', Наименование='Бампер передний'),
+                            part_feed_row('P1', Фото='https://cdn.example.com/P1-2.jpg, https://cdn.example.com/new.jpg')]
+                           + [part_feed_row(f'P{num}', Донор='1 Rio' if num % 2 else '', Цена=str(100 + num))
+                              for num in range(2, 20)])
+        self.write(use_copy, first)
+        result = self.write(use_copy, second, allow_mass_removal=True)
+        self.write(use_copy, first)    #Снятые импортом возвращаются
+        catalog = self.catalog()
+        Part.objects.all().delete()
+        return result, catalog
+
+    def test_copy_and_orm_write_same_rows(self):
+        orm_result, orm_catalog = self.run_feeds(use_copy=False)
+        copy_result, copy_catalog = self.run_feeds(use_copy=True)
+
+        self.assertEqual(copy_result, orm_result)
+        self.assertEqual(copy_catalog, orm_catalog)
+
+    def test_repeated_part_id_in_shard_keeps_last_row(self):
+        from spare_parts.management.import_to_db import import_part_shard, plan_sharded_parts_import
+        from spare_parts.models import CarMake, CarModel, CarGeneration, DonorVehicle, Category, PartSubCategory, \
+            Part, PartImage
+
+        second_chunk = part_feed([part_feed_row('P1', Цена='200'), part_feed_row('P3')])
+        second_chunk.index += 2    #Сквозной индекс частей фида
+        plan = plan_sharded_parts_import(StringIO(), CarMake, CarModel, CarGeneration, DonorVehicle, Category,
+                                         PartSubCategory, Part, 1, chunks=[
+                                             part_feed([part_feed_row('P1', Цена='100'), part_feed_row('P2')]),
+                                             second_chunk])
+        stdout = StringIO()
+        with mock.patch('spare_parts.management.import_to_db.copy_backend_available', lambda rows_count: True):
+            totals = import_part_shard(stdout, Part, PartImage, plan['shards'][0])
+
+        self.assertNotIn('COPY-загрузка', stdout.getvalue())    #Без отката на ORM
+        self.assertEqual((totals['created'], totals['failed']), (3, 0))
+        self.assertEqual(Part.objects.get(part_id='P1').price, Decimal('200'))
+
+
+class DryRunTests(CatalogUpdateTestCase):
+    """
+    Пробный запуск считает изменения по тем же правилам, что импорт, и ничего не пишет в каталог.
+    """
+    PARTS_ROWS = 20
+
+    def test_rejected_rows_are_reported_separately(self):
+        import json
+        from spare_parts.models import Part, FeedState
+
+        header, *body = feed_rows(self.server.feeds['parts.csv'])
+        body[3][header.index('Номер производителя')] = '9' * 101
+        self.server.feeds['parts.csv'] = feed_body([header] + body)
+        report_path = Path(self.enterContext(tempfile.TemporaryDirectory())) / 'report.json'
+
+        result, _ = self.update_catalog(dry_run=True, report_path=report_path)
+
+        summary = result['dry_run']['parts']
+        self.assertEqual((summary['new'], summary['rejected']), (self.PARTS_ROWS - 1, 1))
+        report = json.loads(report_path.read_text(encoding='utf-8'))
+        self.assertEqual(report['feeds']['parts']['rejected'],
+                         [[5, body[3][0], 'part_number: длина 101 больше 100']])
+        self.assertFalse(Part.objects.exists())
+        self.assertFalse(FeedState.objects.exists())
+
+        result, _ = self.update_catalog()    #Импорт отклоняет ту же строку
+        self.assertEqual((result['parts']['created'], result['parts']['rejected']), (self.PARTS_ROWS - 1, 1))
@@ -1,6 +1,6 @@
 import json
 
-from django.core.paginator import Paginator, PageNotAnInteger, EmptyPage
+from django.core.paginator import PageNotAnInteger, EmptyPage
 from django.db.models import Count, Q
 from django.http import JsonResponse, Http404, HttpResponse
 from django.shortcuts import get_object_or_404
@@ -12,6 +12,8 @@ from rest_framework import generics
 from carts.cart import Cart
 from carts.forms import CartAddPartForm
 from spare_parts.models import Part, Category, CarModel, CarMake, CarGeneration, DonorVehicle
+from spare_parts.pagination import KeysetPaginationMixin, KeysetPaginator
+from spare_parts.search import search_parts
 from spare_parts.serializers import PartSerializer
 
 
@@ -23,7 +25,7 @@ class PartRetieveAPIView(generics.RetrieveAPIView):
     queryset = Part.objects.all()
 
 
-class PartListView(ListView):
+class PartListView(KeysetPaginationMixin, ListView):
     """
     Это представление будет рендерить HTML-страницу со списком запчастей.
     """
@@ -46,12 +48,13 @@ class PartListView(ListView):
         queryset = super().get_queryset()    #Получаем базовый QuerySet
         queryset = queryset.filter(is_active=True)
         search_query = self.request.GET.get('part_number')  # Получаем текстовый запрос
+        ordering = ('title',)
         if search_query:
-            queryset = queryset.filter(Q(title__icontains=search_query) |  Q(description__icontains=search_query) |  Q(part_number__icontains=search_query)  ).distinct()    #Ищем совпадения в нескольких полях, используя Q-объекты (логика ИЛИ)
+            queryset, ordering = search_parts(queryset, search_query)    #Номер производителя по индексу или полнотекстовый поиск
         donor_vehicle_id = self.request.GET.get('donor_vehicle_id')
         if donor_vehicle_id and donor_vehicle_id.isdigit():   #Если клик был с карточки "Новое поступление"
             queryset = queryset.filter(donor_vehicle_id=donor_vehicle_id)
-            return queryset.order_by('title').select_related('donor_vehicle', 'donor_generation__model__make', 'category').prefetch_related('images')
+            return queryset.order_by(*ordering).select_related('donor_vehicle', 'donor_generation__model__make', 'category').prefetch_related('images')
 
         selected_make = self.request.GET.get('make')
         selected_model = self.request.GET.get('model')
@@ -71,7 +74,7 @@ class PartListView(ListView):
         if category_id:
             queryset = queryset.filter(category_id=category_id)
         queryset = queryset.select_related('donor_vehicle', 'donor_generation__model__make','category').prefetch_related('images')
-        return queryset.order_by('title')
+        return queryset.order_by(*ordering)
 
     def get_breadcrumb_json_ld(self):
         """
@@ -297,7 +300,7 @@ class CategoryListView(ListView):
         return context
 
 
-class CategoryDetailView(ListView):
+class CategoryDetailView(KeysetPaginationMixin, ListView):
     """
     Отображает список запчастей для конкретной категории.
     Фильтр отображает полный список автомобилей, а QuerySet фильтрует запчасти по выбранной машине.
@@ -491,7 +494,7 @@ class CarGenerationAjaxView(View):
         return JsonResponse(list(generations), safe=False)    #Возвращаем JSON-ответ
 
 
-class PartsByGenerationView(ListView):
+class PartsByGenerationView(KeysetPaginationMixin, ListView):
     """
     Отображает список запчастей, отфильтрованных по выбранной Генерации (модификации).
     """
@@ -541,12 +544,11 @@ class DonorDetailView(DetailView):
             parts_queryset = parts_queryset.filter(category_id=category_id)
         sorted_parts = parts_queryset.order_by('category__name', 'title')
 
-        paginator = Paginator(sorted_parts, self.paginate_by)
-        page = self.request.GET.get('page')
+        paginator = KeysetPaginator(sorted_parts, self.paginate_by)    #Курсоры «вперёд»/«назад» — без OFFSET
         try:
-            page_obj = paginator.page(page)
+            page_obj = paginator.page_from_request(self.request)
         except PageNotAnInteger:
-            page_obj = paginator.page(1)    #Если 'page' не число, берем первую страницу
+            page_obj = paginator.page(1)    #Если 'page' не число или курсор неверный, берем первую страницу
         except EmptyPage:
             page_obj = paginator.page(paginator.num_pages)
         context['parts_list'] = page_obj.object_list
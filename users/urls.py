@@ -14,7 +14,7 @@ Including another URLconf
 from django.urls import path, reverse_lazy
 from users.apps import UsersConfig
 from users.views import RegistrationView, ProfileView, ActivateView, ProfileEditView, update_user_status, \
-    update_catalog_view
+    update_catalog_view, update_catalog_status_view
 from django.contrib.auth import views as auth_views
 
 app_name = UsersConfig.name
@@ -42,5 +42,6 @@ urlpatterns = [
     path('activate/<str:uidb64>/<str:token>/', ActivateView.as_view(), name='activate'),
 
     path('profile/update-catalog/', update_catalog_view, name='update_catalog'),
+    path('profile/update-catalog/<str:task_id>/status/', update_catalog_status_view, name='update_catalog_status'),
 
 ]
@@ -1,3 +1,4 @@
+from celery.result import AsyncResult
 from django.contrib.auth.decorators import user_passes_test
 from django.contrib.messages import get_messages
 from django.core.mail import send_mail
@@ -17,7 +18,7 @@ from config import settings
 from orders.models import Order
 from .forms import CustomUserCreationForm, CustomUserChangeForm
 from .models import User
-from spare_parts.tasks import update_catalog_task
+from spare_parts.tasks import update_catalog_task, start_update_catalog_task
 
 
 class RegistrationView(View):
@@ -105,6 +106,7 @@ class ProfileView(View):
             'orders': orders,
             'all_orders': all_orders,
             'all_users': all_users,
+            'update_catalog_task_id': request.session.get('update_catalog_task_id') if user.is_superuser else None,
             'title': 'Мой профиль'
         }
         return render(request, 'users/profile.html', context)
@@ -205,11 +207,59 @@ def is_superuser(user):
 def update_catalog_view(request):
     """
         Запускает обновление каталога в фоне через Celery.
+        Если обновление уже идёт, новая задача не запускается: профиль показывает прогресс текущей.
         """
     try:
-        task = update_catalog_task.delay()     #ИСПОЛЬЗУЕМ .delay() для неблокирующего запуска
-        messages.success(request, f'✅ Обновление каталога запущено в фоновом режиме! ID задачи: {task.id}')     #Сообщение пользователю, что задача запущена (и ID для отслеживания)
+        task_id, started = start_update_catalog_task()
+        if task_id is not None:
+            request.session['update_catalog_task_id'] = task_id    #Профиль показывает прогресс этой задачи
+        if started:
+            messages.success(request, f'✅ Обновление каталога запущено в фоновом режиме! ID задачи: {task_id}')     #Сообщение пользователю, что задача запущена (и ID для отслеживания)
+        else:
+            messages.warning(request, f'⏭️ Обновление каталога уже выполняется{_describe_progress(task_id)}. '
+                                      f'ID задачи: {task_id}')
     except Exception as e:
         messages.error(request, f'❌ Ошибка при попытке запуска фоновой задачи: {e}')
 
-    return redirect('users:profile')
\ No newline at end of file
+    return redirect('users:profile')
+
+
+def _progress_percent(meta):
+    if not isinstance(meta, dict) or not meta.get('total'):
+        return None
+    return min(100, int(meta['processed'] * 100 / meta['total']))
+
+
+def _describe_progress(task_id):
+    """
+    ', выполнено N% (этап)' для сообщения о запущенной задаче; пустая строка, если прогресс неизвестен.
+    """
+    result = AsyncResult(task_id, app=update_catalog_task.app)
+    if result.state != 'PROGRESS' or not isinstance(result.info, dict):
+        return ''
+    percent = _progress_percent(result.info)
+    stage = result.info.get('stage', '').rstrip('.')
+    return f', выполнено {percent}% ({stage})' if percent is not None else f' ({stage})'
+
+
+@require_http_methods(["GET"])
+def update_catalog_status_view(request, task_id):
+    """
+    JSON-статус задачи обновления каталога из result backend Celery (для опроса со страницы профиля).
+    В состоянии PROGRESS progress содержит этап, обработанные строки, скорость, ошибки и ETA.
+    """
+    if not request.user.is_superuser:
+        return JsonResponse({'success': False, 'error': 'Доступ запрещен'}, status=403)
+    result = AsyncResult(task_id, app=update_catalog_task.app)
+    state = result.state
+    info = result.info
+    return JsonResponse({
+        'success': True,
+        'task_id': task_id,
+        'state': state,
+        'ready': state in ('SUCCESS', 'FAILURE', 'REVOKED'),
+        'progress': info if state == 'PROGRESS' and isinstance(info, dict) else None,
+        'percent': _progress_percent(info) if state == 'PROGRESS' else None,
+        'result': info if state == 'SUCCESS' else None,
+        'error': str(info) if state == 'FAILURE' else None,
+    })